@@ -45,6 +45,13 @@ async def get_content_schema_repo(
     return ContentSchemaRepository(db)
 
 
+async def get_llm_call_repo(
+    db: AsyncIOMotorDatabase = Depends(get_database),
+) -> 'LLMCallRepository':
+    from src.db.repositories import LLMCallRepository
+    return LLMCallRepository(db)
+
+
 async def get_submission_repo(
     db: AsyncIOMotorDatabase = Depends(get_database),
 ) -> SubmissionRepository:
@@ -1,9 +1,16 @@
 """Operational endpoints (stats/health aliases)."""
 
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
 
-from src.api.dependencies import get_submission_repo
+from fastapi import APIRouter, Depends, Query
+
+from src.api.dependencies import get_llm_call_repo, get_submission_repo
 from src.db.repositories import SubmissionRepository
+from src.scrapers.crawl_frontier import get_crawl_frontier
+from src.scrapers.http_clients import get_http_client_registry
+from src.scrapers.proxy_health import get_proxy_rotator
+from src.workers.llm_ledger import summarize_call_groups
 
 router = APIRouter(tags=["Operations"])
 
@@ -11,3 +18,73 @@ router = APIRouter(tags=["Operations"])
 @router.get("/stats")
 async def stats(repo: SubmissionRepository = Depends(get_submission_repo)):
     return await repo.stats()
+
+
+async def _llm_call_stats(repo, group_by: str, since_hours: int, submission_id: Optional[str]) -> Dict[str, Any]:
+    since = datetime.now(timezone.utc) - timedelta(hours=since_hours)
+    groups = await repo.grouped_samples(group_by=group_by, since=since, submission_id=submission_id)
+    return {
+        "group_by": group_by,
+        "since": since,
+        "submission_id": submission_id,
+        "groups": summarize_call_groups(groups),
+    }
+
+
+@router.get("/stats/llm-calls/steps")
+async def llm_call_stats_by_step(
+    since_hours: int = Query(168, ge=1, le=24 * 90),
+    submission_id: Optional[str] = None,
+    repo=Depends(get_llm_call_repo),
+):
+    """p50/p95 latency and token usage per pipeline step."""
+    return await _llm_call_stats(repo, "step", since_hours, submission_id)
+
+
+@router.get("/stats/llm-calls/models")
+async def llm_call_stats_by_model(
+    since_hours: int = Query(168, ge=1, le=24 * 90),
+    submission_id: Optional[str] = None,
+    repo=Depends(get_llm_call_repo),
+):
+    """p50/p95 latency and token usage per provider/model."""
+    return await _llm_call_stats(repo, "model", since_hours, submission_id)
+
+
+@router.get("/stats/llm-calls/routes")
+async def llm_call_stats_by_route(
+    since_hours: int = Query(168, ge=1, le=24 * 90),
+    submission_id: Optional[str] = None,
+    repo=Depends(get_llm_call_repo),
+):
+    """p50/p95 latency and token usage per routing decision (step, chosen model, reason)."""
+    return await _llm_call_stats(repo, "route", since_hours, submission_id)
+
+
+@router.get("/stats/amazon-fetch")
+async def amazon_fetch_stats(
+    since_hours: int = Query(168, ge=1, le=24 * 90),
+    repo: SubmissionRepository = Depends(get_submission_repo),
+):
+    """Hit ratio of the Amazon fetch tiers (plain HTTP vs browser) and escalation reasons."""
+    since = datetime.now(timezone.utc) - timedelta(hours=since_hours)
+    return {"since": since, **await repo.amazon_fetch_stats(since)}
+
+
+@router.get("/stats/http-clients")
+async def http_client_stats():
+    """Connection reuse, DNS cache and per-host saturation of this API process's pooled HTTP clients."""
+    return get_http_client_registry().stats()
+
+
+@router.get("/stats/crawl-frontier")
+async def crawl_frontier_stats():
+    """Link fetches in flight per host across all workers, plus this process's frontier counters."""
+    frontier = get_crawl_frontier()
+    return {"hosts": await frontier.host_load(), **frontier.stats()}
+
+
+@router.get("/stats/proxies")
+async def proxy_health_stats():
+    """Health score, success/block rate, latency and ejection state of each scraper proxy (all workers)."""
+    return {"proxies": await get_proxy_rotator().snapshot()}
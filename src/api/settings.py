@@ -34,15 +34,20 @@ from src.models.schemas import (
     ContentSchemaUpdate,
     ContentSchemaResponse,
 )
+from src.scrapers.http_clients import get_http_client
 from src.workers.ai_defaults import (
     BOOK_REVIEW_ARTICLE_MODEL_ID,
     BOOK_REVIEW_ARTICLE_PROVIDER,
     BOOK_REVIEW_CONTEXT_MODEL_ID,
     BOOK_REVIEW_CONTEXT_PROVIDER,
     DEFAULT_PROVIDER,
+    MODEL_GROQ_LLAMA_3_1_8B,
     MODEL_GROQ_LLAMA_3_3_70B,
     MODEL_MISTRAL_LARGE_LATEST,
+    MODEL_MISTRAL_SMALL_LATEST,
 )
+from src.workers.llm_batch import EXECUTION_MODES
+from src.workers.llm_routing import MAX_ROUTE_TIERS
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +59,40 @@ LINKS_CONTENT_PIPELINE_ID = "links_content_v1"
 DEFAULT_SUBMISSION_PIPELINE_ID = BOOK_REVIEW_PIPELINE_ID
 DEFAULT_WORDPRESS_URL = "https://analisederequisitos.com.br"
 DEFAULT_WORDPRESS_PASSWORD = "M3LS c2ny NdF1 5Xap 1tmT ibSg"
+LINK_PROMPT_MODES = {"separate", "combined"}
+# Steps whose LLM calls can be queued as provider batch jobs (ai.execution_mode = "batch").
+BATCH_CAPABLE_STEP_IDS = {"additional_links_scrape", "summarize_additional_links", "context_generation"}
+HEDGING_DEFAULTS: Dict[str, Any] = {
+    "enabled": False,
+    # None = the provider opposite the step prompt's, with that provider's default model.
+    "secondary_provider": None,
+    "secondary_model_id": None,
+    "latency_percentile": 90,
+    "default_delay_seconds": 8,
+    "max_hedge_ratio": 0.2,
+    "max_prompt_tokens": 4000,
+}
+# Steps whose calls can be routed to a smaller model by input size (ai.routing).
+ROUTING_CAPABLE_STEP_IDS = {"additional_links_scrape", "summarize_additional_links", "internet_research"}
+ROUTING_DEFAULTS: Dict[str, Any] = {
+    "enabled": False,
+    "latency_budget_seconds": 0,
+    "latency_percentile": 90,
+    "tiers": [],
+}
+ROUTING_TIER_DEFAULTS: Dict[str, Any] = {
+    "provider": None,
+    "model_id": None,
+    "max_input_tokens": 0,
+    "max_output_tokens": 0,
+    "structured_output": True,
+    "credential_name": None,
+}
+
+
+def _routing_config(*tiers: Dict[str, Any]) -> Dict[str, Any]:
+    return {**deepcopy(ROUTING_DEFAULTS), "tiers": [{**ROUTING_TIER_DEFAULTS, **tier} for tier in tiers]}
+
 
 BOOK_REVIEW_PIPELINE_TEMPLATE: Dict[str, Any] = {
     "name": "Book Review",
@@ -84,6 +123,13 @@ BOOK_REVIEW_PIPELINE_TEMPLATE: Dict[str, Any] = {
                 "prompt_id": None,
                 "default_credential_name": "Mistral A",
                 "default_prompt_purpose": "book_review_link_bibliography_extract",
+                # "separate": bibliographic (Mistral) + summary (Groq) calls; "combined": one call per link.
+                "link_prompt_mode": "separate",
+                "execution_mode": "sync",
+                # Short pages go to a small model; the step model handles the rest.
+                "routing": _routing_config(
+                    {"provider": "mistral", "model_id": MODEL_MISTRAL_SMALL_LATEST, "max_input_tokens": 1200}
+                ),
             },
         },
         {
@@ -100,6 +146,11 @@ BOOK_REVIEW_PIPELINE_TEMPLATE: Dict[str, Any] = {
                 "prompt_id": None,
                 "default_credential_name": "GROC A",
                 "default_prompt_purpose": "book_review_link_summary",
+                "hedging": deepcopy(HEDGING_DEFAULTS),
+                "execution_mode": "sync",
+                "routing": _routing_config(
+                    {"provider": "groq", "model_id": MODEL_GROQ_LLAMA_3_1_8B, "max_input_tokens": 1200}
+                ),
             },
         },
         {
@@ -124,6 +175,10 @@ BOOK_REVIEW_PIPELINE_TEMPLATE: Dict[str, Any] = {
                 "prompt_id": None,
                 "default_credential_name": "GROC A",
                 "default_prompt_purpose": "book_review_web_research",
+                "hedging": deepcopy(HEDGING_DEFAULTS),
+                "routing": _routing_config(
+                    {"provider": "groq", "model_id": MODEL_GROQ_LLAMA_3_1_8B, "max_input_tokens": 1500}
+                ),
             },
         },
         {
@@ -140,6 +195,8 @@ BOOK_REVIEW_PIPELINE_TEMPLATE: Dict[str, Any] = {
                 "prompt_id": None,
                 "default_credential_name": "GROC A",
                 "default_prompt_purpose": "context",
+                "hedging": deepcopy(HEDGING_DEFAULTS),
+                "execution_mode": "sync",
             },
         },
         {
@@ -230,6 +287,7 @@ LINKS_CONTENT_PIPELINE_TEMPLATE: Dict[str, Any] = {
                 "prompt_id": None,
                 "default_credential_name": "GROC A",
                 "default_prompt_purpose": "context",
+                "hedging": deepcopy(HEDGING_DEFAULTS),
             },
         },
         {
@@ -402,6 +460,142 @@ def _safe_delay_seconds(value: Any) -> int:
     return max(0, parsed)
 
 
+def _normalize_hedging_payload(raw: Any, current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="hedging must be an object")
+
+    hedging = deepcopy(HEDGING_DEFAULTS)
+    hedging.update(current if isinstance(current, dict) else {})
+    unknown = sorted(set(raw) - set(HEDGING_DEFAULTS) - {"secondary_credential_name"})
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown hedging fields: {', '.join(unknown)}",
+        )
+
+    if "enabled" in raw:
+        hedging["enabled"] = bool(raw.get("enabled"))
+    if "secondary_provider" in raw:
+        provider = str(raw.get("secondary_provider") or "").strip().lower()
+        if provider and provider not in {"groq", "mistral"}:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="hedging.secondary_provider must be groq, mistral or null",
+            )
+        hedging["secondary_provider"] = provider or None
+    for key in ("secondary_model_id", "secondary_credential_name"):
+        if key in raw:
+            hedging[key] = str(raw.get(key) or "").strip() or None
+
+    bounds = {
+        "latency_percentile": (50.0, 99.9),
+        "default_delay_seconds": (0.1, 300.0),
+        "max_hedge_ratio": (0.0, 1.0),
+        "max_prompt_tokens": (0.0, 200000.0),
+    }
+    for key, (low, high) in bounds.items():
+        if key not in raw:
+            continue
+        try:
+            value = float(raw.get(key))
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"hedging.{key} must be a number",
+            )
+        if value < low or value > high:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"hedging.{key} must be between {low:g} and {high:g}",
+            )
+        hedging[key] = int(value) if key == "max_prompt_tokens" else value
+    return hedging
+
+
+def _routing_number(raw: Dict[str, Any], key: str, low: float, high: float, field: str) -> float:
+    try:
+        value = float(raw.get(key))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"{field} must be a number")
+    if value < low or value > high:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{field} must be between {low:g} and {high:g}",
+        )
+    return value
+
+
+def _normalize_routing_tier(raw: Any, index: int) -> Dict[str, Any]:
+    field = f"routing.tiers[{index}]"
+    if not isinstance(raw, dict):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"{field} must be an object")
+    unknown = sorted(set(raw) - set(ROUTING_TIER_DEFAULTS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown {field} fields: {', '.join(unknown)}",
+        )
+
+    tier = deepcopy(ROUTING_TIER_DEFAULTS)
+    provider = str(raw.get("provider") or "").strip().lower()
+    if provider not in {"groq", "mistral"}:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{field}.provider must be groq or mistral",
+        )
+    model_id = str(raw.get("model_id") or "").strip()
+    if not model_id:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"{field}.model_id is required")
+    tier.update({"provider": provider, "model_id": model_id})
+    for key, high in (("max_input_tokens", 200000.0), ("max_output_tokens", 32000.0)):
+        if key in raw:
+            tier[key] = int(_routing_number(raw, key, 0.0, high, f"{field}.{key}"))
+    if "structured_output" in raw:
+        tier["structured_output"] = bool(raw.get("structured_output"))
+    if "credential_name" in raw:
+        tier["credential_name"] = str(raw.get("credential_name") or "").strip() or None
+    return tier
+
+
+def _normalize_routing_payload(raw: Any, current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="routing must be an object")
+
+    routing = deepcopy(ROUTING_DEFAULTS)
+    routing.update(current if isinstance(current, dict) else {})
+    unknown = sorted(set(raw) - set(ROUTING_DEFAULTS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown routing fields: {', '.join(unknown)}",
+        )
+
+    if "enabled" in raw:
+        routing["enabled"] = bool(raw.get("enabled"))
+    if "latency_budget_seconds" in raw:
+        routing["latency_budget_seconds"] = _routing_number(
+            raw, "latency_budget_seconds", 0.0, 600.0, "routing.latency_budget_seconds"
+        )
+    if "latency_percentile" in raw:
+        routing["latency_percentile"] = _routing_number(
+            raw, "latency_percentile", 50.0, 99.9, "routing.latency_percentile"
+        )
+    if "tiers" in raw:
+        tiers = raw.get("tiers")
+        if not isinstance(tiers, list) or len(tiers) > MAX_ROUTE_TIERS:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"routing.tiers must be a list with at most {MAX_ROUTE_TIERS} items",
+            )
+        routing["tiers"] = [_normalize_routing_tier(item, index) for index, item in enumerate(tiers)]
+    if routing["enabled"] and not routing.get("tiers"):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="routing.tiers must not be empty when routing is enabled",
+        )
+    return routing
+
+
 def _extract_credential_url(doc: Dict[str, Any]) -> Optional[str]:
     url = str(doc.get("url") or "").strip()
     if url:
@@ -455,8 +649,22 @@ async def _fetch_wordpress_categories_from_site(credential_doc: Dict[str, Any])
     page = 1
     headers = _build_wordpress_auth_headers(credential_doc)
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        while True:
+    client = get_http_client("wordpress")
+    while True:
+        response = await client.get(
+            endpoint,
+            params={
+                "per_page": 100,
+                "page": page,
+                "orderby": "name",
+                "order": "asc",
+                "_fields": "id,name,slug",
+            },
+            headers=headers,
+        )
+
+        if response.status_code in (400, 401, 403):
+            # Retry without auth for public category listing.
             response = await client.get(
                 endpoint,
                 params={
@@ -466,43 +674,29 @@ async def _fetch_wordpress_categories_from_site(credential_doc: Dict[str, Any])
                     "order": "asc",
                     "_fields": "id,name,slug",
                 },
-                headers=headers,
             )
 
-            if response.status_code in (400, 401, 403):
-                # Retry without auth for public category listing.
-                response = await client.get(
-                    endpoint,
-                    params={
-                        "per_page": 100,
-                        "page": page,
-                        "orderby": "name",
-                        "order": "asc",
-                        "_fields": "id,name,slug",
-                    },
-                )
-
-            if response.status_code == 400:
-                # WordPress returns 400 for page out of range in some setups.
-                break
-
-            response.raise_for_status()
-            batch = response.json()
-            if not isinstance(batch, list) or len(batch) == 0:
-                break
-
-            for item in batch:
-                categories.append(
-                    {
-                        "id": item.get("id"),
-                        "name": item.get("name"),
-                        "slug": item.get("slug"),
-                    }
-                )
+        if response.status_code == 400:
+            # WordPress returns 400 for page out of range in some setups.
+            break
+
+        response.raise_for_status()
+        batch = response.json()
+        if not isinstance(batch, list) or len(batch) == 0:
+            break
+
+        for item in batch:
+            categories.append(
+                {
+                    "id": item.get("id"),
+                    "name": item.get("name"),
+                    "slug": item.get("slug"),
+                }
+            )
 
-            if len(batch) < 100:
-                break
-            page += 1
+        if len(batch) < 100:
+            break
+        page += 1
 
     return categories
 
@@ -862,6 +1056,10 @@ async def _build_pipeline_detail_response(
                 "prompt_purpose": selected_prompt.get("purpose") if selected_prompt else ai.get("default_prompt_purpose"),
                 "default_credential_name": ai.get("default_credential_name"),
                 "default_prompt_purpose": ai.get("default_prompt_purpose"),
+                "hedging": ai.get("hedging") if isinstance(ai.get("hedging"), dict) else None,
+                "routing": ai.get("routing") if isinstance(ai.get("routing"), dict) else None,
+                "link_prompt_mode": ai.get("link_prompt_mode"),
+                "execution_mode": ai.get("execution_mode"),
             }
 
         steps.append(step)
@@ -1185,10 +1383,25 @@ async def update_pipeline_step_ai(
     update_credential = "credential_id" in payload
     update_prompt = "prompt_id" in payload
     update_delay = "delay_seconds" in payload
-    if not update_credential and not update_prompt and not update_delay:
+    update_hedging = "hedging" in payload
+    update_link_mode = "link_prompt_mode" in payload
+    update_execution_mode = "execution_mode" in payload
+    update_routing = "routing" in payload
+    ai_updates = (
+        update_credential,
+        update_prompt,
+        update_hedging,
+        update_link_mode,
+        update_execution_mode,
+        update_routing,
+    )
+    if not any(ai_updates) and not update_delay:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="credential_id, prompt_id or delay_seconds is required",
+            detail=(
+                "credential_id, prompt_id, delay_seconds, hedging, link_prompt_mode, execution_mode "
+                "or routing is required"
+            ),
         )
 
     await _ensure_system_defaults(
@@ -1205,7 +1418,7 @@ async def update_pipeline_step_ai(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pipeline step not found")
 
     uses_ai = bool(step.get("uses_ai"))
-    if (update_credential or update_prompt) and not uses_ai:
+    if any(ai_updates) and not uses_ai:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="This step does not use AI settings")
 
     ai = step.get("ai", {}) if isinstance(step.get("ai"), dict) else {}
@@ -1230,6 +1443,35 @@ async def update_pipeline_step_ai(
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
             ai["prompt_id"] = str(prompt.get("_id"))
 
+    if update_hedging:
+        ai["hedging"] = _normalize_hedging_payload(payload.get("hedging"), ai.get("hedging"))
+
+    if update_link_mode:
+        link_mode = str(payload.get("link_prompt_mode") or "").strip().lower()
+        if link_mode not in LINK_PROMPT_MODES or step_id != "additional_links_scrape":
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="link_prompt_mode must be separate or combined (additional links step only)",
+            )
+        ai["link_prompt_mode"] = link_mode
+
+    if update_execution_mode:
+        execution_mode = str(payload.get("execution_mode") or "").strip().lower()
+        if execution_mode not in EXECUTION_MODES or step_id not in BATCH_CAPABLE_STEP_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="execution_mode must be sync or batch (link and context steps only)",
+            )
+        ai["execution_mode"] = execution_mode
+
+    if update_routing:
+        if step_id not in ROUTING_CAPABLE_STEP_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="routing is only available for the link and internet research steps",
+            )
+        ai["routing"] = _normalize_routing_payload(payload.get("routing"), ai.get("routing"))
+
     if uses_ai:
         step["ai"] = ai
 
@@ -236,7 +236,8 @@ async def _enqueue_stage_retry(submission_id: str, stage: str, amazon_url: str)
     if stage == "amazon_scrape":
         from src.workers.scraper_tasks import scrape_amazon_task
 
-        scrape_amazon_task.delay(submission_id=submission_id, amazon_url=amazon_url)
+        # Retried because the data was wrong: scrape again instead of serving the product cache.
+        scrape_amazon_task.delay(submission_id=submission_id, amazon_url=amazon_url, refresh_product_cache=True)
         return
 
     if stage in {"additional_links_scrape", "summarize_additional_links"}:
@@ -537,6 +538,7 @@ async def retry_task(submission_id: str, repo: SubmissionRepository = Depends(ge
             submission_id=submission_id,
             amazon_url=submission.get("amazon_url"),
             pipeline_id=str(submission.get("pipeline_id") or BOOK_REVIEW_PIPELINE_ID),
+            refresh_product_cache=True,
         )
     except Exception as e:
         logger.error("Failed to enqueue retry pipeline: %s", e, exc_info=True)
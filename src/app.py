@@ -1,4 +1,5 @@
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from fastapi import FastAPI
@@ -9,6 +10,8 @@ from src.api import ingest, tasks, settings as settings_router, articles, operat
 from src.config import settings
 from src.db.connection import close_mongo_client
 from src.db.migrations import run_migrations
+from src.scrapers.http_clients import close_http_clients
+from src.workers.prompt_budget import load_tokenizers
 from src.logger import setup_logger
 
 # Setup logging
@@ -23,6 +26,7 @@ async def lifespan(app: FastAPI):
         logger.info("Starting Pigmeu Copilot API")
         await run_migrations()
         logger.info("Database migrations completed")
+        await asyncio.to_thread(load_tokenizers)
     except Exception as e:
         logger.error("Startup failed: %s", e)
         raise
@@ -33,6 +37,7 @@ async def lifespan(app: FastAPI):
         logger.info("Shutting down Pigmeu Copilot API")
         await close_mongo_client()
         logger.info("Database connection closed")
+        close_http_clients()
     except Exception as e:
         logger.error("Shutdown error: %s", e)
 
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -18,6 +18,141 @@ class Settings(BaseSettings):
     groq_api_key: Optional[str] = None
     mistral_api_key: Optional[str] = None
 
+    # LLM rate limiting (shared across workers through Redis)
+    llm_rate_limit_enabled: bool = True
+    llm_rate_limit_max_wait_seconds: float = 180.0
+    # Overrides keyed by "provider" or "provider:model_id", e.g.
+    # {"groq:llama-3.3-70b-versatile": {"requests_per_minute": 30, "tokens_per_minute": 12000}}
+    llm_rate_limits: Dict[str, Dict[str, float]] = {}
+    # LLM retries and circuit breaker (per provider/model, per worker process)
+    llm_retry_deadline_seconds: float = 300.0
+    llm_circuit_failure_threshold: int = 5
+    llm_circuit_reset_seconds: float = 60.0
+    # Input token budget overrides per prompt step, e.g. {"context": 8000}
+    prompt_token_budgets: Dict[str, int] = {}
+    # Batch execution for steps with ai.execution_mode = "batch"
+    llm_batch_flush_delay_seconds: int = 60
+    llm_batch_poll_interval_seconds: int = 300
+    llm_batch_max_requests_per_job: int = 5000
+    llm_batch_max_attempts: int = 2
+    llm_batch_completion_window: str = "24h"
+    # Per-call usage/latency ledger (llm_calls collection, buffered writes)
+    llm_ledger_enabled: bool = True
+    llm_ledger_batch_size: int = 50
+    llm_ledger_flush_seconds: float = 5.0
+    # Native JSON output for extraction prompts, keyed by "provider" or "provider:model_id":
+    # "json_schema", "json_object" or "off", e.g. {"groq": "off"}
+    llm_structured_output_modes: Dict[str, str] = {}
+    # One low-cost repair call when a JSON completion fails validation
+    llm_structured_repair_enabled: bool = True
+    llm_structured_repair_max_tokens: int = 1200
+    # Cross-submission cache of fetched pages (by normalized URL) and link LLM results (by content hash)
+    link_cache_enabled: bool = True
+    link_cache_page_ttl_hours: float = 24.0
+    link_cache_result_ttl_days: float = 30.0
+    # Link page downloads are streamed up to max_bytes; non-HTML responses are rejected from their headers.
+    link_fetch_max_bytes: int = 1_000_000
+    link_fetch_content_types: List[str] = ["text/html", "application/xhtml+xml"]
+    # Crawl frontier for link fetches: concurrent fetches per worker, per host across workers
+    # (Redis leases, renewed while the fetch runs), lease lifetime after a crashed fetch and the
+    # longest wait for a host slot (slot holders may be queued up to scraper_rate_limit_max_wait_seconds).
+    crawl_frontier_enabled: bool = True
+    crawl_frontier_max_concurrency: int = 8
+    crawl_frontier_per_host_concurrency: int = 2
+    crawl_frontier_lease_seconds: float = 60.0
+    crawl_frontier_max_wait_seconds: float = 360.0
+    crawl_frontier_poll_seconds: float = 0.25
+    # HTTP cache of scraped pages (conditional GET). Offline mode serves only cached pages
+    # (reproducible reprocessing/benchmarks); entries are kept retention_days for revalidation.
+    http_cache_enabled: bool = True
+    http_cache_offline: bool = False
+    http_cache_retention_days: float = 30.0
+    # Scraped Amazon product data reused across submissions/retries, keyed by ASIN and ISBN.
+    amazon_product_cache_enabled: bool = True
+    amazon_product_cache_ttl_hours: float = 72.0
+    # Goodreads lookup (submission goodreads_url, else title/author search) run alongside the Amazon scrape.
+    # Data not ready when Amazon finishes is added by its own task; bibliographic consolidation
+    # waits for it (checking every poll_seconds) for at most max_wait_seconds.
+    goodreads_enrichment_enabled: bool = True
+    goodreads_enrichment_max_wait_seconds: float = 300.0
+    goodreads_enrichment_poll_seconds: float = 5.0
+    # HTML parser for CSS-selector extraction: "html.parser", "lxml" or "selectolax"
+    # (falls back to the next installed one: selectolax -> lxml -> html.parser).
+    html_parser_backend: str = "lxml"
+    # Per-domain scraper rate limits shared across workers through Redis (GCRA buckets).
+    # Keys are registrable domains (or hosts); "default" applies to every other domain.
+    # burst = requests allowed back to back before requests_per_second paces them.
+    scraper_rate_limits: Dict[str, Dict[str, float]] = {
+        "default": {"requests_per_second": 1.0, "burst": 2, "requests_per_hour": 200},
+        "amazon.com": {"requests_per_second": 0.5, "burst": 1, "requests_per_hour": 100},
+        "amazon.com.br": {"requests_per_second": 0.5, "burst": 1, "requests_per_hour": 100},
+        "goodreads.com": {"requests_per_second": 0.3, "burst": 1, "requests_per_hour": 60},
+        "duckduckgo.com": {"requests_per_second": 0.5, "burst": 2, "requests_per_hour": 300},
+    }
+    # Key buckets by proxy too (each exit IP gets the domain quota); max wait before failing fast.
+    scraper_rate_limit_per_proxy: bool = False
+    scraper_rate_limit_max_wait_seconds: float = 300.0
+    # Scraper proxies, picked by health score (EWMA success/block rate and latency) shared through Redis.
+    # A proxy is ejected after eject_after_failures failures in a row (eject_seconds, doubling up to max),
+    # then gets one probe request.
+    scraper_proxies: List[str] = []
+    proxy_health_alpha: float = 0.2
+    proxy_eject_after_failures: int = 3
+    proxy_eject_seconds: float = 120.0
+    proxy_eject_max_seconds: float = 1800.0
+    proxy_latency_target_ms: float = 3000.0
+    proxy_health_refresh_seconds: float = 5.0
+    # Per-worker Playwright browser pool shared by the Amazon/Goodreads/generic scrapers.
+    # A browser is recycled after max_pages pages or when its processes exceed max_memory_mb (0 = off),
+    # measured every memory_check_pages pages.
+    browser_pool_max_pages: int = 200
+    browser_pool_max_memory_mb: float = 1024.0
+    browser_pool_memory_check_pages: int = 10
+    browser_pool_max_contexts: int = 4
+    # Amazon product pages are fetched over plain HTTP first; the browser only renders
+    # pages that come back blocked or without the product selectors.
+    amazon_http_first: bool = True
+    # Browser pages are parsed once required selectors attach or the DOM is quiet for quiet_ms.
+    # Per-domain time-to-ready (after min_samples pages) tightens the wait below max_wait_seconds.
+    scraper_readiness_quiet_ms: int = 500
+    scraper_readiness_max_wait_seconds: float = 15.0
+    scraper_readiness_min_samples: int = 5
+    # Process-wide pooled HTTP clients (link discovery, WordPress). Per-host limits cap
+    # concurrent requests to one host; HTTP/2 is used when the h2 package is installed.
+    http_client_max_connections: int = 50
+    http_client_max_keepalive: int = 20
+    http_client_keepalive_expiry_seconds: float = 30.0
+    http_client_max_per_host: int = 6
+    http_client_http2: bool = True
+    http_client_dns_ttl_seconds: float = 300.0
+    # Request interception on browser page loads: resource types and domains that are aborted.
+    # Third-party requests are aborted unless their domain is allowed (site CDNs serving scripts).
+    scraper_blocked_resource_types: List[str] = ["image", "media", "font", "stylesheet"]
+    scraper_block_third_party: bool = True
+    scraper_allowed_domains: List[str] = [
+        "media-amazon.com",
+        "ssl-images-amazon.com",
+        "images-amazon.com",
+        "gr-assets.com",
+    ]
+    scraper_denied_domains: List[str] = [
+        "amazon-adsystem.com",
+        "doubleclick.net",
+        "google-analytics.com",
+        "googletagmanager.com",
+        "googlesyndication.com",
+        "facebook.net",
+        "scorecardresearch.com",
+    ]
+    # Deterministic local provider (load/regression tests). llm_force_provider="local"
+    # routes every LLM call to it, regardless of the provider configured per step.
+    llm_force_provider: Optional[str] = None
+    llm_local_latency_median_ms: float = 0.0
+    llm_local_latency_p95_ms: float = 0.0
+    # Per-call error probabilities keyed by HTTP status or "timeout", e.g. {"429": 0.02, "timeout": 0.01}
+    llm_local_error_rates: Dict[str, float] = {}
+    llm_local_seed: int = 0
+
     # WordPress
     wordpress_url: Optional[str] = None
     wordpress_username: Optional[str] = None
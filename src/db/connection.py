@@ -1,4 +1,5 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from redis.asyncio import Redis
 from typing import Optional
 import asyncio
 from src.config import settings
@@ -7,6 +8,9 @@ _client: Optional[AsyncIOMotorClient] = None
 _database: Optional[AsyncIOMotorDatabase] = None
 _loop: Optional[asyncio.AbstractEventLoop] = None
 
+_redis_client: Optional[Redis] = None
+_redis_loop: Optional[asyncio.AbstractEventLoop] = None
+
 
 async def get_mongo_client() -> AsyncIOMotorClient:
     """Get or create MongoDB client instance."""
@@ -56,3 +60,37 @@ async def close_mongo_client() -> None:
         _client = None
         _database = None
         _loop = None
+
+
+async def get_redis_client() -> Redis:
+    """Get or create the asyncio Redis client used for cross-worker coordination."""
+    global _redis_client, _redis_loop
+    current_loop = asyncio.get_running_loop()
+
+    # Same loop-binding rule as the Mongo client: Celery tasks may run on a fresh loop.
+    if _redis_client is not None and (_redis_loop is None or _redis_loop.is_closed() or _redis_loop is not current_loop):
+        _redis_client = None
+        _redis_loop = None
+
+    if _redis_client is None:
+        _redis_client = Redis.from_url(
+            settings.redis_url,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=2,
+        )
+        _redis_loop = current_loop
+    return _redis_client
+
+
+async def close_redis_client() -> None:
+    """Close Redis client connection."""
+    global _redis_client, _redis_loop
+    if _redis_client is not None:
+        closer = getattr(_redis_client, "aclose", None) or _redis_client.close
+        try:
+            await closer()
+        except Exception:
+            pass
+        _redis_client = None
+        _redis_loop = None
@@ -68,4 +68,55 @@ async def run_migrations() -> None:
     await db["content_schemas"].create_index([("updated_at", DESCENDING)])
     print("✓ content_schemas")
 
+    if "llm_batch_requests" not in await db.list_collection_names():
+        await db.create_collection("llm_batch_requests")
+    await db["llm_batch_requests"].create_index([("custom_id", ASCENDING)], unique=True)
+    await db["llm_batch_requests"].create_index(
+        [("status", ASCENDING), ("provider", ASCENDING), ("model_id", ASCENDING), ("created_at", ASCENDING)]
+    )
+    await db["llm_batch_requests"].create_index([("job_id", ASCENDING)], sparse=True)
+    await db["llm_batch_requests"].create_index([("claim_id", ASCENDING)], sparse=True)
+    print("✓ llm_batch_requests")
+
+    if "llm_batch_jobs" not in await db.list_collection_names():
+        await db.create_collection("llm_batch_jobs")
+    await db["llm_batch_jobs"].create_index([("job_id", ASCENDING)], unique=True)
+    await db["llm_batch_jobs"].create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+    print("✓ llm_batch_jobs")
+
+    if "llm_calls" not in await db.list_collection_names():
+        await db.create_collection("llm_calls")
+    await db["llm_calls"].create_index([("created_at", DESCENDING)])
+    await db["llm_calls"].create_index([("step_id", ASCENDING), ("created_at", DESCENDING)])
+    await db["llm_calls"].create_index([("provider", ASCENDING), ("model_id", ASCENDING), ("created_at", DESCENDING)])
+    await db["llm_calls"].create_index([("submission_id", ASCENDING)], sparse=True)
+    print("✓ llm_calls")
+
+    if "page_cache" not in await db.list_collection_names():
+        await db.create_collection("page_cache")
+    await db["page_cache"].create_index([("url_key", ASCENDING)], unique=True)
+    await db["page_cache"].create_index([("content_hash", ASCENDING)])
+    await db["page_cache"].create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    print("✓ page_cache")
+
+    if "http_cache" not in await db.list_collection_names():
+        await db.create_collection("http_cache")
+    await db["http_cache"].create_index([("url_key", ASCENDING)], unique=True)
+    await db["http_cache"].create_index([("purge_at", ASCENDING)], expireAfterSeconds=0)
+    print("✓ http_cache")
+
+    if "product_cache" not in await db.list_collection_names():
+        await db.create_collection("product_cache")
+    await db["product_cache"].create_index([("product_key", ASCENDING)], unique=True)
+    await db["product_cache"].create_index([("keys", ASCENDING), ("scraped_at", DESCENDING)])
+    await db["product_cache"].create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    print("✓ product_cache")
+
+    if "link_result_cache" not in await db.list_collection_names():
+        await db.create_collection("link_result_cache")
+    await db["link_result_cache"].create_index([("cache_key", ASCENDING)], unique=True)
+    await db["link_result_cache"].create_index([("content_hash", ASCENDING), ("kind", ASCENDING)])
+    await db["link_result_cache"].create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    print("✓ link_result_cache")
+
     print("\n🎉 All migrations completed!")
@@ -13,7 +13,7 @@ from urllib.parse import urlparse
 
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from pymongo import DESCENDING
+from pymongo import DESCENDING, ReturnDocument
 
 from src.models.enums import SubmissionStatus, ArticleStatus
 
@@ -180,6 +180,37 @@ class SubmissionRepository:
             "failed_tasks": failed,
         }
 
+    async def amazon_fetch_stats(self, since: datetime) -> Dict[str, Any]:
+        """Share of Amazon scrapes served by each fetch tier, and why the HTTP tier escalated."""
+        pipeline = [
+            {"$match": {"amazon_fetch.tier": {"$exists": True}, "updated_at": {"$gte": since}}},
+            {
+                "$group": {
+                    "_id": {"tier": "$amazon_fetch.tier", "escalation": "$amazon_fetch.escalation"},
+                    "count": {"$sum": 1},
+                }
+            },
+        ]
+        grouped = await self.collection.aggregate(pipeline).to_list(length=None)
+
+        total = sum(item.get("count", 0) for item in grouped)
+        tiers: Dict[str, int] = {}
+        escalations: Dict[str, int] = {}
+        for item in grouped:
+            key = item.get("_id") or {}
+            tiers[key.get("tier")] = tiers.get(key.get("tier"), 0) + item.get("count", 0)
+            if key.get("escalation"):
+                escalations[key["escalation"]] = escalations.get(key["escalation"], 0) + item.get("count", 0)
+
+        return {
+            "total": total,
+            "tiers": {
+                tier: {"count": count, "hit_ratio": round(count / total, 4) if total else 0.0}
+                for tier, count in tiers.items()
+            },
+            "escalations": escalations,
+        }
+
 
 class BookRepository:
     """Repository for book collection operations."""
@@ -200,27 +231,24 @@ class BookRepository:
         payload = extracted if extracted is not None else data
         payload = payload or {}
 
-        existing = await self.collection.find_one({"submission_id": object_id})
-        if existing:
-            merged = {**existing.get("extracted", {}), **payload}
-            await self.collection.update_one(
-                {"_id": existing["_id"]},
-                {
-                    "$set": {
-                        "extracted": merged,
-                        "last_updated": utcnow(),
-                    }
-                },
-            )
-            return str(existing["_id"])
-
-        doc = {
-            "submission_id": object_id,
-            "extracted": payload,
-            "last_updated": utcnow(),
+        # Field-level $set upsert: tasks writing the same book concurrently (the Goodreads enrichment
+        # runs alongside the scrape) never drop each other's keys or insert a second book.
+        update: Dict[str, Any] = {
+            "$set": {
+                **{f"extracted.{key}": value for key, value in payload.items()},
+                "last_updated": utcnow(),
+            }
         }
-        result = await self.collection.insert_one(doc)
-        return str(result.inserted_id)
+        if not payload:
+            update["$setOnInsert"] = {"extracted": {}}
+        doc = await self.collection.find_one_and_update(
+            {"submission_id": object_id},
+            update,
+            projection={"_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return str(doc["_id"])
 
     async def get_by_submission(self, submission_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
         object_id = _to_object_id(submission_id)
@@ -767,3 +795,242 @@ class PipelineConfigRepository:
         result = await self.collection.insert_one(doc)
         return str(result.inserted_id)
 
+
+
+class LLMBatchRepository:
+    """Repository for queued batch LLM requests and the provider jobs that carry them."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.requests = db["llm_batch_requests"]
+        self.jobs = db["llm_batch_jobs"]
+
+    async def get_request(self, custom_id: str) -> Optional[Dict[str, Any]]:
+        return await self.requests.find_one({"custom_id": str(custom_id)})
+
+    async def enqueue_request(self, payload: Dict[str, Any]) -> bool:
+        """Insert a pending request; returns False when ``custom_id`` was already queued."""
+        now = utcnow()
+        doc = {
+            **payload,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        result = await self.requests.update_one(
+            {"custom_id": str(payload["custom_id"])},
+            {"$setOnInsert": doc},
+            upsert=True,
+        )
+        return result.upserted_id is not None
+
+    async def pending_groups(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Distinct provider/model/credential groups with pending requests."""
+        group_key = {"provider": "$provider", "model_id": "$model_id", "credential": "$credential"}
+        pipeline = [
+            {"$match": {"status": "pending"}},
+            {"$group": {"_id": group_key, "count": {"$sum": 1}}},
+            {"$limit": int(limit)},
+        ]
+        groups = await self.requests.aggregate(pipeline).to_list(length=None)
+        return [{**group["_id"], "count": group["count"]} for group in groups]
+
+    async def claim_pending(
+        self,
+        provider: str,
+        model_id: str,
+        credential: Optional[str],
+        claim_id: str,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Atomically move up to ``limit`` pending requests of a group to ``submitting``."""
+        candidates = (
+            await self.requests.find(
+                {"status": "pending", "provider": provider, "model_id": model_id, "credential": credential},
+                {"_id": 1},
+            )
+            .sort("created_at", 1)
+            .to_list(length=int(limit))
+        )
+        if not candidates:
+            return []
+        await self.requests.update_many(
+            {"_id": {"$in": [item["_id"] for item in candidates]}, "status": "pending"},
+            {"$set": {"status": "submitting", "claim_id": claim_id, "updated_at": utcnow()}},
+        )
+        return await self.requests.find({"claim_id": claim_id, "status": "submitting"}).to_list(length=None)
+
+    async def update_requests(
+        self,
+        query: Dict[str, Any],
+        fields: Dict[str, Any],
+        inc: Optional[Dict[str, int]] = None,
+    ) -> int:
+        update: Dict[str, Any] = {"$set": {**fields, "updated_at": utcnow()}}
+        if inc:
+            update["$inc"] = inc
+        result = await self.requests.update_many(query, update)
+        return result.modified_count
+
+    async def store_result(self, custom_id: str, fields: Dict[str, Any]) -> None:
+        await self.requests.update_one(
+            {"custom_id": str(custom_id)},
+            {"$set": {**fields, "updated_at": utcnow()}},
+        )
+
+    async def list_requests_by_job(self, job_id: str) -> List[Dict[str, Any]]:
+        return await self.requests.find({"job_id": str(job_id)}).to_list(length=None)
+
+    async def create_job(self, payload: Dict[str, Any]) -> str:
+        now = utcnow()
+        doc = {**payload, "created_at": now, "updated_at": now}
+        result = await self.jobs.insert_one(doc)
+        return str(result.inserted_id)
+
+    async def list_open_jobs(self) -> List[Dict[str, Any]]:
+        query = {"status": {"$in": ["submitted", "running"]}}
+        return await self.jobs.find(query).sort("created_at", 1).to_list(length=None)
+
+    async def update_job(self, job_id: str, fields: Dict[str, Any]) -> None:
+        await self.jobs.update_one(
+            {"job_id": str(job_id)},
+            {"$set": {**fields, "updated_at": utcnow()}},
+        )
+
+
+class LLMCallRepository:
+    """Repository for the per-call LLM usage/latency ledger."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db["llm_calls"]
+
+    async def insert_many(self, records: List[Dict[str, Any]]) -> int:
+        if not records:
+            return 0
+        result = await self.collection.insert_many(records, ordered=False)
+        return len(result.inserted_ids)
+
+    async def grouped_samples(
+        self,
+        group_by: str,
+        since: datetime,
+        submission_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Group calls by ``step``, ``model`` or ``route`` with raw latency/token samples per group."""
+        group_key: Any = "$step_id"
+        if group_by == "model":
+            group_key = {"provider": "$provider", "model_id": "$model_id"}
+        elif group_by == "route":
+            group_key = {
+                "step_id": "$step_id",
+                "provider": "$provider",
+                "model_id": "$model_id",
+                "reason": "$route.reason",
+            }
+        match: Dict[str, Any] = {"created_at": {"$gte": since}}
+        if group_by == "route":
+            match["route"] = {"$ne": None}
+        if submission_id:
+            match["submission_id"] = str(submission_id)
+
+        def _ok_sample(field: str) -> Dict[str, Any]:
+            return {"$push": {"$cond": [{"$eq": ["$status", "ok"]}, f"${field}", None]}}
+
+        pipeline = [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": group_key,
+                    "calls": {"$sum": 1},
+                    "errors": {"$sum": {"$cond": [{"$eq": ["$status", "error"]}, 1, 0]}},
+                    "cache_hits": {"$sum": {"$cond": ["$cache_hit", 1, 0]}},
+                    "retries": {"$sum": {"$cond": [{"$gt": ["$retry_count", 0]}, 1, 0]}},
+                    "latency_ms": _ok_sample("latency_ms"),
+                    "prompt_tokens": _ok_sample("prompt_tokens"),
+                    "completion_tokens": _ok_sample("completion_tokens"),
+                    "total_tokens": _ok_sample("total_tokens"),
+                }
+            },
+        ]
+        groups = await self.collection.aggregate(pipeline).to_list(length=None)
+        return [{**group, "key": group.pop("_id")} for group in groups]
+
+
+class HttpCacheRepository:
+    """Repository for cached HTTP responses of scraped pages."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db["http_cache"]
+
+    async def get(self, url_key: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"url_key": str(url_key)})
+
+    async def upsert(self, url_key: str, fields: Dict[str, Any]) -> None:
+        await self.collection.update_one(
+            {"url_key": str(url_key)},
+            {"$set": {**fields, "updated_at": utcnow()}, "$setOnInsert": {"url_key": str(url_key)}},
+            upsert=True,
+        )
+
+
+class ProductCacheRepository:
+    """Repository for scraped product data keyed by ASIN and ISBN."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db["product_cache"]
+
+    async def find_fresh(self, keys: List[str], now: datetime) -> Optional[Dict[str, Any]]:
+        """Most recent unexpired product matching any of ``keys``; counts the hit."""
+        return await self.collection.find_one_and_update(
+            {"keys": {"$in": list(keys)}, "expires_at": {"$gt": now}},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": utcnow()}},
+            sort=[("scraped_at", DESCENDING)],
+        )
+
+    async def upsert(self, product_key: str, keys: List[str], fields: Dict[str, Any]) -> None:
+        await self.collection.update_one(
+            {"product_key": str(product_key)},
+            {
+                "$set": {**fields, "updated_at": utcnow()},
+                "$addToSet": {"keys": {"$each": list(keys)}},
+                "$setOnInsert": {"product_key": str(product_key), "hits": 0, "created_at": utcnow()},
+            },
+            upsert=True,
+        )
+
+    async def delete_by_keys(self, keys: List[str]) -> int:
+        result = await self.collection.delete_many({"keys": {"$in": list(keys)}})
+        return result.deleted_count
+
+
+class LinkCacheRepository:
+    """Repository for cross-submission page and link LLM result caches."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.pages = db["page_cache"]
+        self.results = db["link_result_cache"]
+
+    async def get_page(self, url_key: str) -> Optional[Dict[str, Any]]:
+        return await self.pages.find_one({"url_key": str(url_key)})
+
+    async def upsert_page(self, url_key: str, fields: Dict[str, Any]) -> None:
+        now = utcnow()
+        await self.pages.update_one(
+            {"url_key": str(url_key)},
+            {"$set": {**fields, "updated_at": now}, "$setOnInsert": {"url_key": str(url_key), "created_at": now}},
+            upsert=True,
+        )
+
+    async def get_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result and count the hit."""
+        return await self.results.find_one_and_update(
+            {"cache_key": str(cache_key)},
+            {"$inc": {"hits": 1}, "$set": {"last_hit_at": utcnow()}},
+        )
+
+    async def put_result(self, cache_key: str, fields: Dict[str, Any]) -> None:
+        await self.results.update_one(
+            {"cache_key": str(cache_key)},
+            {"$set": fields, "$setOnInsert": {"cache_key": str(cache_key), "hits": 0, "created_at": utcnow()}},
+            upsert=True,
+        )
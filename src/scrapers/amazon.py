@@ -1,5 +1,5 @@
 """
-Amazon.com book scraper using Playwright and BeautifulSoup.
+Amazon.com book scraper using Playwright and CSS-selector HTML parsing.
 
 This module:
 - Navigates to Amazon book product pages
@@ -7,18 +7,25 @@ This module:
 - Handles dynamic content (JavaScript rendering)
 - Implements rate limiting and retry logic
 - Uses proxy rotation and User-Agent rotation
+- Fetches product pages over plain HTTP first, escalating to the browser when needed
+- Renders pages through the worker's shared browser pool
+- Skips images, media, fonts, stylesheets and trackers while loading pages
+- Parses pages with the configured HTML parser backend (html.parser, lxml or selectolax)
 """
 
 import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, Union
 from urllib.parse import urlparse, parse_qs
 import re
 import unicodedata
 
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext
-from bs4 import BeautifulSoup
+import httpx
+from playwright.async_api import Page
+
+from src.config import settings
 
 from .extractors import (
     extract_text,
@@ -38,6 +45,14 @@ from .proxy_manager import (
     BackoffStrategy,
     RequestConfig,
 )
+from .proxy_health import get_proxy_rotator
+from .browser_pool import BrowserPool, get_browser_pool
+from .resource_policy import PageLoadStats, ResourcePolicy
+from .readiness import ReadinessEngine, ReadyResult
+from .domain_rate_limiter import DomainRateLimiter, get_domain_rate_limiter
+from .html_parser import HtmlDocument
+from .http_cache import CachedResponse, HttpCache, HttpCacheMiss, get_http_cache
+from .http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -58,72 +73,187 @@ class AmazonScraper:
         "product_tables": "#productDetails_detailBullets_sections1 tr, #productDetails_techSpec_section_1 tr",
     }
     
+    # Selectors that must be in the server-rendered HTML for the HTTP tier to be accepted.
+    REQUIRED_SELECTORS = ("title",)
+    # At least one of these must be present too (the detail map feeds most fields).
+    DETAIL_SELECTORS = ("detail_bullets", "product_tables")
+    
     # ASIN extraction pattern (Amazon Standard Identification Number)
     ASIN_PATTERN = re.compile(r'/dp/([A-Z0-9]{10})')
     
     def __init__(
         self,
-        rate_limiter: Optional[RateLimiter] = None,
+        rate_limiter: Optional[Union[RateLimiter, DomainRateLimiter]] = None,
         proxy_rotator: Optional[ProxyRotator] = None,
         user_agent_rotator: Optional[UserAgentRotator] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        resource_policy: Optional[ResourcePolicy] = None,
+        readiness: Optional[ReadinessEngine] = None,
+        http_cache: Optional[HttpCache] = None,
     ):
         """Initialize Amazon scraper.
         
         Args:
-            rate_limiter: Rate limiter instance (creates default if None)
-            proxy_rotator: Proxy rotator (optional)
+            rate_limiter: Rate limiter (uses the shared per-domain limiter if None)
+            proxy_rotator: Proxy rotator (uses the shared health-scored rotator if None)
             user_agent_rotator: User-Agent rotator (creates default if None)
+            browser_pool: Browser pool (uses the worker's shared pool if None)
+            resource_policy: Sub-resources aborted during page loads (creates default if None)
+            readiness: Page readiness engine (creates default if None)
+            http_cache: Page cache (uses the process-wide cache if None)
         """
-        self.rate_limiter = rate_limiter or RateLimiter(
-            requests_per_second=0.5,  # 1 request every 2 seconds
-            requests_per_hour=100.0,
-        )
-        self.proxy_rotator = proxy_rotator or ProxyRotator()
+        # Per-domain policies (settings.scraper_rate_limits) shared by all workers through Redis.
+        self.rate_limiter = rate_limiter or get_domain_rate_limiter()
+        # Proxies from settings.scraper_proxies, picked by health score learnt across workers.
+        self.proxy_rotator = proxy_rotator or get_proxy_rotator()
         self.user_agent_rotator = user_agent_rotator or UserAgentRotator()
         
-        self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
-        self._playwright = None
+        self.browser_pool: Optional[BrowserPool] = browser_pool
+        self.resource_policy = resource_policy or ResourcePolicy()
+        self.readiness = readiness or ReadinessEngine()
+        self.http_cache = http_cache or get_http_cache()
+        # Requests, bytes and load time of the last page fetched.
+        self.last_page_stats: Optional[Dict[str, Any]] = None
+        # Tier that produced the last product page ("http" or "browser") and why it escalated.
+        self.last_fetch: Optional[Dict[str, Any]] = None
+        self.http_first = settings.amazon_http_first
     
     async def initialize(self) -> None:
-        """Initialize Playwright browser and context.
+        """Attach the scraper to the browser pool.
         
-        This should be called before scraping to set up the browser.
+        This should be called before scraping. The browser itself is launched
+        (once per worker) by the pool on the first page.
         """
-        logger.info("Initializing Playwright browser")
-        self._playwright = await async_playwright().start()
+        if self.browser_pool is None:
+            self.browser_pool = get_browser_pool()
+    
+    async def cleanup(self) -> None:
+        """Release scraper resources.
         
-        # Get proxy if configured
-        proxy = self.proxy_rotator.get_random()
+        Pages and contexts are closed by the pool after each fetch; the pooled
+        browser stays up for the next scrape and is closed on worker shutdown.
+        HTTP-tier connections belong to the process-wide ``amazon`` client.
+        """
+        logger.debug("Amazon scraper released; pooled browser kept for reuse")
+    
+    async def _fetch_http(self, url: str, config: RequestConfig) -> Optional[str]:
+        """Fetch the server-rendered product page without a browser.
         
-        self.browser = await self._playwright.chromium.launch(
-            headless=True,
-            args=["--disable-blink-features=AutomationControlled"],
-        )
+        Args:
+            url: Product URL
+            config: Request configuration
+        
+        Returns:
+            HTML content or None on HTTP/network errors
+        """
+        # Pooled keep-alive client shared by every scrape of this worker (one per proxy).
+        proxy = await self.proxy_rotator.choose()
+        client = get_http_client("amazon", proxy=proxy)
+
+        async def _send(conditional: Dict[str, str]) -> httpx.Response:
+            await self.rate_limiter.wait(url, proxy=proxy)
+            headers = {**config.get_headers(self.user_agent_rotator.get_random()), **conditional}
+            return await client.get(url, headers=headers, timeout=config.timeout, follow_redirects=True)
         
-        context_args = {
-            "user_agent": self.user_agent_rotator.get_random(),
-            "locale": "en-US",
+        started = time.monotonic()
+        try:
+            response = await self.http_cache.get(url, _send)
+        except HttpCacheMiss:
+            logger.info("Amazon page not in HTTP cache (offline mode): %s", url)
+            return None
+        except httpx.HTTPError as e:
+            logger.info("Amazon HTTP fetch failed for %s: %s", url, e)
+            await self.proxy_rotator.record(proxy, "error")
+            return None
+        load_ms = round((time.monotonic() - started) * 1000, 1)
+        if response.source in ("network", "revalidated"):
+            await self.proxy_rotator.record(proxy, self._http_outcome(response), load_ms)
+        self.last_page_stats = {
+            "url": url,
+            "load_ms": load_ms,
+            "requests": 1,
+            "blocked": 0,
+            "blocked_by_reason": {},
+            "bytes_transferred": response.bytes_transferred,
+            "http_cache": response.source,
         }
+        if response.status_code != 200:
+            logger.info("Amazon HTTP fetch returned %s for %s", response.status_code, url)
+            return None
+        return response.text
+    
+    def _http_outcome(self, response: CachedResponse) -> str:
+        """Proxy health outcome of an HTTP-tier response."""
+        if response.status_code in (429, 503) or (
+            response.status_code == 200 and self._looks_like_block_page(response.text)
+        ):
+            return "blocked"
+        return "error" if response.status_code >= 500 else "success"
+    
+    def _escalation_reason(self, html: Optional[str]) -> Optional[str]:
+        """Why an HTTP-tier page is not good enough and the browser must render it (None = accept)."""
+        if not html:
+            return "http_error"
+        if self._looks_like_error_or_block_page(html):
+            return "blocked"
+        soup = parse_html(html)
+        if any(soup.select_one(self.SELECTORS[name]) is None for name in self.REQUIRED_SELECTORS):
+            return "missing_selectors"
+        if all(soup.select_one(self.SELECTORS[name]) is None for name in self.DETAIL_SELECTORS):
+            return "missing_selectors"
+        return None
+    
+    async def _fetch_product_html(self, url: str, config: RequestConfig) -> Optional[str]:
+        """Fetch a product page through the cheapest tier that yields a usable page.
         
-        if proxy:
-            context_args["proxy"] = {"server": proxy}
+        Tries a plain HTTP GET first; escalates to the browser pool when the
+        response is an error/block page or lacks the required product selectors.
+        The outcome is kept in ``last_fetch`` so tier hit ratios can be tracked.
         
-        self.context = await self.browser.new_context(**context_args)
-        logger.info("Browser and context initialized")
+        Args:
+            url: Product URL
+            config: Request configuration
+        
+        Returns:
+            HTML content or None if every tier failed
+        """
+        escalation = None
+        if self.http_first:
+            html = await self._fetch_http(url, config)
+            escalation = self._escalation_reason(html)
+            if escalation is None:
+                self.last_fetch = {"tier": "http", "escalation": None}
+                logger.info("Amazon page served by HTTP tier: %s", url)
+                return html
+            logger.info("Amazon HTTP tier escalating to browser (%s): %s", escalation, url)
+        
+        self.last_fetch = {"tier": "browser", "escalation": escalation}
+        return await self._fetch_page(url, config)
     
-    async def cleanup(self) -> None:
-        """Clean up browser and context resources."""
-        if self.context:
-            await self.context.close()
-            self.context = None
-        if self.browser:
-            await self.browser.close()
-            self.browser = None
-        if self._playwright:
-            await self._playwright.stop()
-            self._playwright = None
-        logger.info("Browser cleaned up")
+    async def _render_product_page(self, page: Page, url: str, config: RequestConfig) -> str:
+        """Load a product page on a pooled page and return its HTML (runs on the pool loop)."""
+        stats = await self.resource_policy.install(page, url)
+        await page.goto(
+            url,
+            wait_until="domcontentloaded",
+            timeout=config.timeout * 1000,
+        )
+        
+        # Parse as soon as the product title is attached or the DOM settles; don't fail hard otherwise.
+        ready = await self.readiness.wait_ready(
+            page,
+            url,
+            selectors=[self.SELECTORS["title"]],
+            max_wait_seconds=min(config.timeout, settings.scraper_readiness_max_wait_seconds),
+        )
+        
+        html = await page.content()
+        self._record_page_stats(await stats.finish(), ready)
+        return html
+    
+    def _record_page_stats(self, stats: PageLoadStats, ready: ReadyResult) -> None:
+        self.last_page_stats = {**stats.as_dict(), **ready.as_dict()}
+        logger.info("Amazon page loaded: %s, ready by %s (%s)", stats.summary(), ready.signal, stats.url)
     
     async def _fetch_page(
         self,
@@ -141,42 +271,40 @@ class AmazonScraper:
         Returns:
             HTML content or None if failed
         """
-        if not self.context:
+        if not self.browser_pool:
             raise RuntimeError("Scraper not initialized. Call initialize() first.")
         
+        if self.http_cache.offline:
+            # Reprocessing/benchmark runs replay the stored page instead of rendering it.
+            return await self.http_cache.get_offline(url)
+        
         try:
             # Rate limit before request
-            await self.rate_limiter.wait()
+            proxy = await self.proxy_rotator.choose()
+            await self.rate_limiter.wait(url, proxy=proxy)
             
             logger.info(f"Fetching Amazon page (attempt {attempt + 1}): {url}")
             
-            page = await self.context.new_page()
-            
+            # Fresh isolated context per attempt, with its own User-Agent and proxy.
+            started = time.monotonic()
             try:
-                # Navigate with timeout
-                await page.goto(
-                    url,
-                    wait_until="domcontentloaded",
-                    timeout=config.timeout * 1000,
+                content = await self.browser_pool.run(
+                    lambda page: self._render_product_page(page, url, config),
+                    user_agent=self.user_agent_rotator.get_random(),
+                    proxy=proxy,
                 )
-                
-                # Give the page a moment to render dynamic product sections.
-                await page.wait_for_timeout(1200)
-
-                # Wait for a likely product selector, but don't fail hard if not found.
-                try:
-                    await page.wait_for_selector(self.SELECTORS["title"], timeout=min(config.timeout, 15) * 1000)
-                except Exception:
-                    logger.warning("Amazon product title selector not found for %s. Parsing best-effort HTML.", url)
-                
-                # Get HTML content
-                content = await page.content()
-                logger.debug(f"Page fetched successfully: {len(content)} bytes")
-                
-                return content
+            except Exception:
+                await self.proxy_rotator.record(proxy, "error")
+                raise
+            await self.proxy_rotator.record(
+                proxy,
+                "blocked" if self._looks_like_block_page(content) else "success",
+                (time.monotonic() - started) * 1000,
+            )
+            logger.debug(f"Page fetched successfully: {len(content)} bytes")
             
-            finally:
-                await page.close()
+            await self.http_cache.store_rendered(url, content)
+            return content
         
         except Exception as e:
             logger.warning(f"Fetch error (attempt {attempt + 1}): {e}")
@@ -191,7 +319,8 @@ class AmazonScraper:
             logger.error(f"Failed to fetch {url} after {config.max_retries} retries")
             return None
     
-    def _extract_asin(self, url: str) -> Optional[str]:
+    @staticmethod
+    def _extract_asin(url: str) -> Optional[str]:
         """Extract Amazon Standard Identification Number (ASIN) from URL.
         
         Args:
@@ -282,7 +411,7 @@ class AmazonScraper:
                         return text
         return None
 
-    def _extract_detail_map(self, soup: BeautifulSoup) -> Dict[str, str]:
+    def _extract_detail_map(self, soup: HtmlDocument) -> Dict[str, str]:
         detail_map: Dict[str, str] = {}
 
         for li in soup.select(self.SELECTORS["detail_bullets"]):
@@ -482,18 +611,27 @@ class AmazonScraper:
         
         return data
 
-    @staticmethod
-    def _looks_like_error_or_block_page(html: str) -> bool:
+    NOT_FOUND_MARKERS = (
+        "não foi possível encontrar esta página",
+        "nao foi possivel encontrar esta pagina",
+        "sorry! we couldn't find that page",
+    )
+    BLOCK_MARKERS = (
+        "robot check",
+        "captchacharacters",
+        "api-services-support@amazon.com",
+    )
+    
+    @classmethod
+    def _looks_like_block_page(cls, html: str) -> bool:
+        """Captcha/robot-check page (the proxy's fault, unlike a missing product)."""
         text = (html or "").lower()
-        markers = [
-            "não foi possível encontrar esta página",
-            "nao foi possivel encontrar esta pagina",
-            "sorry! we couldn't find that page",
-            "robot check",
-            "captchacharacters",
-            "api-services-support@amazon.com",
-        ]
-        return any(marker in text for marker in markers)
+        return any(marker in text for marker in cls.BLOCK_MARKERS)
+    
+    @classmethod
+    def _looks_like_error_or_block_page(cls, html: str) -> bool:
+        text = (html or "").lower()
+        return any(marker in text for marker in cls.NOT_FOUND_MARKERS + cls.BLOCK_MARKERS)
     
     async def scrape(
         self,
@@ -526,7 +664,7 @@ class AmazonScraper:
                 return None
             
             # Fetch page
-            html = await self._fetch_page(amazon_url, config)
+            html = await self._fetch_product_html(amazon_url, config)
             if not html:
                 return None
             if self._looks_like_error_or_block_page(html):
@@ -0,0 +1,319 @@
+"""
+Long-lived Playwright browser pool shared by the scrapers of a worker process.
+
+This module:
+- Launches Chromium once per worker process instead of once per scrape
+- Hands out an isolated BrowserContext (own cookies, user agent and proxy) per page
+- Recycles the browser after N pages or when its processes cross a memory threshold
+  (measured every few pages, off the pool loop)
+- Closes the browser when the worker shuts down
+
+Celery tasks run each job on a fresh event loop (``asyncio.run``), while Playwright
+objects are bound to the loop that created them. The pool therefore owns a
+dedicated event loop on a daemon thread; scrapers pass a page callback to
+``BrowserPool.run`` and await its result from their own loop.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from playwright.async_api import async_playwright, Browser, Page
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+
+
+def _process_tree_rss_mb(root_pid: int) -> Optional[float]:
+    """Resident memory (MB) of all descendants of ``root_pid`` (Playwright driver + Chromium).
+
+    Uses psutil when installed, /proc otherwise; returns None when neither is available.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        try:
+            children = psutil.Process(root_pid).children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for child in children:
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    if not os.path.isdir("/proc"):
+        return None
+    parents: Dict[int, int] = {}
+    rss_kb: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as handle:
+                for line in handle:
+                    if line.startswith("PPid:"):
+                        parents[int(entry)] = int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss_kb[int(entry)] = int(line.split()[1])
+        except (OSError, ValueError):
+            continue
+
+    descendants = {root_pid}
+    changed = True
+    while changed:
+        changed = False
+        for pid, parent in parents.items():
+            if parent in descendants and pid not in descendants:
+                descendants.add(pid)
+                changed = True
+    descendants.discard(root_pid)
+    return sum(rss_kb.get(pid, 0) for pid in descendants) / 1024
+
+
+class _BrowserSlot:
+    """One launched browser and its usage counters."""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.pages = 0
+        self.active = 0
+        self.retired = False
+        # ``pages`` at the last memory measurement.
+        self.memory_checked_at = 0
+
+
+class BrowserPool:
+    """Per-process Chromium pool handing out one isolated context per page.
+
+    Example:
+        >>> pool = get_browser_pool()
+        >>> html = await pool.run(lambda page: render(page), user_agent=ua, proxy=proxy)
+    """
+
+    def __init__(
+        self,
+        max_pages_per_browser: Optional[int] = None,
+        max_memory_mb: Optional[float] = None,
+        max_contexts: Optional[int] = None,
+        headless: bool = True,
+        memory_check_every_pages: Optional[int] = None,
+    ):
+        """Initialize browser pool (nothing is launched until the first page).
+
+        Args:
+            max_pages_per_browser: Pages served before the browser is recycled (0 = never)
+            max_memory_mb: Browser process memory that triggers a recycle (0 = never)
+            max_contexts: Concurrent contexts (pages) per pool
+            headless: Run Chromium headless
+            memory_check_every_pages: Pages between two memory measurements
+        """
+        self.max_pages_per_browser = int(
+            settings.browser_pool_max_pages if max_pages_per_browser is None else max_pages_per_browser
+        )
+        self.max_memory_mb = float(settings.browser_pool_max_memory_mb if max_memory_mb is None else max_memory_mb)
+        self.max_contexts = max(1, int(settings.browser_pool_max_contexts if max_contexts is None else max_contexts))
+        check_pages = (
+            settings.browser_pool_memory_check_pages if memory_check_every_pages is None else memory_check_every_pages
+        )
+        self.memory_check_every_pages = max(1, int(check_pages))
+        self.headless = headless
+
+        self.pid = os.getpid()
+        self.launches = 0
+        self.pages_served = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._playwright = None
+        self._slot: Optional[_BrowserSlot] = None
+        # Created on the pool loop.
+        self._launch_lock: Optional[asyncio.Lock] = None
+        self._contexts: Optional[asyncio.Semaphore] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._thread_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="browser-pool",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    async def _memory_exceeded(self, slot: _BrowserSlot) -> bool:
+        if self.max_memory_mb <= 0 or slot.pages - slot.memory_checked_at < self.memory_check_every_pages:
+            return False
+        slot.memory_checked_at = slot.pages
+        # Walking the process tree (/proc without psutil) would stall every page on the pool loop.
+        used = await asyncio.to_thread(_process_tree_rss_mb, self.pid)
+        if used is None or used <= self.max_memory_mb:
+            return False
+        logger.info("Browser memory %.0f MB above %.0f MB; recycling browser", used, self.max_memory_mb)
+        return True
+
+    async def _recycle_due(self, slot: _BrowserSlot) -> bool:
+        if not slot.browser.is_connected():
+            return True
+        if self.max_pages_per_browser and slot.pages >= self.max_pages_per_browser:
+            return True
+        return await self._memory_exceeded(slot)
+
+    async def _launch(self) -> _BrowserSlot:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        # Proxies are set per context, so one browser serves proxied and direct pages.
+        browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        self.launches += 1
+        logger.info("Browser pool launched Chromium (launch #%s)", self.launches)
+        return _BrowserSlot(browser)
+
+    async def _close_slot(self, slot: _BrowserSlot) -> None:
+        try:
+            await slot.browser.close()
+        except Exception as exc:
+            logger.debug("Error closing pooled browser: %s", exc)
+
+    async def _acquire_slot(self) -> _BrowserSlot:
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+        async with self._launch_lock:
+            slot = self._slot
+            if slot is not None and await self._recycle_due(slot):
+                # In-flight pages finish on the retired browser; it closes with its last page.
+                slot.retired = True
+                self._slot = None
+                if slot.active == 0:
+                    await self._close_slot(slot)
+            if self._slot is None:
+                self._slot = await self._launch()
+            self._slot.pages += 1
+            self._slot.active += 1
+            return self._slot
+
+    async def _release_slot(self, slot: _BrowserSlot) -> None:
+        slot.active -= 1
+        if slot.retired and slot.active == 0:
+            await self._close_slot(slot)
+
+    async def _run_on_pool(
+        self,
+        callback: Callable[[Page], Awaitable[T]],
+        user_agent: Optional[str],
+        proxy: Optional[str],
+        locale: str,
+    ) -> T:
+        if self._contexts is None:
+            self._contexts = asyncio.Semaphore(self.max_contexts)
+        async with self._contexts:
+            slot = await self._acquire_slot()
+            self.pages_served += 1
+            try:
+                context_args: Dict[str, Any] = {"locale": locale}
+                if user_agent:
+                    context_args["user_agent"] = user_agent
+                if proxy:
+                    context_args["proxy"] = {"server": proxy}
+                context = await slot.browser.new_context(**context_args)
+                try:
+                    page = await context.new_page()
+                    return await callback(page)
+                finally:
+                    await context.close()
+            finally:
+                await self._release_slot(slot)
+
+    async def run(
+        self,
+        callback: Callable[[Page], Awaitable[T]],
+        user_agent: Optional[str] = None,
+        proxy: Optional[str] = None,
+        locale: str = "en-US",
+    ) -> T:
+        """Run ``callback(page)`` on a fresh context of the pooled browser.
+
+        Args:
+            callback: Coroutine function receiving the Page (runs on the pool loop)
+            user_agent: User-Agent for the context
+            proxy: Proxy server URL for the context
+            locale: Browser locale
+
+        Returns:
+            Whatever the callback returns
+        """
+        loop = self._ensure_loop()
+        coroutine = self._run_on_pool(callback, user_agent, proxy, locale)
+        future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def _shutdown(self) -> None:
+        if self._slot is not None:
+            await self._close_slot(self._slot)
+            self._slot = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Close the browser and stop the pool loop (called on worker shutdown)."""
+        with self._thread_lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception as exc:
+            logger.warning("Browser pool shutdown error: %s", exc)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+        self._launch_lock = None
+        self._contexts = None
+
+    def stats(self) -> Dict[str, Any]:
+        slot = self._slot
+        return {
+            "launches": self.launches,
+            "pages_served": self.pages_served,
+            "browser_pages": slot.pages if slot else 0,
+            "active_pages": slot.active if slot else 0,
+        }
+
+
+_browser_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the browser pool of this worker process (recreated after fork)."""
+    global _browser_pool
+    if _browser_pool is None or _browser_pool.pid != os.getpid():
+        _browser_pool = BrowserPool()
+    return _browser_pool
+
+
+def close_browser_pool() -> None:
+    """Close this process's browser pool if one was started."""
+    global _browser_pool
+    if _browser_pool is not None and _browser_pool.pid == os.getpid():
+        _browser_pool.close()
+    _browser_pool = None
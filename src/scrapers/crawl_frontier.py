@@ -0,0 +1,442 @@
+"""
+Crawl frontier for link page fetches.
+
+This module:
+- Takes page fetches from every link pipeline (additional links, web research, link summaries)
+- Deduplicates fetches in flight, within the worker and across workers (Redis claim per URL)
+- Interleaves hosts and caps concurrent fetches per host across all workers (Redis leases)
+- Returns results to the waiting step in request order, like ``asyncio.gather``
+
+Pacing between two requests to the same domain stays with the per-domain rate
+limiter, which the link finder applies to every network fetch; the frontier
+decides which fetches run at the same time. A worker that finds a URL already
+claimed by another worker waits for that fetch to finish and then reads it
+through the link page cache instead of downloading it again. Host leases and
+URL claims are renewed while their fetch runs (it may sit in the rate limiter
+queue for minutes), so they only lapse when the worker holding them dies. When
+Redis is unreachable the frontier keeps the in-process caps and skips the
+shared ones.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+from src.config import settings
+from src.db.connection import get_redis_client
+from src.workers.link_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "pigmeu:frontier"
+# Seconds to skip Redis after a failure before trying it again.
+REDIS_RETRY_AFTER_SECONDS = 30.0
+# Waits for a busy host or claimed URL poll Redis with a delay doubling up to this multiple of poll_seconds.
+MAX_POLL_BACKOFF = 8
+
+# KEYS[1]: host lease zset (member = lease id, score = expiry ms)
+# ARGV: lease_id, per_host_limit, lease_ms
+# Returns 1 when the lease was granted, 0 when the host is at its limit
+_LEASE_SCRIPT = """
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local limit = tonumber(ARGV[2])
+local lease_ms = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_ms)
+if redis.call('ZCARD', KEYS[1]) >= limit then
+  return 0
+end
+redis.call('ZADD', KEYS[1], now_ms + lease_ms, ARGV[1])
+redis.call('PEXPIRE', KEYS[1], lease_ms)
+return 1
+"""
+
+# KEYS[1]: host lease zset, KEYS[2]: URL claim
+# ARGV: lease_id ('' = none), claim token ('' = none), lease_ms
+# Pushes back the expiry of the lease and claim this fetch still holds; returns how many were renewed
+_RENEW_SCRIPT = """
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local lease_ms = tonumber(ARGV[3])
+local renewed = 0
+if ARGV[1] ~= '' and redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+  redis.call('ZADD', KEYS[1], 'XX', now_ms + lease_ms, ARGV[1])
+  redis.call('PEXPIRE', KEYS[1], lease_ms)
+  renewed = renewed + 1
+end
+if ARGV[2] ~= '' and redis.call('GET', KEYS[2]) == ARGV[2] then
+  redis.call('PEXPIRE', KEYS[2], lease_ms)
+  renewed = renewed + 1
+end
+return renewed
+"""
+
+# KEYS[1]: URL claim; ARGV[1]: owner token. Deletes the claim only if this owner still holds it.
+_RELEASE_CLAIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class CrawlFrontierTimeout(RuntimeError):
+    """Raised when a host stays at its concurrency limit longer than the allowed wait."""
+
+    def __init__(self, host: str, wait_seconds: float):
+        super().__init__(f"Crawl frontier: no fetch slot for {host} after {wait_seconds:.1f}s")
+        self.host = host
+        self.wait_seconds = wait_seconds
+
+
+def host_of(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def interleave_by_host(urls: Sequence[str]) -> List[int]:
+    """Indexes of ``urls`` reordered round-robin across hosts (first come, first served per host)."""
+    by_host: "OrderedDict[str, List[int]]" = OrderedDict()
+    for index, url in enumerate(urls):
+        by_host.setdefault(host_of(url), []).append(index)
+    order: List[int] = []
+    while by_host:
+        for host in list(by_host):
+            order.append(by_host[host].pop(0))
+            if not by_host[host]:
+                del by_host[host]
+    return order
+
+
+class _LoopState:
+    """In-process scheduling state; asyncio primitives are bound to the task's event loop."""
+
+    def __init__(self, max_concurrency: int, per_host: int):
+        self.per_host = per_host
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.hosts: Dict[str, asyncio.Semaphore] = {}
+        self.inflight: Dict[str, "asyncio.Future[Any]"] = {}
+
+    def host_slots(self, host: str) -> asyncio.Semaphore:
+        slots = self.hosts.get(host)
+        if slots is None:
+            slots = self.hosts[host] = asyncio.Semaphore(self.per_host)
+        return slots
+
+
+class CrawlFrontier:
+    """Host-aware scheduler for link page fetches.
+
+    Example:
+        >>> pages = await get_crawl_frontier().fetch_many(
+        ...     urls, lambda url: link_cache.fetch_page(url, finder.fetch_and_parse)
+        ... )
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        max_concurrency: Optional[int] = None,
+        per_host_concurrency: Optional[int] = None,
+        lease_seconds: Optional[float] = None,
+        max_wait_seconds: Optional[float] = None,
+        poll_seconds: Optional[float] = None,
+        redis_client_factory: Optional[Callable[[], Awaitable[Any]]] = get_redis_client,
+    ):
+        """Initialize frontier (defaults come from settings).
+
+        Args:
+            enabled: Schedule fetches concurrently; False fetches one by one, as before
+            max_concurrency: Fetches running at once in this worker process
+            per_host_concurrency: Fetches running at once per host, across all workers
+            lease_seconds: How long a host slot or URL claim outlives a crashed fetch (renewed while it runs)
+            max_wait_seconds: Longest wait for a host slot before CrawlFrontierTimeout (or for a URL
+                another worker is fetching, before fetching it anyway)
+            poll_seconds: First interval between checks of busy hosts and claimed URLs
+            redis_client_factory: Coroutine returning a Redis client (None = this process only)
+        """
+        self.enabled = settings.crawl_frontier_enabled if enabled is None else bool(enabled)
+        self.max_concurrency = max(
+            1, int(settings.crawl_frontier_max_concurrency if max_concurrency is None else max_concurrency)
+        )
+        self.per_host_concurrency = max(
+            1,
+            int(
+                settings.crawl_frontier_per_host_concurrency
+                if per_host_concurrency is None
+                else per_host_concurrency
+            ),
+        )
+        self.lease_seconds = float(settings.crawl_frontier_lease_seconds if lease_seconds is None else lease_seconds)
+        self.max_wait_seconds = float(
+            settings.crawl_frontier_max_wait_seconds if max_wait_seconds is None else max_wait_seconds
+        )
+        self.poll_seconds = float(settings.crawl_frontier_poll_seconds if poll_seconds is None else poll_seconds)
+        self._redis_client_factory = redis_client_factory
+        self._redis_disabled_until = 0.0
+        self._states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.requests = 0
+        self.deduplicated = 0
+        self.peer_waits = 0
+        self.host_waits = 0
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState(self.max_concurrency, self.per_host_concurrency)
+        return state
+
+    async def _redis(self) -> Optional[Any]:
+        if self._redis_client_factory is None or time.monotonic() < self._redis_disabled_until:
+            return None
+        try:
+            return await self._redis_client_factory()
+        except Exception as exc:
+            self._redis_failed(exc)
+            return None
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning("Crawl frontier continuing without Redis coordination: %s", exc)
+        self._redis_disabled_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+
+    def _poll_delay(self, attempt: int) -> float:
+        return self.poll_seconds * min(MAX_POLL_BACKOFF, 2 ** attempt)
+
+    async def _claim(self, url_key: str) -> Optional[str]:
+        """Claim ``url_key`` for this worker; waits while another worker fetches it."""
+        token = uuid.uuid4().hex
+        key = f"{KEY_PREFIX}:url:{url_key}"
+        deadline = time.monotonic() + self.max_wait_seconds
+        waited = False
+        attempt = 0
+        while True:
+            client = await self._redis()
+            if client is None:
+                return None
+            try:
+                if await client.set(key, token, nx=True, px=int(self.lease_seconds * 1000)):
+                    return token
+            except Exception as exc:
+                self._redis_failed(exc)
+                return None
+            if not waited:
+                waited = True
+                self.peer_waits += 1
+                logger.debug("Crawl frontier: %s is being fetched by another worker; waiting", url_key)
+            if time.monotonic() >= deadline:
+                # The other fetch is taking too long; fetch anyway rather than stall the step.
+                return None
+            await asyncio.sleep(self._poll_delay(attempt))
+            attempt += 1
+
+    async def _release_claim(self, url_key: str, token: Optional[str]) -> None:
+        if token is None:
+            return
+        client = await self._redis()
+        if client is None:
+            return
+        try:
+            await client.eval(_RELEASE_CLAIM_SCRIPT, 1, f"{KEY_PREFIX}:url:{url_key}", token)
+        except Exception as exc:
+            logger.debug("Crawl frontier claim release failed for %s: %s", url_key, exc)
+
+    async def _lease_host(self, host: str) -> Optional[str]:
+        """Take one of the host's shared fetch slots, waiting while it is at its limit."""
+        lease_id = uuid.uuid4().hex
+        key = f"{KEY_PREFIX}:host:{host}"
+        started = time.monotonic()
+        waited = False
+        attempt = 0
+        while True:
+            client = await self._redis()
+            if client is None:
+                return None
+            try:
+                granted = await client.eval(
+                    _LEASE_SCRIPT,
+                    1,
+                    key,
+                    lease_id,
+                    self.per_host_concurrency,
+                    int(self.lease_seconds * 1000),
+                )
+            except Exception as exc:
+                self._redis_failed(exc)
+                return None
+            if int(granted):
+                return lease_id
+            if not waited:
+                waited = True
+                self.host_waits += 1
+            elapsed = time.monotonic() - started
+            if elapsed >= self.max_wait_seconds:
+                raise CrawlFrontierTimeout(host, elapsed)
+            await asyncio.sleep(self._poll_delay(attempt))
+            attempt += 1
+
+    async def _release_host(self, host: str, lease_id: Optional[str]) -> None:
+        if lease_id is None:
+            return
+        client = await self._redis()
+        if client is None:
+            return
+        try:
+            await client.zrem(f"{KEY_PREFIX}:host:{host}", lease_id)
+        except Exception as exc:
+            logger.debug("Crawl frontier lease release failed for %s: %s", host, exc)
+
+    async def _keep_alive(self, host: str, lease_id: Optional[str], url_key: str, token: Optional[str]) -> None:
+        """Renew the host lease and URL claim every third of their lifetime until cancelled."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            client = await self._redis()
+            if client is None:
+                return
+            try:
+                await client.eval(
+                    _RENEW_SCRIPT,
+                    2,
+                    f"{KEY_PREFIX}:host:{host}",
+                    f"{KEY_PREFIX}:url:{url_key}",
+                    lease_id or "",
+                    token or "",
+                    int(self.lease_seconds * 1000),
+                )
+            except Exception as exc:
+                self._redis_failed(exc)
+                return
+
+    async def _run(self, url: str, url_key: str, fetch: Callable[[str], Awaitable[Any]], state: _LoopState) -> Any:
+        host = host_of(url)
+        async with state.slots:
+            async with state.host_slots(host):
+                token = await self._claim(url_key)
+                try:
+                    lease_id = await self._lease_host(host)
+                    keep_alive = None
+                    if lease_id is not None or token is not None:
+                        keep_alive = asyncio.create_task(self._keep_alive(host, lease_id, url_key, token))
+                    try:
+                        return await fetch(url)
+                    finally:
+                        if keep_alive is not None:
+                            keep_alive.cancel()
+                        await self._release_host(host, lease_id)
+                finally:
+                    await self._release_claim(url_key, token)
+
+    async def fetch(self, url: str, fetch: Callable[[str], Awaitable[Any]]) -> Any:
+        """Fetch one URL through the frontier (joins an identical fetch already in flight).
+
+        Args:
+            url: Page URL
+            fetch: Coroutine function doing the actual fetch (e.g. through the link page cache)
+
+        Returns:
+            Whatever ``fetch`` returns
+
+        Raises:
+            CrawlFrontierTimeout: The host stayed at its limit longer than ``max_wait_seconds``
+        """
+        self.requests += 1
+        if not self.enabled:
+            return await fetch(url)
+
+        state = self._state()
+        url_key = normalize_url(url)
+        pending = state.inflight.get(url_key)
+        if pending is not None:
+            self.deduplicated += 1
+            return await asyncio.shield(pending)
+
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        state.inflight[url_key] = future
+        try:
+            result = await self._run(url, url_key, fetch, state)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Joiners re-raise it; mark it retrieved so an unshared failure is not reported twice.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            state.inflight.pop(url_key, None)
+
+    async def fetch_many(
+        self,
+        urls: Sequence[str],
+        fetch: Callable[[str], Awaitable[Any]],
+    ) -> List[Any]:
+        """Fetch ``urls`` concurrently, hosts interleaved; one result or exception per URL, in order.
+
+        Args:
+            urls: Page URLs (duplicates are fetched once)
+            fetch: Coroutine function doing the actual fetch
+
+        Returns:
+            Results aligned with ``urls``; a failed fetch yields its exception (``return_exceptions``)
+        """
+        results: List[Any] = [None] * len(urls)
+        if not self.enabled:
+            for index, url in enumerate(urls):
+                try:
+                    results[index] = await self.fetch(url, fetch)
+                except Exception as exc:
+                    results[index] = exc
+            return results
+
+        order = interleave_by_host(urls)
+        outcomes = await asyncio.gather(*(self.fetch(urls[index], fetch) for index in order), return_exceptions=True)
+        for index, outcome in zip(order, outcomes):
+            results[index] = outcome
+        return results
+
+    async def host_load(self) -> Dict[str, int]:
+        """Active fetch leases per host across all workers (from Redis)."""
+        client = await self._redis()
+        if client is None:
+            return {}
+        load: Dict[str, int] = {}
+        now_ms = int(time.time() * 1000)
+        try:
+            async for key in client.scan_iter(match=f"{KEY_PREFIX}:host:*"):
+                active = await client.zcount(key, now_ms, "+inf")
+                if active:
+                    load[str(key)[len(f"{KEY_PREFIX}:host:"):]] = int(active)
+        except Exception as exc:
+            self._redis_failed(exc)
+        return load
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "per_host_concurrency": self.per_host_concurrency,
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "peer_waits": self.peer_waits,
+            "host_waits": self.host_waits,
+        }
+
+
+_crawl_frontier: Optional[CrawlFrontier] = None
+
+
+def get_crawl_frontier() -> CrawlFrontier:
+    """Return process-wide crawl frontier (created lazily so settings overrides apply)."""
+    global _crawl_frontier
+    if _crawl_frontier is None:
+        _crawl_frontier = CrawlFrontier()
+    return _crawl_frontier
@@ -0,0 +1,223 @@
+"""
+Distributed per-domain rate limiter for scrapers.
+
+This module:
+- Paces requests per registrable domain (``www.amazon.com.br`` and ``amazon.com.br`` share a bucket)
+- Optionally keys buckets by proxy as well, so each exit IP gets its own quota
+- Enforces a per-second rate with a burst allowance and an hourly cap (GCRA)
+- Keeps bucket state in Redis so every worker process shares it, with a local fallback
+
+``RateLimiter`` in ``proxy_manager`` paces one scraper instance; since scrapers
+are created per task, its limits never held across tasks or workers. This
+limiter is shared by the Amazon, Goodreads and generic scrapers and the link
+finder. Like the LLM limiter, callers atomically book the next free slot and
+then sleep until it, so concurrent workers queue in arrival order.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from src.config import settings
+from src.db.connection import get_redis_client
+from src.scrapers.resource_policy import site_of
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "pigmeu:scrape_rate"
+DEFAULT_POLICY = "default"
+# Seconds to keep using local buckets after a Redis failure before trying Redis again.
+REDIS_RETRY_AFTER_SECONDS = 30.0
+
+# KEYS[1]: bucket hash
+# ARGV: rate_interval, rate_tolerance, hour_interval, hour_tolerance, max_wait
+# Returns {admitted (1|0), wait_seconds}
+_RESERVE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate_interval = tonumber(ARGV[1])
+local rate_tolerance = tonumber(ARGV[2])
+local hour_interval = tonumber(ARGV[3])
+local hour_tolerance = tonumber(ARGV[4])
+local max_wait = tonumber(ARGV[5])
+
+local state = redis.call('HMGET', KEYS[1], 'rate_tat', 'hour_tat')
+local rate_tat = math.max(tonumber(state[1]) or now, now)
+local hour_tat = math.max(tonumber(state[2]) or now, now)
+
+local start = math.max(now, rate_tat - rate_tolerance, hour_tat - hour_tolerance)
+local wait = start - now
+if max_wait >= 0 and wait > max_wait then
+  return {0, tostring(wait)}
+end
+
+rate_tat = math.max(rate_tat, start) + rate_interval
+hour_tat = math.max(hour_tat, start) + hour_interval
+redis.call('HSET', KEYS[1], 'rate_tat', tostring(rate_tat), 'hour_tat', tostring(hour_tat))
+local ttl = math.ceil((math.max(rate_tat, hour_tat) - now) * 1000) + 60000
+redis.call('PEXPIRE', KEYS[1], ttl)
+return {1, tostring(wait)}
+"""
+
+
+class ScraperRateLimitExceeded(RuntimeError):
+    """Raised when the queue ahead of a request is longer than the allowed wait."""
+
+    def __init__(self, bucket: str, wait_seconds: float):
+        super().__init__(f"Scraper rate limit queue for {bucket} is {wait_seconds:.1f}s long")
+        self.bucket = bucket
+        self.wait_seconds = wait_seconds
+
+
+def _bucket_parameters(policy: Dict[str, float]) -> Tuple[float, float, float, float]:
+    """Translate a domain policy into GCRA emission intervals and burst tolerances.
+
+    ``burst`` requests may go out back to back before the per-second pace
+    applies; a full hour of ``requests_per_hour`` may be used as a burst.
+    """
+    rps = float(policy.get("requests_per_second") or 0)
+    rph = float(policy.get("requests_per_hour") or 0)
+    burst = max(1.0, float(policy.get("burst") or 1))
+    rate_interval = 1.0 / rps if rps > 0 else 0.0
+    hour_interval = 3600.0 / rph if rph > 0 else 0.0
+    rate_tolerance = (burst - 1) * rate_interval
+    hour_tolerance = max(0.0, 3600.0 - hour_interval) if rph > 0 else 0.0
+    return rate_interval, rate_tolerance, hour_interval, hour_tolerance
+
+
+def reserve_domain_slot(
+    state: Dict[str, float],
+    now: float,
+    policy: Dict[str, float],
+    max_wait: float,
+) -> Tuple[bool, float]:
+    """Book the next slot in ``state`` (in-process twin of the Redis script).
+
+    Returns ``(admitted, wait_seconds)``. When not admitted the state is untouched.
+    """
+    rate_interval, rate_tolerance, hour_interval, hour_tolerance = _bucket_parameters(policy)
+    rate_tat = max(state.get("rate_tat", now), now)
+    hour_tat = max(state.get("hour_tat", now), now)
+
+    start = max(now, rate_tat - rate_tolerance, hour_tat - hour_tolerance)
+    wait = start - now
+    if max_wait >= 0 and wait > max_wait:
+        return False, wait
+
+    state["rate_tat"] = max(rate_tat, start) + rate_interval
+    state["hour_tat"] = max(hour_tat, start) + hour_interval
+    return True, wait
+
+
+class DomainRateLimiter:
+    """Per-domain request pacing shared by every scraper of every worker.
+
+    Example:
+        >>> await get_domain_rate_limiter().wait("https://www.amazon.com.br/dp/8599296493")
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, Dict[str, float]]] = None,
+        per_proxy: Optional[bool] = None,
+        max_wait_seconds: Optional[float] = None,
+        redis_client_factory: Optional[Callable[[], Awaitable[Any]]] = get_redis_client,
+    ):
+        """Initialize limiter (defaults come from settings).
+
+        Args:
+            policies: ``{domain: {requests_per_second, burst, requests_per_hour}}``, with a "default" entry
+            per_proxy: Key buckets by proxy as well as by domain
+            max_wait_seconds: Longest queue a request accepts before failing fast
+            redis_client_factory: Coroutine returning a Redis client (None = local buckets only)
+        """
+        self.policies = {
+            str(domain).lower(): dict(policy)
+            for domain, policy in (settings.scraper_rate_limits if policies is None else policies).items()
+        }
+        self.per_proxy = settings.scraper_rate_limit_per_proxy if per_proxy is None else bool(per_proxy)
+        self.max_wait_seconds = float(
+            settings.scraper_rate_limit_max_wait_seconds if max_wait_seconds is None else max_wait_seconds
+        )
+        self._redis_client_factory = redis_client_factory
+        self._local_state: Dict[str, Dict[str, float]] = {}
+        self._redis_disabled_until = 0.0
+
+    def policy_for(self, domain: str) -> Dict[str, float]:
+        """Policy of ``domain`` (host or site), layered over the "default" policy."""
+        host = str(domain or "").lower()
+        policy = dict(self.policies.get(DEFAULT_POLICY, {}))
+        policy.update(self.policies.get(site_of(host), {}))
+        policy.update(self.policies.get(host, {}))
+        return policy
+
+    def bucket_key(self, site: str, proxy: Optional[str] = None) -> str:
+        """Build bucket key without leaking proxy credentials."""
+        key = f"{KEY_PREFIX}:{site or DEFAULT_POLICY}"
+        if self.per_proxy:
+            key += ":" + (hashlib.sha256(proxy.encode("utf-8")).hexdigest()[:12] if proxy else "direct")
+        return key
+
+    async def _reserve_redis(self, key: str, policy: Dict[str, float]) -> Optional[Tuple[bool, float]]:
+        if self._redis_client_factory is None or time.monotonic() < self._redis_disabled_until:
+            return None
+        try:
+            client = await self._redis_client_factory()
+            admitted, wait = await client.eval(
+                _RESERVE_SCRIPT,
+                1,
+                key,
+                *_bucket_parameters(policy),
+                self.max_wait_seconds,
+            )
+            return bool(int(admitted)), float(wait)
+        except Exception as exc:
+            logger.warning("Scraper rate limiter falling back to local buckets: %s", exc)
+            self._redis_disabled_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+            return None
+
+    async def wait(self, url: Optional[str] = None, proxy: Optional[str] = None) -> float:
+        """Wait for a request slot on the domain of ``url``.
+
+        Args:
+            url: Request URL (its registrable domain selects the bucket and policy)
+            proxy: Proxy the request goes through (only keys the bucket with ``per_proxy``)
+
+        Returns:
+            Seconds spent waiting in the queue
+
+        Raises:
+            ScraperRateLimitExceeded: If the wait would exceed ``max_wait_seconds``
+        """
+        host = (urlparse(url or "").hostname or "").lower()
+        policy = self.policy_for(host)
+        if not policy.get("requests_per_second") and not policy.get("requests_per_hour"):
+            return 0.0
+
+        key = self.bucket_key(site_of(host), proxy)
+        result = await self._reserve_redis(key, policy)
+        if result is None:
+            state = self._local_state.setdefault(key, {})
+            result = reserve_domain_slot(state, time.time(), policy, self.max_wait_seconds)
+
+        admitted, wait = result
+        if not admitted:
+            raise ScraperRateLimitExceeded(key, wait)
+        if wait > 0:
+            logger.debug("Scraper rate limit: queued %.2fs for %s", wait, key)
+            await asyncio.sleep(wait)
+        return max(0.0, wait)
+
+
+_domain_rate_limiter: Optional[DomainRateLimiter] = None
+
+
+def get_domain_rate_limiter() -> DomainRateLimiter:
+    """Return process-wide domain rate limiter (created lazily so settings overrides apply)."""
+    global _domain_rate_limiter
+    if _domain_rate_limiter is None:
+        _domain_rate_limiter = DomainRateLimiter()
+    return _domain_rate_limiter
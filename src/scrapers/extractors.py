@@ -6,19 +6,20 @@ specific data from web pages using CSS selectors and BeautifulSoup.
 """
 
 from typing import Optional, List, Dict, Any
-from bs4 import BeautifulSoup
 import re
 
+from .html_parser import HtmlDocument, parse_html as _parse_html
+
 
 def extract_text(
-    soup: BeautifulSoup,
+    soup: HtmlDocument,
     selector: str,
     strip: bool = True,
 ) -> Optional[str]:
     """Extract text content from HTML element.
     
     Args:
-        soup: BeautifulSoup object
+        soup: Parsed document (see parse_html)
         selector: CSS selector (e.g., ".price", "#title")
         strip: Whether to strip whitespace
     
@@ -266,16 +267,17 @@ def extract_language(text: str) -> Optional[str]:
     return None
 
 
-def parse_html(html: str) -> BeautifulSoup:
-    """Parse HTML string to BeautifulSoup object.
+def parse_html(html: str, backend: Optional[str] = None) -> HtmlDocument:
+    """Parse HTML string with the configured parser backend.
     
     Args:
         html: HTML string
+        backend: "html.parser", "lxml" or "selectolax" (default from settings)
     
     Returns:
-        BeautifulSoup object using html.parser
+        BeautifulSoup object (html.parser/lxml) or selectolax-backed document
     """
-    return BeautifulSoup(html, 'html.parser')
+    return _parse_html(html, backend)
 
 
 def clean_text(text: str, max_length: Optional[int] = None) -> str:
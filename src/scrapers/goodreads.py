@@ -6,15 +6,18 @@ This module:
 - Extracts book ratings, reviews, and metadata
 - Handles rate limiting and authentication (if needed)
 - Implements retry logic and proxy rotation
+- Renders pages through the worker's shared browser pool
+- Skips images, media, fonts, stylesheets and trackers while loading pages
 """
 
 import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+import time
+from typing import Optional, Dict, Any, List, Union
 from urllib.parse import urlencode, quote_plus
 import re
 
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext
+from playwright.async_api import Page
 from bs4 import BeautifulSoup
 
 from .extractors import (
@@ -22,7 +25,6 @@ from .extractors import (
     extract_rating,
     extract_authors,
     clean_text,
-    parse_html,
 )
 from .proxy_manager import (
     RateLimiter,
@@ -31,6 +33,13 @@ from .proxy_manager import (
     BackoffStrategy,
     RequestConfig,
 )
+from .proxy_health import get_proxy_rotator
+from .browser_pool import BrowserPool, get_browser_pool
+from .resource_policy import PageLoadStats, ResourcePolicy
+from .readiness import ReadinessEngine, ReadyResult
+from .domain_rate_limiter import DomainRateLimiter, get_domain_rate_limiter
+from .html_parser import parse_soup
+from .http_cache import HttpCache, get_http_cache
 
 logger = logging.getLogger(__name__)
 
@@ -57,57 +66,70 @@ class GoodreadsScraper:
     
     def __init__(
         self,
-        rate_limiter: Optional[RateLimiter] = None,
+        rate_limiter: Optional[Union[RateLimiter, DomainRateLimiter]] = None,
         proxy_rotator: Optional[ProxyRotator] = None,
         user_agent_rotator: Optional[UserAgentRotator] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        resource_policy: Optional[ResourcePolicy] = None,
+        readiness: Optional[ReadinessEngine] = None,
+        http_cache: Optional[HttpCache] = None,
     ):
         """Initialize Goodreads scraper.
         
         Args:
-            rate_limiter: Rate limiter (creates default if None)
-            proxy_rotator: Proxy rotator (optional)
+            rate_limiter: Rate limiter (uses the shared per-domain limiter if None)
+            proxy_rotator: Proxy rotator (uses the shared health-scored rotator if None)
             user_agent_rotator: User-Agent rotator (creates default if None)
+            browser_pool: Browser pool (uses the worker's shared pool if None)
+            resource_policy: Sub-resources aborted during page loads (creates default if None)
+            readiness: Page readiness engine (creates default if None)
+            http_cache: Page cache (uses the process-wide cache if None)
         """
-        self.rate_limiter = rate_limiter or RateLimiter(
-            requests_per_second=0.3,  # Goodreads is stricter: 1 request per 3s
-            requests_per_hour=60.0,
-        )
-        self.proxy_rotator = proxy_rotator or ProxyRotator()
+        # Per-domain policies (settings.scraper_rate_limits) shared by all workers through Redis.
+        self.rate_limiter = rate_limiter or get_domain_rate_limiter()
+        self.proxy_rotator = proxy_rotator or get_proxy_rotator()
         self.user_agent_rotator = user_agent_rotator or UserAgentRotator()
         
-        self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
+        self.browser_pool: Optional[BrowserPool] = browser_pool
+        self.resource_policy = resource_policy or ResourcePolicy()
+        self.readiness = readiness or ReadinessEngine()
+        self.http_cache = http_cache or get_http_cache()
+        # Requests, bytes and load time of the last page fetched.
+        self.last_page_stats: Optional[Dict[str, Any]] = None
     
     async def initialize(self) -> None:
-        """Initialize Playwright browser and context."""
-        logger.info("Initializing Playwright browser for Goodreads")
-        playwright = await async_playwright().start()
-        
-        proxy = self.proxy_rotator.get_random()
-        
-        self.browser = await playwright.chromium.launch(
-            headless=True,
-            args=["--disable-blink-features=AutomationControlled"],
+        """Attach the scraper to the browser pool (the browser launches on the first page)."""
+        if self.browser_pool is None:
+            self.browser_pool = get_browser_pool()
+    
+    async def cleanup(self) -> None:
+        """Release scraper resources (the pooled browser stays up for the next scrape)."""
+        logger.debug("Goodreads scraper released; pooled browser kept for reuse")
+    
+    async def _render_page(self, page: Page, url: str, config: RequestConfig) -> str:
+        """Load a Goodreads page on a pooled page and return its HTML (runs on the pool loop)."""
+        stats = await self.resource_policy.install(page, url)
+        await page.goto(
+            url,
+            wait_until="domcontentloaded",
+            timeout=config.timeout * 1000,
         )
         
-        context_args = {
-            "user_agent": self.user_agent_rotator.get_random(),
-            "locale": "en-US",
-        }
-        
-        if proxy:
-            context_args["proxy"] = {"server": proxy}
+        # Wait for the main content (or a settled DOM) instead of network idle.
+        ready = await self.readiness.wait_ready(
+            page,
+            url,
+            selectors=["div[role='main']"],
+            max_wait_seconds=config.timeout,
+        )
         
-        self.context = await self.browser.new_context(**context_args)
-        logger.info("Goodreads browser initialized")
+        html = await page.content()
+        self._record_page_stats(await stats.finish(), ready)
+        return html
     
-    async def cleanup(self) -> None:
-        """Clean up browser resources."""
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
-        logger.info("Goodreads browser cleaned up")
+    def _record_page_stats(self, stats: PageLoadStats, ready: ReadyResult) -> None:
+        self.last_page_stats = {**stats.as_dict(), **ready.as_dict()}
+        logger.info("Goodreads page loaded: %s, ready by %s (%s)", stats.summary(), ready.signal, stats.url)
     
     async def _fetch_page(
         self,
@@ -125,36 +147,34 @@ class GoodreadsScraper:
         Returns:
             HTML content or None
         """
-        if not self.context:
+        if not self.browser_pool:
             raise RuntimeError("Scraper not initialized. Call initialize() first.")
         
+        if self.http_cache.offline:
+            # Reprocessing/benchmark runs replay the stored page instead of rendering it.
+            return await self.http_cache.get_offline(url)
+        
         try:
-            await self.rate_limiter.wait()
+            proxy = await self.proxy_rotator.choose()
+            await self.rate_limiter.wait(url, proxy=proxy)
             
             logger.info(f"Fetching Goodreads page (attempt {attempt + 1}): {url}")
             
-            page = await self.context.new_page()
-            
+            started = time.monotonic()
             try:
-                await page.goto(
-                    url,
-                    wait_until="networkidle",
-                    timeout=config.timeout * 1000,
+                content = await self.browser_pool.run(
+                    lambda page: self._render_page(page, url, config),
+                    user_agent=self.user_agent_rotator.get_random(),
+                    proxy=proxy,
                 )
-                
-                # Wait for content to load
-                await page.wait_for_selector(
-                    "div[role='main']",
-                    timeout=config.timeout * 1000,
-                )
-                
-                content = await page.content()
-                logger.debug(f"Page fetched: {len(content)} bytes")
-                
-                return content
+            except Exception:
+                await self.proxy_rotator.record(proxy, "error")
+                raise
+            await self.proxy_rotator.record(proxy, "success", (time.monotonic() - started) * 1000)
+            logger.debug(f"Page fetched: {len(content)} bytes")
             
-            finally:
-                await page.close()
+            await self.http_cache.store_rendered(url, content)
+            return content
         
         except Exception as e:
             logger.warning(f"Fetch error (attempt {attempt + 1}): {e}")
@@ -210,7 +230,7 @@ class GoodreadsScraper:
                 return []
             
             # Parse results
-            soup = parse_html(html)
+            soup = parse_soup(html)
             results = self._parse_search_results(soup)
             
             logger.info(f"Found {len(results)} results")
@@ -314,7 +334,7 @@ class GoodreadsScraper:
             if not html:
                 return None
             
-            soup = parse_html(html)
+            soup = parse_soup(html)
             book_data = self._parse_book_details(soup)
             book_data["goodreads_url"] = goodreads_url
             
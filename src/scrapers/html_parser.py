@@ -0,0 +1,162 @@
+"""
+Pluggable HTML parser backends for the extractors.
+
+This module:
+- Parses pages with the backend set in ``html_parser_backend``: "html.parser", "lxml" or "selectolax"
+- Exposes selectolax trees through the BeautifulSoup query subset the extractors use
+  (``select``, ``select_one``, ``get_text``, ``get``, ``find_next_sibling``, ``title``)
+- Falls back to the next available backend when lxml/selectolax are not installed
+
+Amazon product pages run to 1-2 MB and the pure-Python ``html.parser`` spends
+most of a scrape's CPU building the tree. lxml builds the same BeautifulSoup
+tree in C; selectolax (lexbor) skips BeautifulSoup entirely. Code that needs
+BeautifulSoup navigation (``find``, ``find_all``, ``find_next``) uses
+``parse_soup``, which never returns a selectolax tree.
+"""
+
+import logging
+from typing import Any, Iterable, List, Optional, Union
+
+from bs4 import BeautifulSoup
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+HTML_PARSER_BACKENDS = ("html.parser", "lxml", "selectolax")
+
+# BeautifulSoup leaves the text of these out of get_text(); selectolax would not.
+_NON_TEXT_TAGS = ["script", "style", "template"]
+
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+_PREFORMATTED_TAGS = {"pre", "textarea"}
+
+_warned_missing = set()
+
+
+def _available(backend: str) -> bool:
+    try:
+        if backend == "lxml":
+            import lxml  # noqa: F401
+        elif backend == "selectolax":
+            import selectolax.lexbor  # noqa: F401
+    except ImportError:
+        if backend not in _warned_missing:
+            _warned_missing.add(backend)
+            logger.warning("HTML parser backend '%s' not installed; falling back", backend)
+        return False
+    return True
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Configured backend, or the nearest installed one (selectolax -> lxml -> html.parser)."""
+    wanted = str(backend or settings.html_parser_backend or "html.parser").lower()
+    if wanted not in HTML_PARSER_BACKENDS:
+        logger.warning("Unknown HTML parser backend '%s'; using html.parser", wanted)
+        return "html.parser"
+    if wanted == "selectolax" and _available("selectolax"):
+        return "selectolax"
+    if wanted in ("selectolax", "lxml") and _available("lxml"):
+        return "lxml"
+    return "html.parser"
+
+
+def _preformatted(node: Any) -> bool:
+    parent = node.parent
+    while parent is not None:
+        if parent.tag in _PREFORMATTED_TAGS:
+            return True
+        parent = parent.parent
+    return False
+
+
+class SelectolaxNode:
+    """BeautifulSoup-compatible view of a selectolax node (query subset used by the extractors)."""
+
+    __slots__ = ("_node",)
+
+    def __init__(self, node: Any):
+        self._node = node
+
+    @property
+    def name(self) -> str:
+        return self._node.tag
+
+    @property
+    def title(self) -> Optional["SelectolaxNode"]:
+        return self.select_one("title")
+
+    def select(self, selector: str) -> List["SelectolaxNode"]:
+        return [SelectolaxNode(node) for node in self._node.css(selector)]
+
+    def select_one(self, selector: str) -> Optional["SelectolaxNode"]:
+        node = self._node.css_first(selector)
+        return SelectolaxNode(node) if node is not None else None
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        if strip:
+            return self._node.text(deep=True, separator=separator, strip=True, skip_empty=True)
+        # Unstripped text follows BeautifulSoup, which collapses whitespace-only strings to "\n" or " ".
+        parts = []
+        for node in self._node.traverse(include_text=True):
+            if node.tag != "-text":
+                continue
+            text = node.text_content or ""
+            if text and not text.strip(_ASCII_SPACES) and not _preformatted(node):
+                text = "\n" if "\n" in text else " "
+            if text:
+                parts.append(text)
+        return separator.join(parts)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._node.attributes.get(key)
+        return default if value is None else value
+
+    def find_next_sibling(self, name: Optional[str] = None) -> Optional["SelectolaxNode"]:
+        node = self._node.next
+        while node is not None:
+            if node.is_element_node and (name is None or node.tag == name):
+                return SelectolaxNode(node)
+            node = node.next
+        return None
+
+    def decompose_tags(self, tags: Iterable[str]) -> None:
+        self._node.strip_tags(list(tags))
+
+
+HtmlDocument = Union[BeautifulSoup, SelectolaxNode]
+
+
+def parse_html(html: str, backend: Optional[str] = None) -> HtmlDocument:
+    """Parse HTML with the configured backend for CSS-selector extraction.
+
+    Args:
+        html: HTML string
+        backend: Override of ``html_parser_backend``
+
+    Returns:
+        BeautifulSoup tree (html.parser/lxml) or a SelectolaxNode for the document
+    """
+    resolved = resolve_backend(backend)
+    if resolved == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(html or "")
+        tree.strip_tags(_NON_TEXT_TAGS)
+        return SelectolaxNode(tree.root)
+    return BeautifulSoup(html or "", resolved)
+
+
+def parse_soup(html: str, backend: Optional[str] = None) -> BeautifulSoup:
+    """Parse HTML into a full BeautifulSoup tree (lxml builder when configured and installed)."""
+    resolved = resolve_backend(backend)
+    return BeautifulSoup(html or "", "lxml" if resolved in ("lxml", "selectolax") else "html.parser")
+
+
+def drop_tags(document: HtmlDocument, tags: Iterable[str]) -> None:
+    """Remove ``tags`` (and their content) from a parsed document."""
+    if isinstance(document, SelectolaxNode):
+        document.decompose_tags(tags)
+        return
+    for node in document(list(tags)):
+        node.decompose()
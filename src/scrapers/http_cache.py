@@ -0,0 +1,248 @@
+"""
+HTTP cache for scraped pages with conditional revalidation.
+
+This module:
+- Stores response bodies (zlib-compressed) in Mongo with their ``ETag``/``Last-Modified``
+- Serves fresh entries per ``Cache-Control``/``Expires`` without touching the network
+- Revalidates stale entries with ``If-None-Match``/``If-Modified-Since`` (304 keeps the body)
+- Offers an offline mode (``http_cache_offline``) that serves only from the cache
+
+Browser-rendered pages have no validators; they are stored so offline runs
+(reprocessing, benchmarks) replay them, but online fetches always render again.
+Cache failures never fail a scrape; they are logged and treated as misses.
+"""
+
+import logging
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from src.config import settings
+from src.workers.link_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+
+class HttpCacheMiss(Exception):
+    """Raised in offline mode when a URL has no cached copy."""
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_aware(value: Any) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _directives(cache_control: str) -> set:
+    return {part.strip().split("=")[0].lower() for part in str(cache_control or "").split(",") if part.strip()}
+
+
+def freshness_expiry(headers: httpx.Headers, now: datetime) -> Optional[datetime]:
+    """When a response stops being fresh (None = store but always revalidate)."""
+    cache_control = headers.get("cache-control", "")
+    if "no-cache" in _directives(cache_control):
+        return None
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        age = headers.get("age", "")
+        already_aged = int(age) if age.isdigit() else 0
+        return now + timedelta(seconds=max(0, int(match.group(1)) - already_aged))
+    expires = headers.get("expires")
+    if expires:
+        try:
+            return _as_aware(parsedate_to_datetime(expires))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class CachedResponse:
+    """Body and provenance of a cached or fetched response."""
+
+    def __init__(self, url: str, status_code: int, text: str, source: str, bytes_transferred: int = 0):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        # "network", "cache" (fresh), "revalidated" (304) or "offline".
+        self.source = source
+        self.bytes_transferred = bytes_transferred
+
+    @property
+    def from_cache(self) -> bool:
+        return self.source != "network"
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise httpx.HTTPStatusError(
+                f"HTTP {self.status_code} for {self.url}",
+                request=httpx.Request("GET", self.url),
+                response=httpx.Response(self.status_code),
+            )
+
+
+class HttpCache:
+    """Conditional-GET cache shared by the link finder and the scrapers."""
+
+    def __init__(
+        self,
+        repo: Any = None,
+        enabled: Optional[bool] = None,
+        offline: Optional[bool] = None,
+        retention_days: Optional[float] = None,
+    ):
+        """Initialize HTTP cache (defaults come from settings).
+
+        Args:
+            repo: HttpCacheRepository (resolved lazily from the DB if None)
+            enabled: Store and reuse responses
+            offline: Serve only from the cache; misses raise HttpCacheMiss
+            retention_days: How long entries are kept for revalidation/offline use
+        """
+        self._repo = repo
+        self.enabled = settings.http_cache_enabled if enabled is None else enabled
+        self.offline = settings.http_cache_offline if offline is None else offline
+        self.retention_days = float(settings.http_cache_retention_days if retention_days is None else retention_days)
+
+    async def _get_repo(self) -> Any:
+        if self._repo is not None:
+            return self._repo
+        from src.db.connection import get_db
+        from src.db.repositories import HttpCacheRepository
+
+        return HttpCacheRepository(await get_db())
+
+    async def _lookup(self, url_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await (await self._get_repo()).get(url_key)
+        except Exception as exc:
+            logger.warning("HTTP cache lookup failed for %s: %s", url_key, exc)
+            return None
+
+    async def _save(self, url_key: str, fields: Dict[str, Any]) -> None:
+        try:
+            await (await self._get_repo()).upsert(url_key, fields)
+        except Exception as exc:
+            logger.warning("HTTP cache write failed for %s: %s", url_key, exc)
+
+    @staticmethod
+    def _body(doc: Dict[str, Any]) -> str:
+        return zlib.decompress(bytes(doc["body"])).decode(doc.get("encoding") or "utf-8", errors="replace")
+
+    def _entry(self, url: str, text: str, encoding: str, now: datetime) -> Dict[str, Any]:
+        return {
+            "url": url,
+            "body": zlib.compress(text.encode(encoding, errors="replace")),
+            "encoding": encoding,
+            "stored_at": now,
+            "purge_at": now + timedelta(days=self.retention_days),
+        }
+
+    async def get(
+        self,
+        url: str,
+        send: Callable[[Dict[str, str]], Awaitable[httpx.Response]],
+    ) -> CachedResponse:
+        """GET ``url`` through the cache.
+
+        Args:
+            url: Page URL
+            send: Performs the request with the given extra (conditional) headers
+
+        Returns:
+            CachedResponse (network, fresh cache, revalidated or offline copy)
+
+        Raises:
+            HttpCacheMiss: Offline mode without a cached copy
+        """
+        if not self.enabled and not self.offline:
+            response = await send({})
+            return CachedResponse(url, response.status_code, response.text, "network", len(response.content))
+
+        url_key = normalize_url(url)
+        doc = await self._lookup(url_key)
+        now = _utcnow()
+        if self.offline:
+            if not doc:
+                raise HttpCacheMiss(url)
+            return CachedResponse(url, int(doc.get("status_code") or 200), self._body(doc), "offline")
+
+        expires_at = _as_aware((doc or {}).get("expires_at"))
+        if doc and expires_at and expires_at > now:
+            return CachedResponse(url, int(doc.get("status_code") or 200), self._body(doc), "cache")
+
+        conditional: Dict[str, str] = {}
+        if doc and doc.get("etag"):
+            conditional["If-None-Match"] = doc["etag"]
+        if doc and doc.get("last_modified"):
+            conditional["If-Modified-Since"] = doc["last_modified"]
+
+        response = await send(conditional)
+        if response.status_code == 304 and doc:
+            await self._save(
+                url_key,
+                {
+                    "expires_at": freshness_expiry(response.headers, now),
+                    "revalidated_at": now,
+                    "purge_at": now + timedelta(days=self.retention_days),
+                },
+            )
+            return CachedResponse(url, int(doc.get("status_code") or 200), self._body(doc), "revalidated")
+
+        cache_control = _directives(response.headers.get("cache-control", ""))
+        if response.status_code == 200 and "no-store" not in cache_control:
+            await self._save(
+                url_key,
+                {
+                    **self._entry(url, response.text, response.encoding or "utf-8", now),
+                    "status_code": response.status_code,
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                    "cache_control": response.headers.get("cache-control"),
+                    "expires_at": freshness_expiry(response.headers, now),
+                },
+            )
+        return CachedResponse(url, response.status_code, response.text, "network", len(response.content))
+
+    async def get_offline(self, url: str) -> Optional[str]:
+        """Cached body of ``url`` (any tier) for offline runs, or None."""
+        doc = await self._lookup(normalize_url(url))
+        return self._body(doc) if doc else None
+
+    async def store_rendered(self, url: str, html: str) -> None:
+        """Keep a browser-rendered page for offline replay (never served as fresh online)."""
+        if not self.enabled or not html:
+            return
+        now = _utcnow()
+        await self._save(
+            normalize_url(url),
+            {
+                **self._entry(url, html, "utf-8", now),
+                "status_code": 200,
+                "etag": None,
+                "last_modified": None,
+                "cache_control": None,
+                "expires_at": None,
+                "rendered": True,
+            },
+        )
+
+
+_http_cache: Optional[HttpCache] = None
+
+
+def get_http_cache() -> HttpCache:
+    """Return process-wide HTTP cache (created lazily so settings overrides apply)."""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HttpCache()
+    return _http_cache
@@ -0,0 +1,434 @@
+"""
+Process-wide pooled HTTP clients.
+
+This module:
+- Keeps one long-lived ``httpx.AsyncClient`` per name and proxy (keep-alive, HTTP/2 when ``h2`` is installed)
+- Caps concurrent requests per host and caches DNS lookups
+- Counts connection reuse and per-host pool saturation
+- Streams capped downloads (``get_capped``), rejecting unwanted content types before the body
+- Is closed with the API app (lifespan) or the worker process (``worker_process_shutdown``)
+
+Celery tasks run each job on a fresh event loop (``asyncio.run``), and an
+``httpx.AsyncClient`` is bound to the loop its connections were opened on. As
+with the browser pool, clients therefore live on a dedicated event loop thread;
+callers await ``SharedHttpClient.request`` from their own loop and receive a
+fully read response.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+import httpcore
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Headers describing the wire body; dropped once a capped download is rebuilt from decoded bytes.
+_WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class ContentTypeRejected(Exception):
+    """Raised by ``get_capped`` when a response's content type is not accepted."""
+
+    def __init__(self, url: str, content_type: str):
+        super().__init__(f"Rejected content type '{content_type}' for {url}")
+        self.url = url
+        self.content_type = content_type
+
+
+def _media_type(content_type: str) -> str:
+    return str(content_type or "").split(";", 1)[0].strip().lower()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """Network backend resolving hostnames through a TTL cache before connecting.
+
+    TLS still uses the request hostname for SNI and certificate checks; only the
+    TCP connect goes to the cached address.
+    """
+
+    def __init__(self, ttl_seconds: float, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self.ttl_seconds = ttl_seconds
+        self._backend = backend or httpcore.AnyIOBackend()
+        self._cache: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _resolve(self, host: str, port: int) -> str:
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+        now = time.monotonic()
+        cached = self._cache.get((host, port))
+        if cached and cached[0] > now:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        address = infos[0][4][0]
+        self._cache[(host, port)] = (now + self.ttl_seconds, address)
+        return address
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        address = await self._resolve(host, port)
+        return await self._backend.connect_tcp(
+            address,
+            port,
+            timeout=timeout,
+            local_address=local_address,
+            socket_options=socket_options,
+        )
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _HostStats:
+    """Concurrency gate and saturation counters for one host."""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.requests = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.saturated = 0
+        self.wait_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "saturated": self.saturated,
+            "wait_ms": round(self.wait_ms, 1),
+        }
+
+
+class SharedHttpClient:
+    """One pooled client served from the registry loop.
+
+    Example:
+        >>> client = get_http_client("wordpress")
+        >>> response = await client.get(url, headers=headers, timeout=20)
+    """
+
+    def __init__(self, name: str, registry: "HttpClientRegistry", proxy: Optional[str] = None):
+        self.name = name
+        self.registry = registry
+        self.proxy = proxy
+        self.requests = 0
+        self.new_connections = 0
+        self.truncated = 0
+        self.rejected = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._dns: Optional[_CachingDNSBackend] = None
+        self._hosts: Dict[str, _HostStats] = {}
+
+    def _build(self) -> httpx.AsyncClient:
+        registry = self.registry
+        transport = httpx.AsyncHTTPTransport(
+            http2=registry.http2,
+            limits=registry.limits,
+            retries=1,
+            proxy=httpx.Proxy(self.proxy) if self.proxy else None,
+        )
+        self._dns = _CachingDNSBackend(registry.dns_ttl_seconds)
+        pool = getattr(transport, "_pool", None)
+        # Proxied transports keep their proxy pool (the proxy resolves the target hosts).
+        if type(pool) is httpcore.AsyncConnectionPool:
+            # httpx has no network backend hook; the transport's pool is rebuilt with the caching backend.
+            transport._pool = httpcore.AsyncConnectionPool(
+                ssl_context=httpx.create_ssl_context(),
+                max_connections=registry.limits.max_connections,
+                max_keepalive_connections=registry.limits.max_keepalive_connections,
+                keepalive_expiry=registry.limits.keepalive_expiry,
+                http2=registry.http2,
+                retries=1,
+                network_backend=self._dns,
+            )
+        return httpx.AsyncClient(transport=transport, timeout=registry.timeout_seconds)
+
+    async def _trace(self, event_name: str, _info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    async def _read_capped(
+        self,
+        method: str,
+        url: str,
+        kwargs: Dict[str, Any],
+        max_bytes: int,
+        content_types: Optional[Iterable[str]],
+    ) -> httpx.Response:
+        async with self._client.stream(method, url, **kwargs) as response:
+            media_type = _media_type(response.headers.get("content-type", ""))
+            if content_types and media_type and response.status_code == 200 and media_type not in content_types:
+                self.rejected += 1
+                raise ContentTypeRejected(url, media_type)
+
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) >= max_bytes:
+                    break
+            truncated = len(body) >= max_bytes
+            if truncated:
+                self.truncated += 1
+            headers = [
+                (key, value) for key, value in response.headers.multi_items() if key.lower() not in _WIRE_HEADERS
+            ]
+            return httpx.Response(
+                response.status_code,
+                headers=headers,
+                content=bytes(body[:max_bytes]),
+                request=response.request,
+                extensions={"http_version": response.http_version.encode(), "truncated": truncated},
+            )
+
+    async def _request_on_pool(
+        self,
+        method: str,
+        url: str,
+        kwargs: Dict[str, Any],
+        max_bytes: Optional[int] = None,
+        content_types: Optional[Iterable[str]] = None,
+    ) -> httpx.Response:
+        if self._client is None:
+            self._client = self._build()
+        host = httpx.URL(url).host
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = _HostStats(self.registry.max_per_host)
+
+        stats.requests += 1
+        self.requests += 1
+        waiting = stats.semaphore.locked()
+        if waiting:
+            stats.saturated += 1
+            stats.queued += 1
+            stats.peak_queued = max(stats.peak_queued, stats.queued)
+        started = time.monotonic()
+        async with stats.semaphore:
+            if waiting:
+                stats.queued -= 1
+            stats.wait_ms += (time.monotonic() - started) * 1000
+            stats.in_flight += 1
+            try:
+                kwargs["extensions"] = {**(kwargs.get("extensions") or {}), "trace": self._trace}
+                if max_bytes is not None:
+                    return await self._read_capped(method, url, kwargs, max_bytes, content_types)
+                return await self._client.request(method, url, **kwargs)
+            finally:
+                stats.in_flight -= 1
+
+    async def _run_on_pool(self, coro: Any) -> httpx.Response:
+        future = asyncio.run_coroutine_threadsafe(coro, self.registry._ensure_loop())
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request on the pooled client (``httpx.AsyncClient.request`` arguments)."""
+        return await self._run_on_pool(self._request_on_pool(method, url, kwargs))
+
+    async def get_capped(
+        self,
+        url: str,
+        max_bytes: int,
+        content_types: Optional[Iterable[str]] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """GET ``url`` streaming at most ``max_bytes`` of (decoded) body.
+
+        The connection is released as soon as the cap is reached, and a 200
+        response whose media type is not in ``content_types`` is rejected from
+        its headers, before any of the body is read.
+
+        Args:
+            url: Page URL
+            max_bytes: Body bytes kept; the rest is never downloaded
+            content_types: Accepted media types (e.g. ``text/html``); None accepts any
+            **kwargs: ``httpx.AsyncClient.stream`` arguments (headers, timeout...)
+
+        Returns:
+            Fully read response; ``response.extensions["truncated"]`` tells whether the cap was hit
+
+        Raises:
+            ContentTypeRejected: Response media type not accepted
+        """
+        accepted = {_media_type(item) for item in content_types} if content_types else None
+        return await self._run_on_pool(self._request_on_pool("GET", url, kwargs, int(max_bytes), accepted))
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        reused = max(0, self.requests - self.new_connections)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "truncated": self.truncated,
+            "rejected": self.rejected,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            "dns_cache": {"hits": self._dns.hits, "misses": self._dns.misses} if self._dns else None,
+            "hosts": {host: stats.as_dict() for host, stats in self._hosts.items()},
+        }
+
+
+class HttpClientRegistry:
+    """Named pooled clients of one process, served from a dedicated event loop."""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        max_per_host: Optional[int] = None,
+        http2: Optional[bool] = None,
+        dns_ttl_seconds: Optional[float] = None,
+        timeout_seconds: float = 20.0,
+    ):
+        """Initialize client registry (clients are created on first use).
+
+        Args:
+            max_connections: Open connections per client
+            max_keepalive_connections: Idle connections kept per client
+            keepalive_expiry: Seconds an idle connection is kept
+            max_per_host: Concurrent requests per host and client
+            http2: Negotiate HTTP/2 (requires the ``h2`` package)
+            dns_ttl_seconds: How long resolved addresses are reused
+            timeout_seconds: Default request timeout
+        """
+        self.limits = httpx.Limits(
+            max_connections=settings.http_client_max_connections if max_connections is None else max_connections,
+            max_keepalive_connections=(
+                settings.http_client_max_keepalive
+                if max_keepalive_connections is None
+                else max_keepalive_connections
+            ),
+            keepalive_expiry=(
+                settings.http_client_keepalive_expiry_seconds if keepalive_expiry is None else keepalive_expiry
+            ),
+        )
+        self.max_per_host = max(1, int(settings.http_client_max_per_host if max_per_host is None else max_per_host))
+        wants_http2 = settings.http_client_http2 if http2 is None else http2
+        self.http2 = bool(wants_http2) and _http2_available()
+        if wants_http2 and not self.http2:
+            logger.info("h2 not installed; pooled HTTP clients use HTTP/1.1")
+        self.dns_ttl_seconds = float(
+            settings.http_client_dns_ttl_seconds if dns_ttl_seconds is None else dns_ttl_seconds
+        )
+        self.timeout_seconds = timeout_seconds
+
+        self.pid = os.getpid()
+        self._clients: Dict[str, SharedHttpClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="http-clients", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def client(self, name: str = "default", proxy: Optional[str] = None) -> SharedHttpClient:
+        """Pooled client ``name``; each proxy gets its own client, listed as ``name@proxy-host:port``."""
+        key = name
+        if proxy:
+            proxy_url = httpx.URL(proxy)
+            key = f"{name}@{proxy_url.host}:{proxy_url.port or ''}".rstrip(":")
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = SharedHttpClient(key, self, proxy=proxy)
+            return client
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Close every client and stop the registry loop."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            clients: List[SharedHttpClient] = list(self._clients.values())
+            self._loop, self._thread = None, None
+            self._clients = {}
+        if loop is None or loop.is_closed():
+            return
+
+        async def _close_all() -> None:
+            await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close_all(), loop).result(timeout)
+        except Exception as exc:
+            logger.warning("HTTP client shutdown error: %s", exc)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "max_per_host": self.max_per_host,
+            "clients": {name: client.stats() for name, client in self._clients.items()},
+        }
+
+
+_registry: Optional[HttpClientRegistry] = None
+
+
+def get_http_client_registry() -> HttpClientRegistry:
+    """Return the client registry of this process (recreated after fork)."""
+    global _registry
+    if _registry is None or _registry.pid != os.getpid():
+        _registry = HttpClientRegistry()
+    return _registry
+
+
+def get_http_client(name: str = "default", proxy: Optional[str] = None) -> SharedHttpClient:
+    """Return the pooled client ``name`` of this process (one per ``proxy`` when given)."""
+    return get_http_client_registry().client(name, proxy=proxy)
+
+
+def close_http_clients() -> None:
+    """Close this process's pooled clients if any were started."""
+    global _registry
+    if _registry is not None and _registry.pid == os.getpid():
+        logger.info("Closing pooled HTTP clients: %s", _registry.stats())
+        _registry.close()
+    _registry = None
@@ -2,32 +2,52 @@
 
 from __future__ import annotations
 
+import logging
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from urllib.parse import quote_plus, urlparse
 
-import httpx
-from bs4 import BeautifulSoup
+from src.config import settings
+from src.scrapers.domain_rate_limiter import get_domain_rate_limiter
+from src.scrapers.html_parser import drop_tags, parse_html
+from src.scrapers.http_cache import get_http_cache
+from src.scrapers.http_clients import ContentTypeRejected, get_http_client
 
 from src.workers.ai_defaults import DEFAULT_MODEL_ID
+from src.workers.link_cache import LinkCache
 from src.workers.llm_client import LLMClient
+from src.workers.prompt_budget import truncate_to_tokens
 from src.workers.prompt_builder import build_user_prompt_with_output_format
 
+logger = logging.getLogger(__name__)
+
 
 class LinkFinder:
     """Find and summarize external links related to a book."""
 
     SEARCH_URL = "https://duckduckgo.com/html/"
+    # Page text kept per link; prompts apply their own per-step budgets on top.
+    PAGE_TEXT_MAX_TOKENS = 1500
+    SUMMARY_CONTENT_MAX_TOKENS = 700
+    # Paragraph text gathered before extraction stops; well above PAGE_TEXT_MAX_TOKENS
+    # at any realistic chars/token ratio, so truncate_to_tokens still decides the cut.
+    PAGE_TEXT_MAX_CHARS = PAGE_TEXT_MAX_TOKENS * 8
 
     async def search_book_links(self, title: str, author: str, count: int = 3) -> List[Dict[str, str]]:
         query = f'"{title}" "{author}" book review summary'
         url = f"{self.SEARCH_URL}?q={quote_plus(query)}"
 
-        async with httpx.AsyncClient(timeout=15, follow_redirects=True) as client:
-            response = await client.get(url)
-            response.raise_for_status()
+        client = get_http_client("links")
+
+        async def _send(headers: Dict[str, str]):
+            # Only requests that reach the network count against the domain quota.
+            await get_domain_rate_limiter().wait(url)
+            return await client.get(url, headers=headers, timeout=15, follow_redirects=True)
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        response = await get_http_cache().get(url, _send)
+        response.raise_for_status()
+
+        soup = parse_html(response.text)
         results: List[Dict[str, str]] = []
 
         # Preferred DDG selectors
@@ -51,8 +71,8 @@ class LinkFinder:
 
         if len(results) < count:
             # Generic fallback
-            for link in soup.find_all("a", href=True):
-                href = link["href"]
+            for link in soup.select("a[href]"):
+                href = link.get("href", "")
                 if not href.startswith("http"):
                     continue
                 if any(href == item["url"] for item in results):
@@ -67,27 +87,51 @@ class LinkFinder:
         return results[:count]
 
     async def fetch_and_parse(self, url: str) -> str:
-        async with httpx.AsyncClient(timeout=20, follow_redirects=True) as client:
-            response = await client.get(url)
-            response.raise_for_status()
+        client = get_http_client("links")
+
+        async def _send(headers: Dict[str, str]):
+            await get_domain_rate_limiter().wait(url)
+            return await client.get_capped(
+                url,
+                settings.link_fetch_max_bytes,
+                settings.link_fetch_content_types,
+                headers=headers,
+                timeout=20,
+                follow_redirects=True,
+            )
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        try:
+            response = await get_http_cache().get(url, _send)
+        except ContentTypeRejected as exc:
+            # PDFs, images, feeds...: nothing to summarize, and the body is never downloaded.
+            logger.info("Skipping %s: %s", url, exc.content_type)
+            return ""
+        response.raise_for_status()
 
-        for node in soup(["script", "style", "noscript"]):
-            node.decompose()
+        soup = parse_html(response.text)
+        drop_tags(soup, ["script", "style", "noscript"])
 
-        paragraphs = [p.get_text(" ", strip=True) for p in soup.find_all("p")]
-        text = "\n".join([p for p in paragraphs if p])
-        text = re.sub(r"\s+", " ", text).strip()
+        paragraphs: List[str] = []
+        gathered = 0
+        for node in soup.select("p"):
+            paragraph = node.get_text(" ", strip=True)
+            if not paragraph:
+                continue
+            paragraphs.append(paragraph)
+            gathered += len(paragraph)
+            if gathered >= self.PAGE_TEXT_MAX_CHARS:
+                break
+        text = re.sub(r"\s+", " ", "\n".join(paragraphs)).strip()
 
         # Keep content bounded for prompts
-        return text[:5000]
+        return truncate_to_tokens(text, self.PAGE_TEXT_MAX_TOKENS)
 
     async def summarize_page(
         self,
         content: str,
         title: str,
         prompt_doc: Dict[str, Any] | None = None,
+        cache: Optional[LinkCache] = None,
     ) -> Dict[str, Any]:
         if not content.strip():
             return {
@@ -130,24 +174,34 @@ class LinkFinder:
                 "max_tokens": 500,
             }
 
+        model_id = prompt_doc.get("model_id", DEFAULT_MODEL_ID)
+        cache_key = cache.result_key("link_finder_summary", content, prompt_doc, title=title) if cache else None
+        if cache_key:
+            cached = await cache.get_result(cache_key, provider=prompt_doc.get("provider"), model_id=model_id)
+            if isinstance(cached, dict):
+                return cached
+        page_content = content
+        content = truncate_to_tokens(content, self.SUMMARY_CONTENT_MAX_TOKENS, model_id)
         user_prompt = prompt_doc.get("user_prompt", "")
         user_prompt = user_prompt.replace("{{title}}", title)
         user_prompt = user_prompt.replace("{title}", title)
-        user_prompt = user_prompt.replace("{{content}}", content[:2500])
-        user_prompt = user_prompt.replace("{content}", content[:2500])
+        user_prompt = user_prompt.replace("{{content}}", content)
+        user_prompt = user_prompt.replace("{content}", content)
         user_prompt = build_user_prompt_with_output_format(user_prompt, prompt_doc)
 
         llm = LLMClient()
+        generated = True
         try:
             summary = await llm.generate_with_retry(
                 system_prompt=prompt_doc.get("system_prompt", ""),
                 user_prompt=user_prompt,
-                model_id=prompt_doc.get("model_id", DEFAULT_MODEL_ID),
+                model_id=model_id,
                 temperature=prompt_doc.get("temperature", 0.4),
                 max_tokens=prompt_doc.get("max_tokens", 500),
             )
         except Exception:
             summary = content[:700]
+            generated = False
 
         # Lightweight extraction of topics from text
         words = [w.strip(".,:;!?()[]{}\"'") for w in summary.split()]
@@ -161,12 +215,16 @@ class LinkFinder:
         key_points = [line.strip("- ") for line in summary.splitlines() if line.strip().startswith("-")][:5]
 
         credibility = "medium"
-        return {
+        result = {
             "summary": summary,
             "topics": topics,
             "key_points": key_points,
             "credibility": credibility,
         }
+        if cache_key and generated:
+            # Fallback text is not cached so the next submission retries the LLM.
+            await cache.put_result(cache_key, "link_finder_summary", page_content, prompt_doc, result)
+        return result
 
     @staticmethod
     def get_domain(url: str) -> str:
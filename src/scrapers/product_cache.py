@@ -0,0 +1,161 @@
+"""
+Cache of scraped Amazon product data keyed by ASIN and ISBN.
+
+This module:
+- Keys products by ASIN (``AmazonScraper._extract_asin``) and by ISBN-13 (ISBN-10 is converted)
+- Resolves URL variants (query strings, ``ref=`` paths, locales) to the same entry through the ASIN
+- Serves entries scraped within ``amazon_product_cache_ttl_hours`` instead of scraping again
+- Expires entries through a Mongo TTL index
+
+Resubmitting a deleted book or running it through another pipeline reuses the
+data scraped earlier. An explicit retry of ``amazon_scrape`` drops the entry
+and scrapes again, since retries usually mean the stored data was bad. Only
+scrapes with a title are stored. Cache failures never fail the scrape; they
+are logged and treated as misses.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+from src.scrapers.amazon import AmazonScraper
+
+logger = logging.getLogger(__name__)
+
+_ISBN_CHARS = re.compile(r"[^0-9X]")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    return str((10 - sum(int(char) * (3 if index % 2 else 1) for index, char in enumerate(first12)) % 10) % 10)
+
+
+def normalize_isbn(value: Any) -> Optional[str]:
+    """ISBN-13 for a valid ISBN-10/ISBN-13 (hyphens and spaces ignored), else None."""
+    raw = _ISBN_CHARS.sub("", str(value or "").upper())
+    if len(raw) == 10 and raw[:9].isdigit():
+        total = sum((10 - index) * (10 if char == "X" else int(char)) for index, char in enumerate(raw))
+        if total % 11:
+            return None
+        return "978" + raw[:9] + _isbn13_check_digit("978" + raw[:9])
+    if len(raw) == 13 and raw.isdigit() and raw[12] == _isbn13_check_digit(raw[:12]):
+        return raw
+    return None
+
+
+def product_keys(
+    url: Optional[str] = None,
+    data: Optional[Dict[str, Any]] = None,
+    isbn: Optional[str] = None,
+) -> List[str]:
+    """Cache keys of a product: ``asin:<ASIN>`` first, then ``isbn:<ISBN-13>`` keys.
+
+    Print books use their ISBN-10 as ASIN, so an ASIN that is a valid ISBN-10
+    also yields its ISBN key.
+    """
+    data = data or {}
+    asin = str(data.get("asin") or AmazonScraper._extract_asin(url or "") or "").upper()
+    keys = [f"asin:{asin}"] if asin else []
+    for candidate in (asin, isbn, data.get("isbn_13"), data.get("isbn_10"), data.get("isbn")):
+        normalized = normalize_isbn(candidate)
+        if normalized and f"isbn:{normalized}" not in keys:
+            keys.append(f"isbn:{normalized}")
+    return keys
+
+
+class ProductCache:
+    """Scraped product data shared by every submission of the same book."""
+
+    def __init__(
+        self,
+        repo: Any = None,
+        enabled: Optional[bool] = None,
+        ttl_hours: Optional[float] = None,
+    ):
+        """Initialize product cache (defaults come from settings).
+
+        Args:
+            repo: ProductCacheRepository (resolved lazily from the DB if None)
+            enabled: Store and reuse scraped products
+            ttl_hours: How long a scrape is served before the product is scraped again
+        """
+        self._repo = repo
+        self.enabled = settings.amazon_product_cache_enabled if enabled is None else enabled
+        self.ttl_hours = float(settings.amazon_product_cache_ttl_hours if ttl_hours is None else ttl_hours)
+
+    async def _get_repo(self) -> Any:
+        if self._repo is not None:
+            return self._repo
+        from src.db.connection import get_db
+        from src.db.repositories import ProductCacheRepository
+
+        return ProductCacheRepository(await get_db())
+
+    async def get(self, url: str, isbn: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Fresh product data for ``url`` (or ``isbn``), with ``amazon_url`` set to ``url``; None on a miss."""
+        keys = product_keys(url=url, isbn=isbn)
+        if not self.enabled or not keys or self.ttl_hours <= 0:
+            return None
+        try:
+            doc = await (await self._get_repo()).find_fresh(keys, _utcnow())
+        except Exception as exc:
+            logger.warning("Product cache lookup failed for %s: %s", url, exc)
+            return None
+        if not doc or not doc.get("data"):
+            return None
+        logger.info(
+            "Amazon product served from cache (%s, scraped at %s): %s",
+            doc.get("product_key"),
+            doc.get("scraped_at"),
+            url,
+        )
+        return {**doc["data"], "amazon_url": url}
+
+    async def put(self, url: str, data: Dict[str, Any]) -> None:
+        """Store a successful scrape under its ASIN and ISBN keys."""
+        keys = product_keys(url=url, data=data)
+        if not self.enabled or not keys or not (data or {}).get("title"):
+            return
+        now = _utcnow()
+        try:
+            await (await self._get_repo()).upsert(
+                keys[0],
+                keys,
+                {
+                    "url": url,
+                    "data": {key: value for key, value in data.items() if key != "amazon_url"},
+                    "scraped_at": now,
+                    "expires_at": now + timedelta(hours=self.ttl_hours),
+                },
+            )
+        except Exception as exc:
+            logger.warning("Product cache write failed for %s: %s", url, exc)
+
+    async def invalidate(self, url: str, isbn: Optional[str] = None) -> None:
+        """Drop the cached product of ``url`` (or ``isbn``) so the next lookup misses."""
+        keys = product_keys(url=url, isbn=isbn)
+        if not self.enabled or not keys:
+            return
+        try:
+            deleted = await (await self._get_repo()).delete_by_keys(keys)
+        except Exception as exc:
+            logger.warning("Product cache invalidation failed for %s: %s", url, exc)
+            return
+        if deleted:
+            logger.info("Dropped %s cached product entries for %s", deleted, url)
+
+
+_product_cache: Optional[ProductCache] = None
+
+
+def get_product_cache() -> ProductCache:
+    """Return process-wide product cache (created lazily so settings overrides apply)."""
+    global _product_cache
+    if _product_cache is None:
+        _product_cache = ProductCache()
+    return _product_cache
@@ -0,0 +1,421 @@
+"""
+Health-scored proxy rotation shared across workers.
+
+This module:
+- Scores each proxy from its success rate, block-page rate and latency (exponentially weighted)
+- Picks proxies at random weighted by score instead of uniformly
+- Ejects a proxy after consecutive failures, for a period that doubles on every new ejection
+- Lets exactly one probe request through when the ejection ends; success restores the proxy,
+  failure ejects it again. Requests already in flight when the proxy was ejected only
+  update its scores
+- Keeps health in Redis so every worker learns from every request (local fallback without Redis)
+
+Proxies come from ``scraper_proxies``. Scrapers call ``choose()`` before a
+request and ``record()`` with the outcome; with no proxies configured both are
+no-ops and requests go out directly.
+"""
+
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from src.config import settings
+from src.db.connection import get_redis_client
+from src.scrapers.proxy_manager import ProxyRotator
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "pigmeu:proxy_health"
+OUTCOMES = ("success", "blocked", "error")
+# Floor weight so a poorly scored (but not ejected) proxy still gets the odd request to recover.
+MIN_WEIGHT = 0.02
+# How long a claimed probe is reserved for its request before another worker may probe.
+PROBE_SECONDS = 60.0
+# Health of proxies that stop being used expires after a week.
+STATE_TTL_SECONDS = 7 * 24 * 3600
+# Seconds to keep using local health after a Redis failure before trying Redis again.
+REDIS_RETRY_AFTER_SECONDS = 30.0
+
+# KEYS[1]: proxy health hash
+# ARGV: outcome, latency_ms (-1 = unknown), alpha, eject_after, eject_seconds, eject_max_seconds, ttl,
+#       probe (1 = this request was the probe of the ejected proxy)
+# Returns the updated {success, block, latency, ejected_until, ejections, probe_until}
+_RECORD_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local outcome = ARGV[1]
+local latency_ms = tonumber(ARGV[2])
+local alpha = tonumber(ARGV[3])
+local eject_after = tonumber(ARGV[4])
+local eject_seconds = tonumber(ARGV[5])
+local eject_max = tonumber(ARGV[6])
+
+local state = redis.call('HMGET', KEYS[1], 'success', 'block', 'latency', 'consecutive', 'ejections', 'requests',
+  'ejected_until', 'probe_until')
+local success = tonumber(state[1]) or 1
+local block = tonumber(state[2]) or 0
+local latency = tonumber(state[3]) or -1
+local consecutive = tonumber(state[4]) or 0
+local ejections = tonumber(state[5]) or 0
+local requests = (tonumber(state[6]) or 0) + 1
+local ejected_until = tonumber(state[7]) or 0
+local probe_until = tonumber(state[8]) or 0
+local probe = tonumber(ARGV[8])
+
+local ok = 0
+if outcome == 'success' then ok = 1 end
+local blocked = 0
+if outcome == 'blocked' then blocked = 1 end
+success = success + alpha * (ok - success)
+block = block + alpha * (blocked - block)
+if latency_ms >= 0 then
+  if latency < 0 then latency = latency_ms else latency = latency + alpha * (latency_ms - latency) end
+end
+
+if ejected_until > 0 then
+  -- Only the probe decides; other requests of an ejected proxy just update the scores above.
+  if probe == 1 then
+    probe_until = 0
+    consecutive = 0
+    if ok == 1 then
+      ejections = 0
+      ejected_until = 0
+    else
+      ejections = ejections + 1
+      ejected_until = now + math.min(eject_max, eject_seconds * 2 ^ (ejections - 1))
+    end
+  end
+elseif ok == 1 then
+  consecutive = 0
+  ejections = 0
+else
+  consecutive = consecutive + 1
+  if consecutive >= eject_after then
+    ejections = ejections + 1
+    ejected_until = now + math.min(eject_max, eject_seconds * 2 ^ (ejections - 1))
+    consecutive = 0
+  end
+end
+
+redis.call('HSET', KEYS[1], 'success', tostring(success), 'block', tostring(block), 'latency', tostring(latency),
+  'consecutive', consecutive, 'ejections', ejections, 'requests', requests,
+  'ejected_until', tostring(ejected_until), 'probe_until', tostring(probe_until))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[7]))
+return {tostring(success), tostring(block), tostring(latency), tostring(ejected_until), ejections, tostring(probe_until)}
+"""
+
+# KEYS[1]: proxy health hash; ARGV[1]: probe seconds
+# Returns 1 when this caller got the probe of an ejected proxy whose ejection has ended
+_PROBE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'ejected_until', 'probe_until')
+local ejected_until = tonumber(state[1]) or 0
+local probe_until = tonumber(state[2]) or 0
+if ejected_until <= 0 or ejected_until > now or probe_until > now then
+  return 0
+end
+redis.call('HSET', KEYS[1], 'probe_until', tostring(now + tonumber(ARGV[1])))
+return 1
+"""
+
+
+def proxy_label(proxy: str) -> str:
+    """Proxy URL without credentials (safe for logs and metrics)."""
+    parsed = urlparse(proxy)
+    if not parsed.hostname:
+        return proxy
+    port = f":{parsed.port}" if parsed.port else ""
+    return f"{parsed.scheme}://{parsed.hostname}{port}"
+
+
+def apply_outcome(
+    state: Dict[str, float],
+    now: float,
+    outcome: str,
+    latency_ms: Optional[float],
+    params: Dict[str, float],
+    probe: bool = False,
+) -> Dict[str, float]:
+    """Update ``state`` with one request outcome (in-process twin of the Redis script).
+
+    While the proxy is ejected only the outcome of its probe (``probe=True``)
+    restores or re-ejects it.
+    """
+    alpha = params["alpha"]
+    ok = 1.0 if outcome == "success" else 0.0
+    blocked = 1.0 if outcome == "blocked" else 0.0
+    state["success"] = state.get("success", 1.0) + alpha * (ok - state.get("success", 1.0))
+    state["block"] = state.get("block", 0.0) + alpha * (blocked - state.get("block", 0.0))
+    if latency_ms is not None and latency_ms >= 0:
+        latency = state.get("latency", -1.0)
+        state["latency"] = latency_ms if latency < 0 else latency + alpha * (latency_ms - latency)
+    state["requests"] = state.get("requests", 0) + 1
+    state.setdefault("ejected_until", 0.0)
+    state.setdefault("probe_until", 0.0)
+
+    def _eject() -> None:
+        state["ejections"] = state.get("ejections", 0) + 1
+        state["ejected_until"] = now + min(
+            params["eject_max_seconds"], params["eject_seconds"] * 2 ** (state["ejections"] - 1)
+        )
+        state["consecutive"] = 0
+
+    if state.get("ejected_until", 0.0) > 0:
+        if probe:
+            state["probe_until"] = 0.0
+            state["consecutive"] = 0
+            if ok:
+                state["ejections"] = 0
+                state["ejected_until"] = 0.0
+            else:
+                _eject()
+    elif ok:
+        state["consecutive"] = 0
+        state["ejections"] = 0
+    else:
+        state["consecutive"] = state.get("consecutive", 0) + 1
+        if state["consecutive"] >= params["eject_after"]:
+            _eject()
+    return state
+
+
+def health_score(state: Dict[str, float], latency_target_ms: float) -> float:
+    """Selection weight in [0, 1]: success rate x (1 - block rate) x latency factor."""
+    latency = float(state.get("latency", -1.0))
+    latency_factor = 1.0 if latency <= latency_target_ms else latency_target_ms / latency
+    return max(0.0, float(state.get("success", 1.0))) * max(0.0, 1.0 - float(state.get("block", 0.0))) * latency_factor
+
+
+class HealthScoredProxyRotator(ProxyRotator):
+    """Proxy rotator that learns from request outcomes.
+
+    Example:
+        >>> rotator = get_proxy_rotator()
+        >>> proxy = await rotator.choose()
+        >>> await rotator.record(proxy, "blocked", latency_ms=850)
+    """
+
+    def __init__(
+        self,
+        proxies: Optional[List[str]] = None,
+        redis_client_factory: Optional[Callable[[], Awaitable[Any]]] = get_redis_client,
+        refresh_seconds: Optional[float] = None,
+    ):
+        """Initialize rotator (proxies and thresholds default to settings).
+
+        Args:
+            proxies: Proxy URLs (default ``settings.scraper_proxies``)
+            redis_client_factory: Coroutine returning a Redis client (None = this process only)
+            refresh_seconds: How long a worker reuses the health snapshot before re-reading Redis
+        """
+        super().__init__(list(settings.scraper_proxies if proxies is None else proxies))
+        self._redis_client_factory = redis_client_factory
+        self.refresh_seconds = float(
+            settings.proxy_health_refresh_seconds if refresh_seconds is None else refresh_seconds
+        )
+        self.params = {
+            "alpha": float(settings.proxy_health_alpha),
+            "eject_after": float(settings.proxy_eject_after_failures),
+            "eject_seconds": float(settings.proxy_eject_seconds),
+            "eject_max_seconds": float(settings.proxy_eject_max_seconds),
+        }
+        self.latency_target_ms = float(settings.proxy_latency_target_ms)
+        self._health: Dict[str, Dict[str, float]] = {}
+        # Proxies whose probe this worker claimed and has not recorded yet.
+        self._probing: Set[str] = set()
+        self._refreshed_at = 0.0
+        self._redis_disabled_until = 0.0
+
+    @staticmethod
+    def _key(proxy: str) -> str:
+        return f"{KEY_PREFIX}:{hashlib.sha256(proxy.encode('utf-8')).hexdigest()[:16]}"
+
+    async def _redis(self) -> Optional[Any]:
+        if self._redis_client_factory is None or time.monotonic() < self._redis_disabled_until:
+            return None
+        try:
+            return await self._redis_client_factory()
+        except Exception as exc:
+            self._redis_failed(exc)
+            return None
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning("Proxy health falling back to local scores: %s", exc)
+        self._redis_disabled_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+
+    async def refresh(self, force: bool = False) -> None:
+        """Reload every proxy's health from Redis (at most every ``refresh_seconds``)."""
+        if not self.proxies or (not force and time.monotonic() - self._refreshed_at < self.refresh_seconds):
+            return
+        client = await self._redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for proxy in self.proxies:
+                pipe.hgetall(self._key(proxy))
+            rows = await pipe.execute()
+        except Exception as exc:
+            self._redis_failed(exc)
+            return
+        for proxy, row in zip(self.proxies, rows):
+            self._health[proxy] = {field: float(value) for field, value in (row or {}).items()}
+        self._refreshed_at = time.monotonic()
+
+    def _state(self, proxy: str) -> Dict[str, float]:
+        return self._health.setdefault(proxy, {})
+
+    def _weights(self) -> Tuple[List[str], List[float]]:
+        healthy = [proxy for proxy in self.proxies if self._state(proxy).get("ejected_until", 0.0) <= 0]
+        weights = [max(MIN_WEIGHT, health_score(self._state(proxy), self.latency_target_ms)) for proxy in healthy]
+        return healthy, weights
+
+    async def _claim_probe(self, proxy: str, now: float) -> bool:
+        state = self._state(proxy)
+        ejected_until = state.get("ejected_until", 0.0)
+        if ejected_until <= 0 or ejected_until > now or state.get("probe_until", 0.0) > now:
+            return False
+        client = await self._redis()
+        if client is not None:
+            try:
+                if not int(await client.eval(_PROBE_SCRIPT, 1, self._key(proxy), PROBE_SECONDS)):
+                    return False
+            except Exception as exc:
+                self._redis_failed(exc)
+        state["probe_until"] = now + PROBE_SECONDS
+        self._probing.add(proxy)
+        return True
+
+    async def choose(self) -> Optional[str]:
+        """Pick a proxy for the next request (None when no proxies are configured).
+
+        An ejected proxy whose ejection has ended gets one probe request first;
+        otherwise the pick is weighted by health score among non-ejected proxies.
+        """
+        if not self.proxies:
+            return None
+        await self.refresh()
+        now = time.time()
+        for proxy in self.proxies:
+            if await self._claim_probe(proxy, now):
+                logger.info("Probing ejected proxy %s", proxy_label(proxy))
+                return proxy
+
+        healthy, weights = self._weights()
+        if healthy:
+            return random.choices(healthy, weights=weights, k=1)[0]
+        # Every proxy is ejected: use the one whose ejection ends first rather than none at all.
+        proxy = min(self.proxies, key=lambda item: self._state(item).get("ejected_until", 0.0))
+        logger.warning("All proxies ejected; using %s", proxy_label(proxy))
+        return proxy
+
+    def get_random(self) -> Optional[str]:
+        """Score-weighted pick from the last known health (sync callers; prefer ``choose``)."""
+        if not self.proxies:
+            return None
+        healthy, weights = self._weights()
+        if not healthy:
+            return super().get_random()
+        return random.choices(healthy, weights=weights, k=1)[0]
+
+    async def record(self, proxy: Optional[str], outcome: str, latency_ms: Optional[float] = None) -> None:
+        """Record the outcome of a request made through ``proxy``.
+
+        Args:
+            proxy: Proxy used (None = direct request, not scored)
+            outcome: "success", "blocked" (block/captcha page) or "error" (network/HTTP failure)
+            latency_ms: Time to a usable response
+        """
+        if not proxy or proxy not in self.proxies:
+            return
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown proxy outcome: {outcome}")
+
+        state = self._state(proxy)
+        previous_ejection = state.get("ejected_until", 0.0)
+        probe = proxy in self._probing
+        self._probing.discard(proxy)
+        client = await self._redis()
+        updated = False
+        if client is not None:
+            try:
+                success, block, latency, ejected_until, ejections, probe_until = await client.eval(
+                    _RECORD_SCRIPT,
+                    1,
+                    self._key(proxy),
+                    outcome,
+                    -1 if latency_ms is None else float(latency_ms),
+                    self.params["alpha"],
+                    self.params["eject_after"],
+                    self.params["eject_seconds"],
+                    self.params["eject_max_seconds"],
+                    STATE_TTL_SECONDS,
+                    1 if probe else 0,
+                )
+                state.update(
+                    success=float(success),
+                    block=float(block),
+                    latency=float(latency),
+                    ejected_until=float(ejected_until),
+                    ejections=float(ejections),
+                    probe_until=float(probe_until),
+                )
+                updated = True
+            except Exception as exc:
+                self._redis_failed(exc)
+        if not updated:
+            apply_outcome(state, time.time(), outcome, latency_ms, self.params, probe=probe)
+
+        ejected_until = state.get("ejected_until", 0.0)
+        if ejected_until > time.time() and ejected_until != previous_ejection:
+            logger.warning(
+                "Proxy %s ejected until %s after %s",
+                proxy_label(proxy),
+                time.strftime("%H:%M:%S", time.localtime(state["ejected_until"])),
+                outcome,
+            )
+
+    async def snapshot(self) -> List[Dict[str, Any]]:
+        """Health of every configured proxy (fresh from Redis), credentials removed."""
+        await self.refresh(force=True)
+        now = time.time()
+        rows = []
+        for proxy in self.proxies:
+            state = self._state(proxy)
+            ejected_until = state.get("ejected_until", 0.0)
+            if ejected_until > now:
+                status = "ejected"
+            elif ejected_until > 0:
+                status = "probing"
+            else:
+                status = "healthy"
+            latency = state.get("latency", -1.0)
+            rows.append(
+                {
+                    "proxy": proxy_label(proxy),
+                    "status": status,
+                    "score": round(health_score(state, self.latency_target_ms), 4),
+                    "success_rate": round(state.get("success", 1.0), 4),
+                    "block_rate": round(state.get("block", 0.0), 4),
+                    "latency_ms": round(latency, 1) if latency >= 0 else None,
+                    "requests": int(state.get("requests", 0)),
+                    "ejections": int(state.get("ejections", 0)),
+                    "ejected_until": ejected_until if ejected_until > now else None,
+                }
+            )
+        return rows
+
+
+_proxy_rotator: Optional[HealthScoredProxyRotator] = None
+
+
+def get_proxy_rotator() -> HealthScoredProxyRotator:
+    """Return process-wide proxy rotator (created lazily so settings overrides apply)."""
+    global _proxy_rotator
+    if _proxy_rotator is None:
+        _proxy_rotator = HealthScoredProxyRotator()
+    return _proxy_rotator
@@ -11,7 +11,8 @@ This module handles:
 import asyncio
 import random
 import time
-from typing import Optional, List
+from collections import deque
+from typing import Deque, Optional, List
 from datetime import datetime, timedelta
 import logging
 
@@ -32,7 +33,9 @@ USER_AGENTS = [
 class RateLimiter:
     """Rate limiter to control request frequency.
     
-    Implements token bucket algorithm for smooth rate limiting.
+    Implements token bucket algorithm for smooth rate limiting. It paces a
+    single instance only; scrapers default to the shared per-domain limiter
+    in ``domain_rate_limiter``.
     """
     
     def __init__(
@@ -50,24 +53,29 @@ class RateLimiter:
         self.requests_per_hour = requests_per_hour
         
         self.last_request_time = 0.0
-        self.request_times: List[float] = []  # Track last hour of requests
+        self.request_times: Deque[float] = deque()  # Track last hour of requests
         
         # Calculate min delay between requests
         self.min_delay = 1.0 / requests_per_second if requests_per_second > 0 else 0
     
-    async def wait(self) -> None:
+    async def wait(self, url: Optional[str] = None, proxy: Optional[str] = None) -> None:
         """Wait if necessary to respect rate limit.
         
         This coroutine:
         1. Checks requests in last second
         2. Checks requests in last hour
         3. Sleeps if either limit exceeded
+        
+        Args:
+            url: Ignored (one bucket per instance); accepted like DomainRateLimiter.wait
+            proxy: Ignored
         """
         now = time.time()
         
-        # Clean old entries (older than 1 hour)
+        # Drop entries older than 1 hour (oldest first, so only the expired head is touched)
         cutoff = now - 3600
-        self.request_times = [t for t in self.request_times if t > cutoff]
+        while self.request_times and self.request_times[0] <= cutoff:
+            self.request_times.popleft()
         
         # Check hour limit
         if len(self.request_times) >= self.requests_per_hour:
@@ -94,7 +102,7 @@ class RateLimiter:
     async def reset(self) -> None:
         """Reset rate limiter (useful for testing)."""
         self.last_request_time = 0.0
-        self.request_times = []
+        self.request_times.clear()
 
 
 class ProxyRotator:
@@ -140,7 +148,25 @@ class ProxyRotator:
         proxy = random.choice(self.proxies)
         logger.debug(f"Using proxy: {proxy}")
         return proxy
-    
+
+    async def choose(self) -> Optional[str]:
+        """Pick proxy for the next request (uniform; see ``proxy_health`` for scored picks).
+
+        Returns:
+            Proxy URL or None if no proxies configured
+        """
+        return self.get_random()
+
+    async def record(self, proxy: Optional[str], outcome: str, latency_ms: Optional[float] = None) -> None:
+        """Record outcome of a request made through ``proxy`` (no-op: this rotator does not learn).
+
+        Args:
+            proxy: Proxy used (None = direct request)
+            outcome: "success", "blocked" or "error"
+            latency_ms: Time to a usable response
+        """
+        return None
+
     def add_proxy(self, proxy: str) -> None:
         """Add a proxy to rotation.
         
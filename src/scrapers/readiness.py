@@ -0,0 +1,191 @@
+"""
+Adaptive page readiness detection for browser page loads.
+
+This module:
+- Waits on the earliest sufficient signal instead of fixed sleeps or ``networkidle``
+- Signals: required selectors attached, DOM mutation quiescence, learned per-domain budget
+- Records time-to-ready per domain so the budget tightens as samples accumulate
+
+Pages are navigated with ``wait_until="domcontentloaded"``; the engine then
+races the signals. A domain with enough history gets a wait budget derived from
+its observed time-to-ready percentile, so slow trailing scripts (ads, trackers)
+stop holding every scrape for the worst case.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import Page
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+READY_WINDOW = 50
+READY_PERCENTILE = 90.0
+# Headroom over the learned percentile before the budget gives up waiting.
+BUDGET_FACTOR = 1.5
+BUDGET_FLOOR_MS = 250.0
+
+# Resolves once no DOM mutation happened for ``quietMs``.
+_QUIESCENCE_JS = """
+(quietMs) => new Promise((resolve) => {
+    let timer = null;
+    const observer = new MutationObserver(() => arm());
+    function arm() {
+        clearTimeout(timer);
+        timer = setTimeout(() => { observer.disconnect(); resolve(true); }, quietMs);
+    }
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    arm();
+})
+"""
+
+
+def domain_of(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class ReadinessTracker:
+    """Rolling window of time-to-ready (ms) per domain."""
+
+    def __init__(self, window: int = READY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, domain: str, elapsed_ms: float) -> None:
+        self._samples.setdefault(domain, deque(maxlen=self.window)).append(max(0.0, float(elapsed_ms)))
+
+    def percentile(self, domain: str, pct: float = READY_PERCENTILE) -> Optional[float]:
+        """Return the ``pct`` percentile (0-100) or None when samples are too few."""
+        samples = self._samples.get(domain)
+        if not samples or len(samples) < settings.scraper_readiness_min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def budget_ms(self, domain: str, max_wait_ms: float) -> float:
+        """Wait budget for ``domain``: learned percentile with headroom, capped at ``max_wait_ms``."""
+        observed = self.percentile(domain)
+        if observed is None:
+            return max_wait_ms
+        return min(max_wait_ms, max(BUDGET_FLOOR_MS, observed * BUDGET_FACTOR))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            domain: {"samples": len(samples), "p90_ms": self.percentile(domain)}
+            for domain, samples in self._samples.items()
+        }
+
+
+class ReadyResult:
+    """Which signal ended the wait and when."""
+
+    def __init__(self, signal: str, elapsed_ms: float, budget_ms: float):
+        self.signal = signal
+        self.elapsed_ms = elapsed_ms
+        self.budget_ms = budget_ms
+
+    @property
+    def ready(self) -> bool:
+        return self.signal != "budget"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"ready_signal": self.signal, "ready_ms": self.elapsed_ms, "ready_budget_ms": self.budget_ms}
+
+
+class ReadinessEngine:
+    """Wait for a loaded page to be ready for parsing."""
+
+    def __init__(self, tracker: Optional[ReadinessTracker] = None, quiet_ms: Optional[int] = None):
+        """Initialize readiness engine.
+
+        Args:
+            tracker: Time-to-ready history (uses the process-wide tracker if None)
+            quiet_ms: DOM quiet period that counts as settled (default from settings)
+        """
+        self.tracker = tracker or get_readiness_tracker()
+        self.quiet_ms = int(settings.scraper_readiness_quiet_ms if quiet_ms is None else quiet_ms)
+
+    async def _selectors_attached(self, page: Page, selectors: Iterable[str], timeout_ms: float) -> str:
+        await asyncio.gather(
+            *(page.wait_for_selector(selector, state="attached", timeout=timeout_ms) for selector in selectors)
+        )
+        return "selectors"
+
+    async def _dom_quiet(self, page: Page) -> str:
+        await page.evaluate(_QUIESCENCE_JS, self.quiet_ms)
+        return "quiescence"
+
+    async def wait_ready(
+        self,
+        page: Page,
+        url: str,
+        selectors: Iterable[str] = (),
+        max_wait_seconds: Optional[float] = None,
+    ) -> ReadyResult:
+        """Wait for the earliest readiness signal (call after a ``domcontentloaded`` navigation).
+
+        The page is ready as soon as all required selectors are attached or the
+        DOM stops mutating, whichever comes first. The wait is capped by the
+        domain's learned budget (or ``max_wait_seconds`` without history).
+
+        Args:
+            page: Navigated page
+            url: Page URL (its domain keys the learned profile)
+            selectors: CSS selectors that must be attached
+            max_wait_seconds: Upper bound on the wait (default from settings)
+
+        Returns:
+            ReadyResult with the winning signal ("selectors", "quiescence" or "budget")
+        """
+        selectors = [selector for selector in selectors if selector]
+        domain = domain_of(url)
+        max_wait = settings.scraper_readiness_max_wait_seconds if max_wait_seconds is None else max_wait_seconds
+        budget_ms = self.tracker.budget_ms(domain, max_wait * 1000)
+        started = time.monotonic()
+
+        waiters = [asyncio.ensure_future(self._dom_quiet(page))]
+        if selectors:
+            waiters.append(asyncio.ensure_future(self._selectors_attached(page, selectors, budget_ms)))
+        signal = "budget"
+        pending = set(waiters)
+        try:
+            while pending:
+                remaining = budget_ms / 1000 - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    signal = winner.result()
+                    break
+                for task in done:
+                    # Selector timeouts or a navigation replacing the page leave the other signals running.
+                    logger.debug("Readiness signal for %s failed: %s", url, task.exception())
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        if signal != "budget":
+            self.tracker.record(domain, elapsed_ms)
+        else:
+            logger.info("Page %s not ready after %.0f ms budget; parsing best-effort HTML", url, budget_ms)
+        return ReadyResult(signal, elapsed_ms, round(budget_ms, 1))
+
+
+_readiness_tracker = ReadinessTracker()
+
+
+def get_readiness_tracker() -> ReadinessTracker:
+    """Return process-wide readiness tracker."""
+    return _readiness_tracker
@@ -0,0 +1,158 @@
+"""
+Resource blocking for browser page loads.
+
+This module:
+- Aborts sub-resources the scrapers never parse (images, media, fonts, stylesheets)
+- Aborts third-party and denied domains (ads, analytics, trackers), with an allow list
+- Measures bytes transferred, blocked requests and load time per page
+
+Only the HTML is parsed by the scrapers, so everything else a page pulls in is
+wasted bandwidth and load time. The policy is installed on a page through
+Playwright route interception before navigation.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+
+from playwright.async_api import Page, Request, Route
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Second-level public suffixes common in the scraped sites (amazon.com.br, amazon.co.uk...).
+_TWO_LEVEL_SUFFIXES = {"com.br", "co.uk", "com.au", "co.jp", "com.mx", "co.in", "org.br", "net.br", "com.ar"}
+
+
+def site_of(host: str) -> str:
+    """Registrable domain of a host (``www.amazon.com.br`` -> ``amazon.com.br``)."""
+    labels = [label for label in str(host or "").lower().strip(".").split(".") if label]
+    if len(labels) >= 3 and ".".join(labels[-2:]) in _TWO_LEVEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def _matches(host: str, domains: Iterable[str]) -> bool:
+    host = str(host or "").lower()
+    return any(host == domain or host.endswith(f".{domain}") for domain in domains)
+
+
+class PageLoadStats:
+    """Requests, bytes and timing of one page load."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.started = time.monotonic()
+        self.load_ms: Optional[float] = None
+        self.requests = 0
+        self.blocked = 0
+        self.blocked_by_reason: Dict[str, int] = {}
+        self.bytes_transferred = 0
+        self._pending: Set[asyncio.Task] = set()
+
+    def record_blocked(self, reason: str) -> None:
+        self.blocked += 1
+        self.blocked_by_reason[reason] = self.blocked_by_reason.get(reason, 0) + 1
+
+    async def _add_sizes(self, request: Request) -> None:
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        self.bytes_transferred += int(sizes.get("responseBodySize") or 0) + int(sizes.get("responseHeadersSize") or 0)
+
+    def on_request_finished(self, request: Request) -> None:
+        task = asyncio.ensure_future(self._add_sizes(request))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def finish(self) -> "PageLoadStats":
+        """Stop the clock and wait for pending size lookups."""
+        self.load_ms = round((time.monotonic() - self.started) * 1000, 1)
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "load_ms": self.load_ms,
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "blocked_by_reason": dict(self.blocked_by_reason),
+            "bytes_transferred": self.bytes_transferred,
+        }
+
+    def summary(self) -> str:
+        return (
+            f"{self.load_ms or 0:.0f} ms, {self.bytes_transferred / 1024:.0f} KB, "
+            f"{self.requests} requests ({self.blocked} blocked)"
+        )
+
+
+class ResourcePolicy:
+    """Which sub-resources a page load may fetch."""
+
+    def __init__(
+        self,
+        blocked_resource_types: Optional[Iterable[str]] = None,
+        block_third_party: Optional[bool] = None,
+        allowed_domains: Optional[Iterable[str]] = None,
+        denied_domains: Optional[Iterable[str]] = None,
+    ):
+        """Initialize resource policy (defaults come from settings).
+
+        Args:
+            blocked_resource_types: Playwright resource types to abort (image, media, font, stylesheet...)
+            block_third_party: Abort requests to sites other than the page's own
+            allowed_domains: Domains always allowed (e.g. a site's own CDN), even when third-party
+            denied_domains: Domains always aborted (ads, analytics)
+        """
+        types = settings.scraper_blocked_resource_types if blocked_resource_types is None else blocked_resource_types
+        self.blocked_resource_types = {str(item).lower() for item in types}
+        self.block_third_party = settings.scraper_block_third_party if block_third_party is None else block_third_party
+        self.allowed_domains = {
+            str(item).lower() for item in settings.scraper_allowed_domains + list(allowed_domains or [])
+        }
+        self.denied_domains = {
+            str(item).lower()
+            for item in (settings.scraper_denied_domains if denied_domains is None else denied_domains)
+        }
+
+    def block_reason(self, url: str, resource_type: str, page_site: str) -> Optional[str]:
+        """Why a request should be aborted, or None to let it through."""
+        if resource_type == "document":
+            # Navigations (and frames) are never blocked; the page itself is what we want.
+            return None
+        host = (urlparse(url).hostname or "").lower()
+        if _matches(host, self.denied_domains):
+            return "denied_domain"
+        if resource_type in self.blocked_resource_types:
+            return resource_type
+        if _matches(host, self.allowed_domains):
+            return None
+        if self.block_third_party and host and page_site and site_of(host) != page_site:
+            return "third_party"
+        return None
+
+    async def install(self, page: Page, url: str) -> PageLoadStats:
+        """Route every request of ``page`` through the policy; returns the stats collector."""
+        stats = PageLoadStats(url)
+        page_site = site_of(urlparse(url).hostname or "")
+
+        async def _handle(route: Route) -> None:
+            request = route.request
+            stats.requests += 1
+            reason = self.block_reason(request.url, request.resource_type, page_site)
+            if reason:
+                stats.record_blocked(reason)
+                await route.abort("blockedbyclient")
+                return
+            await route.continue_()
+
+        await page.route("**/*", _handle)
+        page.on("requestfinished", stats.on_request_finished)
+        return stats
@@ -5,7 +5,7 @@ from __future__ import annotations
 import base64
 from typing import Dict, Any, Optional, List, Tuple
 
-import httpx
+from src.scrapers.http_clients import get_http_client
 
 
 class WordPressClient:
@@ -27,41 +27,41 @@ class WordPressClient:
 
         endpoint = f"{self.base_url}/wp-json/wp/v2/{taxonomy}"
 
-        async with httpx.AsyncClient(timeout=20) as client:
-            search_resp = await client.get(
+        client = get_http_client("wordpress")
+        search_resp = await client.get(
+            endpoint,
+            params={"search": clean_name, "per_page": 50},
+            headers=self.headers,
+        )
+        search_resp.raise_for_status()
+        items = search_resp.json()
+
+        for item in items:
+            if str(item.get("name", "")).strip().lower() == clean_name.lower():
+                return int(item.get("id"))
+
+        create_resp = await client.post(
+            endpoint,
+            json={"name": clean_name},
+            headers=self.headers,
+        )
+        if create_resp.status_code in (400, 409):
+            # Term may have been created concurrently; retry search.
+            retry_resp = await client.get(
                 endpoint,
                 params={"search": clean_name, "per_page": 50},
                 headers=self.headers,
             )
-            search_resp.raise_for_status()
-            items = search_resp.json()
-
-            for item in items:
+            retry_resp.raise_for_status()
+            retry_items = retry_resp.json()
+            for item in retry_items:
                 if str(item.get("name", "")).strip().lower() == clean_name.lower():
                     return int(item.get("id"))
+            return None
 
-            create_resp = await client.post(
-                endpoint,
-                json={"name": clean_name},
-                headers=self.headers,
-            )
-            if create_resp.status_code in (400, 409):
-                # Term may have been created concurrently; retry search.
-                retry_resp = await client.get(
-                    endpoint,
-                    params={"search": clean_name, "per_page": 50},
-                    headers=self.headers,
-                )
-                retry_resp.raise_for_status()
-                retry_items = retry_resp.json()
-                for item in retry_items:
-                    if str(item.get("name", "")).strip().lower() == clean_name.lower():
-                        return int(item.get("id"))
-                return None
-
-            create_resp.raise_for_status()
-            created = create_resp.json()
-            return int(created.get("id")) if created.get("id") is not None else None
+        create_resp.raise_for_status()
+        created = create_resp.json()
+        return int(created.get("id")) if created.get("id") is not None else None
 
     async def resolve_categories_and_tags(
         self,
@@ -110,7 +110,6 @@ class WordPressClient:
             payload["meta"] = meta
 
         endpoint = f"{self.base_url}/wp-json/wp/v2/posts"
-        async with httpx.AsyncClient(timeout=20) as client:
-            response = await client.post(endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+        response = await get_http_client("wordpress").post(endpoint, json=payload, headers=self.headers)
+        response.raise_for_status()
+        return response.json()
@@ -2,13 +2,19 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, Optional
 
 PROVIDER_GROQ = "groq"
 PROVIDER_MISTRAL = "mistral"
+# In-process deterministic provider for load/regression tests (src/workers/llm_local.py).
+PROVIDER_LOCAL = "local"
 
 MODEL_GROQ_LLAMA_3_3_70B = "llama-3.3-70b-versatile"
 MODEL_MISTRAL_LARGE_LATEST = "mistral-large-latest"
+# Small, fast models used as the first routing tier for short inputs (src/workers/llm_routing.py).
+MODEL_GROQ_LLAMA_3_1_8B = "llama-3.1-8b-instant"
+MODEL_MISTRAL_SMALL_LATEST = "mistral-small-latest"
+MODEL_LOCAL_STUB = "local-stub"
 
 DEFAULT_PROVIDER = PROVIDER_GROQ
 DEFAULT_MODEL_ID = MODEL_GROQ_LLAMA_3_3_70B
@@ -19,6 +25,41 @@ BOOK_REVIEW_CONTEXT_MODEL_ID = MODEL_GROQ_LLAMA_3_3_70B
 BOOK_REVIEW_ARTICLE_PROVIDER = PROVIDER_MISTRAL
 BOOK_REVIEW_ARTICLE_MODEL_ID = MODEL_MISTRAL_LARGE_LATEST
 
+# Provider quotas (requests/tokens per minute) used by the shared LLM rate limiter.
+# Model entries ("provider:model_id", as quotas are per provider account) take precedence over
+# provider entries; both can be overridden via settings. The local provider has no quota.
+DEFAULT_PROVIDER_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    PROVIDER_GROQ: {"requests_per_minute": 30, "tokens_per_minute": 6000},
+    PROVIDER_MISTRAL: {"requests_per_minute": 60, "tokens_per_minute": 500000},
+}
+DEFAULT_MODEL_RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    f"{PROVIDER_GROQ}:{MODEL_GROQ_LLAMA_3_3_70B}": {"requests_per_minute": 30, "tokens_per_minute": 12000},
+    f"{PROVIDER_GROQ}:{MODEL_GROQ_LLAMA_3_1_8B}": {"requests_per_minute": 30, "tokens_per_minute": 6000},
+}
+
+# Input token budget (system + user prompt) per prompt step; overridable via settings.
+DEFAULT_PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+    "link_bibliographic": 1800,
+    "link_summary": 1800,
+    "link_combined": 2200,
+    "web_research": 5000,
+    "context": 6000,
+    "topics": 3000,
+}
+
+# Native structured output per provider for prompts with a JSON output template:
+# "json_schema" (response schema), "json_object" (JSON mode) or "off" (prompt-only).
+STRUCTURED_OUTPUT_JSON_SCHEMA = "json_schema"
+STRUCTURED_OUTPUT_JSON_OBJECT = "json_object"
+STRUCTURED_OUTPUT_OFF = "off"
+STRUCTURED_OUTPUT_MODES = (STRUCTURED_OUTPUT_JSON_SCHEMA, STRUCTURED_OUTPUT_JSON_OBJECT, STRUCTURED_OUTPUT_OFF)
+DEFAULT_STRUCTURED_OUTPUT_MODES: Dict[str, str] = {
+    # Groq only accepts response schemas on a few models; JSON mode works on all of them.
+    PROVIDER_GROQ: STRUCTURED_OUTPUT_JSON_OBJECT,
+    PROVIDER_MISTRAL: STRUCTURED_OUTPUT_JSON_SCHEMA,
+    PROVIDER_LOCAL: STRUCTURED_OUTPUT_JSON_SCHEMA,
+}
+
 
 def normalize_provider(provider: Optional[str]) -> Optional[str]:
     raw = str(provider or "").strip().lower()
@@ -30,14 +71,85 @@ def normalize_provider(provider: Optional[str]) -> Optional[str]:
         "llama": PROVIDER_GROQ,
         "mistral": PROVIDER_MISTRAL,
         "mixtral": PROVIDER_MISTRAL,
+        "local": PROVIDER_LOCAL,
+        "stub": PROVIDER_LOCAL,
     }
     return aliases.get(raw, raw)
 
 
 def infer_provider_from_model(model_id: str, fallback: str = DEFAULT_PROVIDER) -> str:
     model = str(model_id or "").strip().lower()
+    if model.startswith("local"):
+        return PROVIDER_LOCAL
     if "mistral" in model or "mixtral" in model:
         return PROVIDER_MISTRAL
     if "llama" in model or "groq" in model:
         return PROVIDER_GROQ
     return fallback
+
+
+def default_model_for_provider(provider: Optional[str]) -> str:
+    normalized = normalize_provider(provider)
+    if normalized == PROVIDER_MISTRAL:
+        return MODEL_MISTRAL_LARGE_LATEST
+    if normalized == PROVIDER_LOCAL:
+        return MODEL_LOCAL_STUB
+    return MODEL_GROQ_LLAMA_3_3_70B
+
+
+def resolve_rate_limits(
+    provider: str,
+    model_id: str,
+    overrides: Optional[Dict[str, Dict[str, float]]] = None,
+) -> Dict[str, float]:
+    """Return requests/tokens per minute for a provider/model pair.
+
+    Lookup order: override "provider:model", override "provider", model default, provider default.
+    A value of 0 disables that dimension.
+    """
+    normalized_provider = normalize_provider(provider) or DEFAULT_PROVIDER
+    model = str(model_id or "").strip()
+    custom = overrides or {}
+
+    limits: Dict[str, float] = {"requests_per_minute": 0, "tokens_per_minute": 0}
+    for candidate in (
+        DEFAULT_PROVIDER_RATE_LIMITS.get(normalized_provider),
+        DEFAULT_MODEL_RATE_LIMITS.get(f"{normalized_provider}:{model}"),
+        custom.get(normalized_provider),
+        custom.get(f"{normalized_provider}:{model}"),
+    ):
+        if isinstance(candidate, dict):
+            limits.update({key: float(value) for key, value in candidate.items() if key in limits})
+    return limits
+
+
+def resolve_prompt_token_budget(step: str, overrides: Optional[Dict[str, int]] = None) -> int:
+    """Return the input token budget for a prompt step (0 = unlimited)."""
+    custom = overrides or {}
+    value = custom.get(step, DEFAULT_PROMPT_TOKEN_BUDGETS.get(step, 0))
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_PROMPT_TOKEN_BUDGETS.get(step, 0)
+
+
+def resolve_structured_output_mode(
+    provider: str,
+    model_id: str,
+    overrides: Optional[Dict[str, str]] = None,
+) -> str:
+    """Return the structured output mode for a provider/model pair.
+
+    Lookup order: override "provider:model", override "provider", provider default.
+    """
+    normalized_provider = normalize_provider(provider) or DEFAULT_PROVIDER
+    custom = overrides or {}
+    for candidate in (
+        custom.get(f"{normalized_provider}:{str(model_id or '').strip()}"),
+        custom.get(normalized_provider),
+        DEFAULT_STRUCTURED_OUTPUT_MODES.get(normalized_provider),
+    ):
+        mode = str(candidate or "").strip().lower()
+        if mode in STRUCTURED_OUTPUT_MODES:
+            return mode
+    return STRUCTURED_OUTPUT_OFF
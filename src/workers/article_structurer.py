@@ -17,7 +17,11 @@ from src.workers.ai_defaults import (
     MODEL_MISTRAL_LARGE_LATEST,
 )
 from src.workers.llm_client import LLMClient
+from src.workers.llm_ledger import llm_call_scope
+from src.workers.llm_stream import JsonClosedStop, StopCondition, WordBudgetStop
+from src.workers.prompt_budget import PromptBudget, compact_json
 from src.workers.prompt_builder import build_user_prompt_with_output_format
+from src.workers.structured_output import OutputSpec, StructuredOutputError, extract_json_object
 
 
 class ArticleStructurer:
@@ -36,10 +40,13 @@ class ArticleStructurer:
         provider: Optional[str] = None,
         api_key: Optional[str] = None,
         allow_fallback: bool = True,
+        stop_when: Optional[StopCondition] = None,
+        prompt_doc: Optional[Dict[str, Any]] = None,
     ) -> str:
-        """Call LLM in a test-friendly way (prefers generate())."""
-        if hasattr(self.llm_client, "generate"):
-            return await self.llm_client.generate(
+        """Call LLM in a test-friendly way (prefers generate() on injected clients)."""
+        extra: Dict[str, Any] = {"stop_when": stop_when} if stop_when is not None else {}
+        with llm_call_scope(prompt_id=self._prompt_ref(prompt_doc)):
+            return await self._call_llm_client(
                 system_prompt=system_prompt,
                 user_prompt=user_prompt,
                 model_id=model_id,
@@ -48,17 +55,36 @@ class ArticleStructurer:
                 provider=provider,
                 api_key=api_key,
                 allow_fallback=allow_fallback,
+                **extra,
             )
-        return await self.llm_client.generate_with_retry(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            model_id=model_id,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            provider=provider,
-            api_key=api_key,
-            allow_fallback=allow_fallback,
-        )
+
+    @staticmethod
+    def _prompt_ref(prompt_doc: Optional[Dict[str, Any]]) -> Optional[str]:
+        return str((prompt_doc or {}).get("_id") or (prompt_doc or {}).get("purpose") or "") or None
+
+    async def _llm_generate_json(
+        self,
+        output_spec: Optional[OutputSpec],
+        prompt_doc: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """JSON counterpart of ``_llm_generate``; raises StructuredOutputError on invalid output."""
+        if not isinstance(self.llm_client, LLMClient):
+            raw = await self._llm_generate(prompt_doc=prompt_doc, **kwargs)
+            if output_spec is not None:
+                return output_spec.parse(raw)
+            data = extract_json_object(raw)
+            if data is None:
+                raise StructuredOutputError("Completion is not a JSON object", raw=raw)
+            return data
+
+        with llm_call_scope(prompt_id=self._prompt_ref(prompt_doc)):
+            return await self.llm_client.generate_structured(output_spec=output_spec, **kwargs)
+
+    async def _call_llm_client(self, **kwargs: Any) -> str:
+        if hasattr(self.llm_client, "generate") and not isinstance(self.llm_client, LLMClient):
+            return await self.llm_client.generate(**kwargs)
+        return await self.llm_client.generate_with_retry(**kwargs)
 
     async def extract_topics(
         self,
@@ -74,13 +100,19 @@ class ArticleStructurer:
         if not prompt_doc:
             return self._fallback_topics(book_data)
 
+        model_id = str(config.get("model_id") or prompt_doc.get("model_id", MODEL_MISTRAL_LARGE_LATEST))
         user_prompt = prompt_doc.get("user_prompt", "")
         user_prompt = user_prompt.replace("{{title}}", book_data.get("title", ""))
         user_prompt = user_prompt.replace("{{author}}", book_data.get("author", ""))
-        user_prompt = user_prompt.replace("{{data}}", json.dumps(book_data, ensure_ascii=True, default=str))
         user_prompt = build_user_prompt_with_output_format(user_prompt, prompt_doc)
+        fitted = (
+            PromptBudget.for_step("topics", model_id)
+            .reserve(prompt_doc.get("system_prompt", ""), user_prompt)
+            .add("data", compact_json(book_data), priority=1)
+            .fit()
+        )
+        user_prompt = user_prompt.replace("{{data}}", fitted["data"])
 
-        model_id = str(config.get("model_id") or prompt_doc.get("model_id", MODEL_MISTRAL_LARGE_LATEST))
         try:
             temperature = float(config.get("temperature") if config.get("temperature") is not None else prompt_doc.get("temperature", 0.5))
         except (TypeError, ValueError):
@@ -94,17 +126,24 @@ class ArticleStructurer:
         allow_fallback = bool(config.get("allow_fallback", True))
 
         try:
-            response = await self._llm_generate(
-                system_prompt=prompt_doc.get("system_prompt", ""),
-                user_prompt=user_prompt,
-                model_id=model_id,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                provider=provider,
-                api_key=api_key,
-                allow_fallback=allow_fallback,
-            )
-            parsed = self._extract_topics_from_text(response)
+            try:
+                data = await self._llm_generate_json(
+                    output_spec=OutputSpec.from_prompt(prompt_doc),
+                    system_prompt=prompt_doc.get("system_prompt", ""),
+                    user_prompt=user_prompt,
+                    model_id=model_id,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    provider=provider,
+                    api_key=api_key,
+                    allow_fallback=allow_fallback,
+                    stop_when=JsonClosedStop(),
+                    prompt_doc=prompt_doc,
+                )
+                parsed = self._normalize_topics(data.get("topics"))
+            except StructuredOutputError as exc:
+                # Not JSON even after repair: try the "Topic N:" text layout.
+                parsed = self._extract_topics_from_text(exc.raw)
             if len(parsed) >= 3:
                 return parsed[:3]
         except Exception:
@@ -135,27 +174,29 @@ class ArticleStructurer:
             },
         ]
 
+    @staticmethod
+    def _normalize_topics(topics: Any) -> List[Dict[str, Any]]:
+        if not isinstance(topics, list):
+            return []
+        normalized = []
+        for topic in topics:
+            if not isinstance(topic, dict):
+                continue
+            normalized.append(
+                {
+                    "name": str(topic.get("name", "Tópico")).strip(),
+                    "description": str(topic.get("description", "")).strip(),
+                    "subtopics": [str(s).strip() for s in topic.get("subtopics") or [] if str(s).strip()],
+                }
+            )
+        return [t for t in normalized if t.get("name")]
+
     def _extract_topics_from_text(self, response: str) -> List[Dict[str, Any]]:
-        text = response.strip()
+        text = str(response or "").strip()
 
-        try:
-            obj = json.loads(text)
-            topics = obj.get("topics") if isinstance(obj, dict) else None
-            if isinstance(topics, list):
-                normalized = []
-                for topic in topics:
-                    if not isinstance(topic, dict):
-                        continue
-                    normalized.append(
-                        {
-                            "name": str(topic.get("name", "Tópico")).strip(),
-                            "description": str(topic.get("description", "")).strip(),
-                            "subtopics": [str(s).strip() for s in topic.get("subtopics", []) if str(s).strip()],
-                        }
-                    )
-                return [t for t in normalized if t.get("name")]
-        except Exception:
-            pass
+        data = extract_json_object(text)
+        if data is not None and isinstance(data.get("topics"), list):
+            return self._normalize_topics(data.get("topics"))
 
         topics: List[Dict[str, Any]] = []
         topic_blocks = re.findall(r"(?:Topic\s*\d+[:\-]\s*)(.*?)(?=(?:\nTopic\s*\d+[:\-])|$)", text, flags=re.S)
@@ -913,6 +954,8 @@ class ArticleStructurer:
         user_prompt = build_user_prompt_with_output_format(user_prompt, prompt_doc_for_output)
 
         llm_params = self._resolve_llm_parameters(llm_config=llm_config, prompt_doc=prompt_doc)
+        # Output past the word budget is truncated below anyway; leave room for an echoed heading.
+        stream_word_budget = max_words + self._word_count(str(section_item.get("rendered_title") or "")) + 1
         section_text = ""
         try:
             section_text = await self._llm_generate(
@@ -924,6 +967,8 @@ class ArticleStructurer:
                 provider=llm_params["provider"],
                 api_key=llm_params["api_key"],
                 allow_fallback=llm_params["allow_fallback"],
+                stop_when=WordBudgetStop(stream_word_budget),
+                prompt_doc=prompt_doc,
             )
         except Exception:
             section_text = ""
@@ -1293,6 +1338,7 @@ class ArticleStructurer:
                     provider=provider,
                     api_key=api_key,
                     allow_fallback=allow_fallback,
+                    prompt_doc=article_prompt,
                 )
                 if llm_article.strip():
                     return llm_article
@@ -22,6 +22,7 @@ from src.db.repositories import (
 )
 from src.models.enums import SubmissionStatus
 from src.workers.article_structurer import ArticleStructurer
+from src.workers.llm_ledger import drained, set_llm_call_context
 from src.workers.ai_defaults import (
     BOOK_REVIEW_ARTICLE_MODEL_ID,
     BOOK_REVIEW_ARTICLE_PROVIDER,
@@ -164,6 +165,7 @@ def generate_article_task(self, submission_id: str, skip_config_delay: bool = Fa
         asyncio.set_event_loop(loop)
 
         async def _run():
+            set_llm_call_context(submission_id=submission_id, step_id="article_generation")
             db = await get_db()
             submission_repo = SubmissionRepository(db)
             book_repo = BookRepository(db)
@@ -383,7 +385,7 @@ def generate_article_task(self, submission_id: str, skip_config_delay: bool = Fa
                 },
             }
 
-        return loop.run_until_complete(_run())
+        return loop.run_until_complete(drained(_run()))
     except Exception as e:
         logger.error("Error generating article: %s", e, exc_info=True)
         return {"status": "error", "error": str(e)}
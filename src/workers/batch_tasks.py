@@ -0,0 +1,79 @@
+"""Celery tasks that submit and poll LLM batch jobs."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from celery import current_app, shared_task
+
+from src.config import settings
+from src.db.connection import get_db
+from src.db.repositories import CredentialRepository
+from src.workers.ai_defaults import PROVIDER_GROQ, PROVIDER_MISTRAL
+from src.workers.llm_batch import FLUSH_TASK_NAME, POLL_TASK_NAME, credential_fingerprint, get_llm_batch_backend
+
+logger = logging.getLogger(__name__)
+
+
+async def _resolve_batch_api_key(provider: str, credential: Optional[str]) -> Optional[str]:
+    """API key of the credential the step resolved when it queued the request.
+
+    ``credential`` is the key fingerprint stored with the request. Requests
+    queued without one use the provider's active credential.
+    """
+    credential_repo = CredentialRepository(await get_db())
+    settings_keys = {PROVIDER_GROQ: settings.groq_api_key, PROVIDER_MISTRAL: settings.mistral_api_key}
+    if credential:
+        for item in await credential_repo.list_active(service=provider):
+            if item.get("key") and credential_fingerprint(item["key"]) == credential:
+                await credential_repo.touch_last_used(item.get("_id"))
+                return str(item["key"])
+        if credential_fingerprint(settings_keys.get(provider)) == credential:
+            return settings_keys[provider]
+        logger.warning("Batch credential %s for provider '%s' is no longer active", credential, provider)
+        return None
+
+    fallback = await credential_repo.get_active(service=provider)
+    if fallback and fallback.get("key"):
+        return str(fallback["key"])
+    return settings_keys.get(provider)
+
+
+@shared_task(bind=True)
+def flush_llm_batches_task(self) -> Dict[str, Any]:
+    """Submit queued LLM requests as provider batch jobs."""
+
+    async def _run() -> Dict[str, Any]:
+        job_ids = await get_llm_batch_backend().flush(_resolve_batch_api_key)
+        if job_ids:
+            current_app.send_task(POLL_TASK_NAME, countdown=settings.llm_batch_poll_interval_seconds)
+        return {"status": "ok", "jobs_submitted": len(job_ids), "job_ids": job_ids}
+
+    return asyncio.run(_run())
+
+
+@shared_task(bind=True)
+def poll_llm_batches_task(self) -> Dict[str, Any]:
+    """Poll open batch jobs, store results and resume the waiting pipeline steps."""
+
+    async def _run() -> Dict[str, Any]:
+        outcome = await get_llm_batch_backend().poll(_resolve_batch_api_key)
+
+        for task_name, kwargs in outcome["resume"]:
+            current_app.send_task(task_name, kwargs=kwargs)
+
+        if outcome["requeued"]:
+            current_app.send_task(FLUSH_TASK_NAME, countdown=settings.llm_batch_flush_delay_seconds)
+        if outcome["open_jobs"]:
+            current_app.send_task(POLL_TASK_NAME, countdown=settings.llm_batch_poll_interval_seconds)
+
+        return {
+            "status": "ok",
+            "open_jobs": outcome["open_jobs"],
+            "requeued": outcome["requeued"],
+            "resumed": len(outcome["resume"]),
+        }
+
+    return asyncio.run(_run())
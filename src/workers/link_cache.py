@@ -0,0 +1,234 @@
+"""Cross-submission cache of fetched pages and per-link LLM results.
+
+Publisher pages, author bios and review sites recur across submissions. The
+cache has two layers:
+
+- ``page_cache``: parsed page text keyed by normalized URL, reused while fresh
+  (``link_cache_page_ttl_hours``); a stale entry is refetched.
+- ``link_result_cache``: link summaries/bibliographic extractions keyed by the
+  page *content hash*, the prompt version and the book inputs (title/author).
+  A refetched page whose text did not change keeps its LLM results, and the same
+  text served from different URLs shares them.
+
+Prompt versions are derived from the prompt fields that affect the completion,
+so editing a prompt (or switching its model) invalidates its cached results
+without any bookkeeping. Cache failures never fail the pipeline; they are logged
+and treated as misses.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from src.config import settings
+from src.workers.llm_ledger import get_llm_ledger
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change page content.
+_TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src"}
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+# Prompt fields that change what the LLM returns.
+_PROMPT_VERSION_FIELDS = (
+    "system_prompt",
+    "user_prompt",
+    "expected_output_format",
+    "schema_example",
+    "provider",
+    "model_id",
+    "temperature",
+    "max_tokens",
+)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for cache keys (scheme/host case, ports, tracking params, fragment)."""
+    raw = str(url or "").strip()
+    parts = urlsplit(raw)
+    if not parts.scheme or not parts.netloc:
+        return raw
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    port = str(parts.port) if parts.port else ""
+    netloc = host if not port or _DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+        )
+    )
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(str(text or "").encode("utf-8")).hexdigest()
+
+
+def prompt_version(prompt_doc: Optional[Dict[str, Any]]) -> str:
+    """Stable hash of the prompt fields that affect the completion."""
+    doc = prompt_doc or {}
+    payload = {field: doc.get(field) for field in _PROMPT_VERSION_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_aware(value: Any) -> Optional[datetime]:
+    if not isinstance(value, datetime):
+        return None
+    # Mongo returns naive UTC datetimes unless tz_aware is set on the client.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class CachedPage:
+    """Parsed page text plus its content hash."""
+
+    def __init__(self, url: str, text: str, from_cache: bool = False):
+        self.url = url
+        self.text = text
+        self.content_hash = content_hash(text)
+        self.from_cache = from_cache
+
+
+class LinkCache:
+    """Page and link-result cache shared by the link pipeline steps and the link worker."""
+
+    def __init__(
+        self,
+        repo: Any = None,
+        page_ttl_seconds: Optional[float] = None,
+        result_ttl_seconds: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self._repo = repo
+        self.page_ttl_seconds = float(
+            settings.link_cache_page_ttl_hours * 3600 if page_ttl_seconds is None else page_ttl_seconds
+        )
+        self.result_ttl_seconds = float(
+            settings.link_cache_result_ttl_days * 86400 if result_ttl_seconds is None else result_ttl_seconds
+        )
+        self.enabled = settings.link_cache_enabled if enabled is None else enabled
+
+    async def _get_repo(self) -> Any:
+        if self._repo is not None:
+            return self._repo
+        from src.db.connection import get_db
+        from src.db.repositories import LinkCacheRepository
+
+        return LinkCacheRepository(await get_db())
+
+    async def fetch_page(self, url: str, fetch: Callable[[str], Awaitable[str]]) -> CachedPage:
+        """Return the parsed page, fetching only when there is no fresh cached copy."""
+        if not self.enabled:
+            return CachedPage(url, await fetch(url))
+
+        url_key = normalize_url(url)
+        try:
+            repo = await self._get_repo()
+            doc = await repo.get_page(url_key)
+        except Exception as exc:
+            logger.warning("Page cache lookup failed for %s: %s", url, exc)
+            return CachedPage(url, await fetch(url))
+
+        expires_at = _as_aware((doc or {}).get("expires_at"))
+        if doc and expires_at and expires_at > _utcnow():
+            return CachedPage(url, str(doc.get("text") or ""), from_cache=True)
+
+        page = CachedPage(url, await fetch(url))
+        now = _utcnow()
+        try:
+            await repo.upsert_page(
+                url_key,
+                {
+                    "url": url,
+                    "text": page.text,
+                    "content_hash": page.content_hash,
+                    "content_changed": bool(doc) and doc.get("content_hash") != page.content_hash,
+                    "fetched_at": now,
+                    "expires_at": now + timedelta(seconds=self.page_ttl_seconds),
+                },
+            )
+        except Exception as exc:
+            logger.warning("Page cache write failed for %s: %s", url, exc)
+        return page
+
+    def result_key(self, kind: str, content: str, prompt_doc: Optional[Dict[str, Any]], **inputs: Any) -> str:
+        """Cache key for an LLM result over ``content`` with ``prompt_doc`` and the prompt's other inputs."""
+        folded_inputs = {key: str(value or "").strip().lower() for key, value in sorted(inputs.items())}
+        payload = [kind, content_hash(content), prompt_version(prompt_doc), folded_inputs]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def get_result(
+        self,
+        cache_key: str,
+        provider: Optional[str] = None,
+        model_id: Optional[str] = None,
+    ) -> Optional[Any]:
+        """Cached result or None; hits are recorded in the LLM call ledger (``cache_hit``)."""
+        if not self.enabled:
+            return None
+        try:
+            doc = await (await self._get_repo()).get_result(cache_key)
+        except Exception as exc:
+            logger.warning("Link result cache lookup failed: %s", exc)
+            return None
+        if not doc:
+            return None
+        get_llm_ledger().record(
+            provider=str(provider or doc.get("provider") or ""),
+            model_id=str(model_id or doc.get("model_id") or ""),
+            cache_hit=True,
+        )
+        return doc.get("result")
+
+    async def put_result(
+        self,
+        cache_key: str,
+        kind: str,
+        content: str,
+        prompt_doc: Optional[Dict[str, Any]],
+        result: Any,
+    ) -> None:
+        if not self.enabled or not result:
+            return
+        now = _utcnow()
+        try:
+            await (await self._get_repo()).put_result(
+                cache_key,
+                {
+                    "kind": kind,
+                    "content_hash": content_hash(content),
+                    "prompt_version": prompt_version(prompt_doc),
+                    "provider": (prompt_doc or {}).get("provider"),
+                    "model_id": (prompt_doc or {}).get("model_id"),
+                    "result": result,
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=self.result_ttl_seconds),
+                },
+            )
+        except Exception as exc:
+            logger.warning("Link result cache write failed: %s", exc)
+
+
+_link_cache: Optional[LinkCache] = None
+
+
+def get_link_cache() -> LinkCache:
+    """Return process-wide link cache (created lazily so settings overrides apply)."""
+    global _link_cache
+    if _link_cache is None:
+        _link_cache = LinkCache()
+    return _link_cache
@@ -15,7 +15,9 @@ from src.db.repositories import (
     PromptRepository,
     KnowledgeBaseRepository,
 )
+from src.scrapers.crawl_frontier import get_crawl_frontier
 from src.scrapers.link_finder import LinkFinder
+from src.workers.link_cache import get_link_cache
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,7 @@ def find_and_summarize_links(self, submission_id: str, book_title: str, author:
             book = await book_repo.get_by_id(book_id)
 
         finder = LinkFinder()
+        link_cache = get_link_cache()
         links = await finder.search_book_links(title=book_title, author=author, count=3)
 
         prompt = (
@@ -54,15 +57,21 @@ def find_and_summarize_links(self, submission_id: str, book_title: str, author:
             or await prompt_repo.get_by_name("Link Summarizer")
         )
 
-        saved = 0
-        for item in links:
-            url = item.get("url")
-            if not url:
-                continue
+        urls = [str(item.get("url") or "") for item in links if item.get("url")]
+        pages = await get_crawl_frontier().fetch_many(
+            urls,
+            lambda url: link_cache.fetch_page(url, finder.fetch_and_parse),
+        )
 
+        saved = 0
+        for url, page in zip(urls, pages):
             try:
-                content = await finder.fetch_and_parse(url)
-                summary_data = await finder.summarize_page(content=content, title=book_title, prompt_doc=prompt)
+                if isinstance(page, Exception):
+                    raise page
+                content = page.text
+                summary_data = await finder.summarize_page(
+                    content=content, title=book_title, prompt_doc=prompt, cache=link_cache
+                )
                 await summary_repo.create(
                     book_id=str(book.get("_id")),
                     source_url=url,
@@ -0,0 +1,603 @@
+"""Batch execution backend for LLM requests.
+
+Backlog imports do not need interactive latency. Steps that opt in
+(``ai.execution_mode = "batch"``) queue their chat completions instead of
+calling the provider: requests from many submissions accumulate in Mongo, are
+flushed as one JSONL batch job per provider/model, and polled until the
+provider publishes results. The waiting step is then re-queued and finds its
+answers already stored, so the load runs on batch quotas (cheaper, higher
+throughput) instead of the synchronous rate limits.
+
+Requests are identified by their prompt, so a step re-run with changed inputs
+queues new requests. Each request records a fingerprint of the API key the step
+resolved, and jobs are submitted and polled with that same credential.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from src.config import settings
+from src.workers.ai_defaults import PROVIDER_GROQ, PROVIDER_MISTRAL, normalize_provider
+from src.workers.llm_ledger import get_llm_ledger, usage_tokens
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODE_SYNC = "sync"
+EXECUTION_MODE_BATCH = "batch"
+EXECUTION_MODES = (EXECUTION_MODE_SYNC, EXECUTION_MODE_BATCH)
+
+REQUEST_PENDING = "pending"
+REQUEST_SUBMITTING = "submitting"
+REQUEST_SUBMITTED = "submitted"
+REQUEST_COMPLETED = "completed"
+REQUEST_FAILED = "failed"
+
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+FLUSH_TASK_NAME = "src.workers.batch_tasks.flush_llm_batches_task"
+POLL_TASK_NAME = "src.workers.batch_tasks.poll_llm_batches_task"
+_FLUSH_SCHEDULED_KEY = "pigmeu:llm_batch:flush_scheduled"
+
+
+class BatchPending(Exception):
+    """Raised when a request was queued for batch execution and has no result yet."""
+
+    def __init__(self, custom_id: str):
+        super().__init__(f"LLM batch request {custom_id} is pending")
+        self.custom_id = custom_id
+
+
+class BatchContext:
+    """Identifies who is waiting on a batched request and how to resume them."""
+
+    def __init__(
+        self,
+        submission_id: str,
+        step_id: str,
+        resume_task: str,
+        resume_kwargs: Optional[Dict[str, Any]] = None,
+        request_key: Optional[str] = None,
+    ):
+        self.submission_id = str(submission_id)
+        self.step_id = step_id
+        self.resume_task = resume_task
+        self.resume_kwargs = dict(resume_kwargs or {"submission_id": self.submission_id})
+        self.request_key = request_key
+
+    @classmethod
+    def from_step_config(
+        cls,
+        step_id: str,
+        ai_config: Optional[Dict[str, Any]],
+        submission_id: str,
+        resume_task: str,
+    ) -> Optional["BatchContext"]:
+        """Build a context when the step runs in batch mode, otherwise return None."""
+        if (ai_config or {}).get("execution_mode") != EXECUTION_MODE_BATCH:
+            return None
+        return cls(submission_id=submission_id, step_id=step_id, resume_task=resume_task)
+
+    def for_request(self, request_key: str) -> "BatchContext":
+        """Copy of this context for one of several calls made by the same step run.
+
+        The key (e.g. the link URL) tells apart calls of one run that would
+        otherwise send the same prompt.
+        """
+        return BatchContext(
+            submission_id=self.submission_id,
+            step_id=self.step_id,
+            resume_task=self.resume_task,
+            resume_kwargs=self.resume_kwargs,
+            request_key=request_key,
+        )
+
+
+def batch_custom_id(
+    context: BatchContext,
+    provider: str,
+    model_id: str,
+    system_prompt: str,
+    user_prompt: str,
+) -> str:
+    """Deterministic id so re-running a waiting step finds its queued request.
+
+    The prompt is always part of the id: a re-run whose prompt or inputs changed
+    gets a new request instead of the result stored for the old prompt.
+    """
+    prompt_hash = hashlib.sha256(f"{system_prompt}\n{user_prompt}".encode("utf-8")).hexdigest()
+    raw = json.dumps([context.submission_id, context.step_id, provider, model_id, context.request_key, prompt_hash])
+    return "req-" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def credential_fingerprint(api_key: Optional[str]) -> Optional[str]:
+    """Stable reference to an API key that can be stored instead of the key itself."""
+    if not api_key:
+        return None
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:16]
+
+
+def build_chat_body(
+    model_id: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    body = {
+        "model": model_id,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format:
+        body["response_format"] = response_format
+    return body
+
+
+class BatchJobStatus:
+    """Provider-neutral view of a batch job."""
+
+    def __init__(
+        self,
+        job_id: str,
+        state: str,
+        raw_status: Optional[str] = None,
+        output_file_id: Optional[str] = None,
+        error_file_id: Optional[str] = None,
+    ):
+        self.job_id = job_id
+        self.state = state
+        self.raw_status = raw_status
+        self.output_file_id = output_file_id
+        self.error_file_id = error_file_id
+
+
+class BatchAdapter(ABC):
+    """Provider batch API: upload a JSONL file, create a job, poll it and download results."""
+
+    provider = ""
+    default_base_url = ""
+    # Provider status -> JOB_* state; unknown statuses count as still running.
+    status_map: Dict[str, str] = {}
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        timeout: float = 60.0,
+    ):
+        self.api_key = api_key
+        self.base_url = (base_url or self.default_base_url).rstrip("/")
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(timeout=timeout)
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            await self._client.aclose()
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def build_line(self, custom_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_ENDPOINT, "body": body}
+
+    def encode_jsonl(self, items: List[Tuple[str, Dict[str, Any]]]) -> bytes:
+        lines = [json.dumps(self.build_line(custom_id, body), ensure_ascii=False) for custom_id, body in items]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    async def _upload(self, payload: bytes) -> str:
+        response = await self._client.post(
+            self._url("/files"),
+            headers=self._headers,
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", payload, "application/jsonl")},
+        )
+        response.raise_for_status()
+        return str(response.json()["id"])
+
+    async def _download(self, file_id: str) -> str:
+        response = await self._client.get(self._url(f"/files/{file_id}/content"), headers=self._headers)
+        response.raise_for_status()
+        return response.text
+
+    @abstractmethod
+    async def submit(self, items: List[Tuple[str, Dict[str, Any]]], model_id: str) -> str:
+        """Upload ``(custom_id, body)`` items and create a job; returns the provider job id."""
+
+    @abstractmethod
+    async def status(self, job_id: str) -> BatchJobStatus:
+        """Current state of a job created by ``submit``."""
+
+    async def results(self, job: BatchJobStatus) -> Dict[str, Dict[str, Any]]:
+        """Map ``custom_id`` to ``{"content": ...}`` or ``{"error": ...}`` for a finished job."""
+        results: Dict[str, Dict[str, Any]] = {}
+        for file_id in (job.error_file_id, job.output_file_id):
+            if file_id:
+                results.update(parse_result_lines(await self._download(file_id)))
+        return results
+
+
+class OpenAICompatibleBatchAdapter(BatchAdapter):
+    """OpenAI-style ``/files`` + ``/batches`` API (used by Groq)."""
+
+    provider = PROVIDER_GROQ
+    default_base_url = "https://api.groq.com/openai/v1"
+    status_map = {
+        "validating": JOB_RUNNING,
+        "in_progress": JOB_RUNNING,
+        "finalizing": JOB_RUNNING,
+        "completed": JOB_COMPLETED,
+        "failed": JOB_FAILED,
+        "expired": JOB_FAILED,
+        "cancelling": JOB_FAILED,
+        "cancelled": JOB_FAILED,
+    }
+
+    async def submit(self, items: List[Tuple[str, Dict[str, Any]]], model_id: str) -> str:
+        file_id = await self._upload(self.encode_jsonl(items))
+        response = await self._client.post(
+            self._url("/batches"),
+            headers=self._headers,
+            json={
+                "input_file_id": file_id,
+                "endpoint": CHAT_COMPLETIONS_ENDPOINT,
+                "completion_window": settings.llm_batch_completion_window,
+            },
+        )
+        response.raise_for_status()
+        return str(response.json()["id"])
+
+    async def status(self, job_id: str) -> BatchJobStatus:
+        response = await self._client.get(self._url(f"/batches/{job_id}"), headers=self._headers)
+        response.raise_for_status()
+        data = response.json()
+        raw_status = str(data.get("status") or "")
+        return BatchJobStatus(
+            job_id=job_id,
+            state=self.status_map.get(raw_status, JOB_RUNNING),
+            raw_status=raw_status,
+            output_file_id=data.get("output_file_id"),
+            error_file_id=data.get("error_file_id"),
+        )
+
+
+class MistralBatchAdapter(BatchAdapter):
+    """Mistral ``/files`` + ``/batch/jobs`` API (model is set per job, not per line)."""
+
+    provider = PROVIDER_MISTRAL
+    default_base_url = "https://api.mistral.ai/v1"
+    status_map = {
+        "QUEUED": JOB_RUNNING,
+        "RUNNING": JOB_RUNNING,
+        "SUCCESS": JOB_COMPLETED,
+        "FAILED": JOB_FAILED,
+        "TIMEOUT_EXCEEDED": JOB_FAILED,
+        "CANCELLATION_REQUESTED": JOB_FAILED,
+        "CANCELLED": JOB_FAILED,
+    }
+
+    def build_line(self, custom_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {"custom_id": custom_id, "body": {key: value for key, value in body.items() if key != "model"}}
+
+    async def submit(self, items: List[Tuple[str, Dict[str, Any]]], model_id: str) -> str:
+        file_id = await self._upload(self.encode_jsonl(items))
+        response = await self._client.post(
+            self._url("/batch/jobs"),
+            headers=self._headers,
+            json={"input_files": [file_id], "model": model_id, "endpoint": CHAT_COMPLETIONS_ENDPOINT},
+        )
+        response.raise_for_status()
+        return str(response.json()["id"])
+
+    async def status(self, job_id: str) -> BatchJobStatus:
+        response = await self._client.get(self._url(f"/batch/jobs/{job_id}"), headers=self._headers)
+        response.raise_for_status()
+        data = response.json()
+        raw_status = str(data.get("status") or "")
+        return BatchJobStatus(
+            job_id=job_id,
+            state=self.status_map.get(raw_status, JOB_RUNNING),
+            raw_status=raw_status,
+            output_file_id=data.get("output_file"),
+            error_file_id=data.get("error_file"),
+        )
+
+
+def parse_result_lines(text: str) -> Dict[str, Dict[str, Any]]:
+    """Parse a batch output/error JSONL file into ``custom_id -> result`` entries."""
+    results: Dict[str, Dict[str, Any]] = {}
+    for line in (text or "").splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("Skipping malformed batch result line: %s", line[:200])
+            continue
+        custom_id = item.get("custom_id")
+        if not custom_id:
+            continue
+
+        response = item.get("response") or {}
+        body = response.get("body") or {}
+        status_code = response.get("status_code")
+        error = item.get("error") or (body.get("error") if isinstance(body, dict) else None)
+        if error or (status_code is not None and int(status_code) >= 400):
+            results[custom_id] = {"error": str(error or f"HTTP {status_code}")}
+            continue
+
+        try:
+            content = body["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            results[custom_id] = {"error": "missing completion content"}
+            continue
+        results[custom_id] = {
+            "content": content.strip() if isinstance(content, str) else "",
+            "usage": usage_tokens(body.get("usage")),
+        }
+    return results
+
+
+_ADAPTERS = {
+    PROVIDER_GROQ: OpenAICompatibleBatchAdapter,
+    PROVIDER_MISTRAL: MistralBatchAdapter,
+}
+
+
+def get_batch_adapter(
+    provider: str,
+    api_key: str,
+    client: Optional[httpx.AsyncClient] = None,
+    base_url: Optional[str] = None,
+) -> BatchAdapter:
+    """Return the batch adapter for ``provider``."""
+    adapter_cls = _ADAPTERS.get(normalize_provider(provider) or "")
+    if adapter_cls is None:
+        raise ValueError(f"Batch execution is not supported for provider '{provider}'")
+    return adapter_cls(api_key=api_key, base_url=base_url, client=client)
+
+
+# (provider, credential fingerprint or None) -> API key
+ApiKeyResolver = Callable[[str, Optional[str]], Awaitable[Optional[str]]]
+AdapterFactory = Callable[[str, str], BatchAdapter]
+
+
+class LLMBatchBackend:
+    """Queue requests for batch execution, submit/poll jobs and serve stored results."""
+
+    def __init__(self, repo: Any = None, adapter_factory: Optional[AdapterFactory] = None):
+        self._repo = repo
+        self._adapter_factory = adapter_factory or get_batch_adapter
+
+    async def _get_repo(self) -> Any:
+        if self._repo is not None:
+            return self._repo
+        from src.db.connection import get_db
+        from src.db.repositories import LLMBatchRepository
+
+        return LLMBatchRepository(await get_db())
+
+    async def generate(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        context: BatchContext,
+        model_id: str,
+        provider: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        response_format: Optional[Dict[str, Any]] = None,
+        api_key: Optional[str] = None,
+    ) -> str:
+        """Return the batched completion, queueing the request and raising BatchPending if needed.
+
+        A failed request raises once; when the step asks for it again (a retry)
+        it is queued for another batch job.
+        """
+        custom_id = batch_custom_id(context, provider, model_id, system_prompt, user_prompt)
+        repo = await self._get_repo()
+        doc = await repo.get_request(custom_id)
+
+        if doc is None:
+            created = await repo.enqueue_request(
+                {
+                    "custom_id": custom_id,
+                    "provider": provider,
+                    "model_id": model_id,
+                    "credential": credential_fingerprint(api_key),
+                    "body": build_chat_body(
+                        model_id, system_prompt, user_prompt, temperature, max_tokens, response_format
+                    ),
+                    "submission_id": context.submission_id,
+                    "step_id": context.step_id,
+                    "request_key": context.request_key,
+                    "resume_task": context.resume_task,
+                    "resume_kwargs": context.resume_kwargs,
+                }
+            )
+            if created:
+                await self._schedule_flush()
+            raise BatchPending(custom_id)
+
+        status = doc.get("status")
+        if status == REQUEST_COMPLETED:
+            get_llm_ledger().record(
+                provider=provider,
+                model_id=model_id,
+                execution_mode=EXECUTION_MODE_BATCH,
+                **usage_tokens(doc.get("usage")),
+            )
+            return str(doc.get("result") or "")
+        if status == REQUEST_FAILED:
+            if not doc.get("failure_reported"):
+                await repo.update_requests({"custom_id": custom_id}, {"failure_reported": True})
+                raise RuntimeError(f"LLM batch request {custom_id} failed: {doc.get('error')}")
+            requeued = await repo.update_requests(
+                {"custom_id": custom_id, "status": REQUEST_FAILED},
+                {
+                    "status": REQUEST_PENDING,
+                    "attempts": 0,
+                    "job_id": None,
+                    "claim_id": None,
+                    "credential": credential_fingerprint(api_key),
+                    "failure_reported": False,
+                },
+            )
+            if requeued:
+                logger.info("Re-queued failed LLM batch request %s", custom_id)
+                await self._schedule_flush()
+        raise BatchPending(custom_id)
+
+    async def _schedule_flush(self) -> None:
+        """Queue one delayed flush per window so requests from many submissions share a job."""
+        delay = max(0, int(settings.llm_batch_flush_delay_seconds))
+        try:
+            from src.db.connection import get_redis_client
+
+            redis = await get_redis_client()
+            if not await redis.set(_FLUSH_SCHEDULED_KEY, "1", nx=True, ex=max(1, delay)):
+                return
+        except Exception as exc:
+            logger.debug("Batch flush dedupe unavailable, scheduling anyway: %s", exc)
+
+        try:
+            from celery import current_app
+
+            current_app.send_task(FLUSH_TASK_NAME, countdown=delay)
+        except Exception as exc:
+            logger.warning("Failed to schedule LLM batch flush: %s", exc)
+
+    async def flush(self, resolve_api_key: ApiKeyResolver) -> List[str]:
+        """Submit pending requests as one job per provider/model; returns created job ids."""
+        repo = await self._get_repo()
+        job_ids: List[str] = []
+        for group in await repo.pending_groups():
+            provider, model_id, credential = group["provider"], group["model_id"], group.get("credential")
+            api_key = await resolve_api_key(provider, credential)
+            if not api_key:
+                logger.warning(
+                    "No credential for batch provider '%s'; %s requests stay pending", provider, group["count"]
+                )
+                continue
+
+            claim_id = uuid.uuid4().hex
+            claimed = await repo.claim_pending(
+                provider, model_id, credential, claim_id, settings.llm_batch_max_requests_per_job
+            )
+            if not claimed:
+                continue
+
+            adapter = self._adapter_factory(provider, api_key)
+            try:
+                job_id = await adapter.submit([(item["custom_id"], item["body"]) for item in claimed], model_id)
+            except Exception as exc:
+                logger.warning("Batch submission failed for %s:%s: %s", provider, model_id, exc)
+                await repo.update_requests({"claim_id": claim_id}, {"status": REQUEST_PENDING, "error": str(exc)})
+                continue
+            finally:
+                await adapter.aclose()
+
+            await repo.create_job(
+                {
+                    "job_id": job_id,
+                    "provider": provider,
+                    "model_id": model_id,
+                    "credential": credential,
+                    "status": JOB_RUNNING,
+                    "request_count": len(claimed),
+                }
+            )
+            await repo.update_requests(
+                {"claim_id": claim_id},
+                {"status": REQUEST_SUBMITTED, "job_id": job_id},
+                inc={"attempts": 1},
+            )
+            logger.info("Submitted LLM batch job %s (%s:%s, %s requests)", job_id, provider, model_id, len(claimed))
+            job_ids.append(job_id)
+        return job_ids
+
+    async def poll(self, resolve_api_key: ApiKeyResolver) -> Dict[str, Any]:
+        """Check open jobs, store finished results and collect the steps to resume."""
+        repo = await self._get_repo()
+        open_jobs = 0
+        requeued = 0
+        resume: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+        for job in await repo.list_open_jobs():
+            job_id = job["job_id"]
+            api_key = await resolve_api_key(job["provider"], job.get("credential"))
+            if not api_key:
+                open_jobs += 1
+                continue
+
+            adapter = self._adapter_factory(job["provider"], api_key)
+            try:
+                status = await adapter.status(job_id)
+                if status.state == JOB_RUNNING:
+                    open_jobs += 1
+                    continue
+                results = await adapter.results(status) if status.state == JOB_COMPLETED else {}
+            except Exception as exc:
+                logger.warning("Failed to poll LLM batch job %s: %s", job_id, exc)
+                open_jobs += 1
+                continue
+            finally:
+                await adapter.aclose()
+
+            for item in await repo.list_requests_by_job(job_id):
+                result = results.get(item["custom_id"])
+                if result is None and item.get("attempts", 0) < settings.llm_batch_max_attempts:
+                    # Job failed or dropped this line: queue it again for the next flush.
+                    await repo.update_requests(
+                        {"custom_id": item["custom_id"]},
+                        {"status": REQUEST_PENDING, "job_id": None, "claim_id": None},
+                    )
+                    requeued += 1
+                    continue
+
+                if result is not None and "content" in result:
+                    await repo.store_result(
+                        item["custom_id"],
+                        {"status": REQUEST_COMPLETED, "result": result["content"], "usage": result.get("usage")},
+                    )
+                else:
+                    error = (result or {}).get("error") or f"batch job {status.raw_status or status.state}"
+                    await repo.store_result(item["custom_id"], {"status": REQUEST_FAILED, "error": error})
+
+                if item.get("resume_task"):
+                    resume_kwargs = item.get("resume_kwargs") or {}
+                    key = json.dumps([item["resume_task"], resume_kwargs], sort_keys=True, default=str)
+                    resume[key] = (item["resume_task"], resume_kwargs)
+
+            await repo.update_job(job_id, {"status": status.state, "raw_status": status.raw_status})
+            logger.info("LLM batch job %s finished with status %s", job_id, status.raw_status)
+
+        return {"open_jobs": open_jobs, "requeued": requeued, "resume": list(resume.values())}
+
+
+_backend = LLMBatchBackend()
+
+
+def get_llm_batch_backend() -> LLMBatchBackend:
+    """Return process-wide batch backend."""
+    return _backend
@@ -1,9 +1,12 @@
-"""LLM client with provider routing (Groq/Mistral)."""
+"""LLM client with provider routing (Groq/Mistral, plus the deterministic local provider)."""
 
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+import copy
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from openai import AsyncOpenAI
 
@@ -12,24 +15,55 @@ from src.workers.ai_defaults import (
     DEFAULT_MODEL_ID,
     DEFAULT_PROVIDER,
     PROVIDER_GROQ,
+    PROVIDER_LOCAL,
     PROVIDER_MISTRAL,
+    STRUCTURED_OUTPUT_JSON_OBJECT,
+    STRUCTURED_OUTPUT_JSON_SCHEMA,
+    default_model_for_provider,
     infer_provider_from_model,
     normalize_provider,
+    resolve_structured_output_mode,
+)
+from src.workers.llm_batch import BatchContext, get_llm_batch_backend
+from src.workers.llm_hedging import HedgePolicy, get_hedge_budget, get_latency_tracker
+from src.workers.llm_ledger import get_llm_ledger, llm_call_scope, usage_tokens
+from src.workers.llm_local import get_local_llm_provider
+from src.workers.llm_rate_limiter import LLMRateLimiter, estimate_request_tokens, get_llm_rate_limiter
+from src.workers.llm_retry import (
+    CIRCUIT_ERRORS,
+    RETRYABLE_ERRORS,
+    CircuitOpenError,
+    RetryPolicy,
+    classify_error,
+    get_circuit_breaker,
+    retry_after_seconds,
+)
+from src.workers.llm_stream import JsonClosedStop, StopCondition
+from src.workers.prompt_budget import count_tokens
+from src.workers.structured_output import OutputSpec, StructuredOutputError, extract_json_object
+
+logger = logging.getLogger(__name__)
+
+STRUCTURED_REPAIR_SYSTEM_PROMPT = (
+    "You repair malformed JSON produced by another model. "
+    "Return only a JSON object that follows the expected output format. "
+    "Keep the original values and wording; do not add information that is not in the invalid output."
 )
 
 
 class LLMClient:
     """Client for interacting with language models."""
 
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[LLMRateLimiter] = None):
+        self._rate_limiter = rate_limiter or get_llm_rate_limiter()
         self._clients = {
             PROVIDER_GROQ: (
-                AsyncOpenAI(api_key=settings.groq_api_key, base_url="https://api.groq.com/openai/v1")
+                AsyncOpenAI(api_key=settings.groq_api_key, base_url="https://api.groq.com/openai/v1", max_retries=0)
                 if settings.groq_api_key
                 else None
             ),
             PROVIDER_MISTRAL: (
-                AsyncOpenAI(api_key=settings.mistral_api_key, base_url="https://api.mistral.ai/v1")
+                AsyncOpenAI(api_key=settings.mistral_api_key, base_url="https://api.mistral.ai/v1", max_retries=0)
                 if settings.mistral_api_key
                 else None
             ),
@@ -51,7 +85,8 @@ class LLMClient:
     @classmethod
     def _build_client(cls, provider: str, api_key: str) -> AsyncOpenAI:
         normalized = cls._normalize_provider(provider) or DEFAULT_PROVIDER
-        kwargs = {"api_key": api_key}
+        # Retries are driven by generate_with_retry, not the SDK.
+        kwargs = {"api_key": api_key, "max_retries": 0}
         base_url = cls._provider_base_url(normalized)
         if base_url:
             kwargs["base_url"] = base_url
@@ -59,24 +94,41 @@ class LLMClient:
 
     @staticmethod
     def _select_provider(model_id: str, provider: Optional[str]) -> str:
+        forced = LLMClient._normalize_provider(settings.llm_force_provider)
+        if forced:
+            return forced
         normalized = LLMClient._normalize_provider(provider)
         if normalized:
             return normalized
         return infer_provider_from_model(model_id=model_id, fallback=DEFAULT_PROVIDER)
 
-    async def generate(
+    @staticmethod
+    def _structured_output_kwargs(provider: str, model_id: str, output_spec: Optional[OutputSpec]) -> Dict[str, Any]:
+        """Provider ``response_format`` for a JSON output spec (empty when unsupported/disabled)."""
+        if output_spec is None:
+            return {}
+        mode = resolve_structured_output_mode(provider, model_id, settings.llm_structured_output_modes)
+        if mode == STRUCTURED_OUTPUT_JSON_SCHEMA:
+            return {
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": {"name": output_spec.name, "schema": output_spec.json_schema, "strict": False},
+                }
+            }
+        if mode == STRUCTURED_OUTPUT_JSON_OBJECT:
+            return {"response_format": {"type": "json_object"}}
+        return {}
+
+    def _resolve_client(
         self,
-        system_prompt: str,
-        user_prompt: str,
-        model_id: str = DEFAULT_MODEL_ID,
-        temperature: float = 0.7,
-        max_tokens: int = 1000,
-        provider: Optional[str] = None,
-        api_key: Optional[str] = None,
-        allow_fallback: bool = True,
-        **kwargs,
-    ) -> str:
+        model_id: str,
+        provider: Optional[str],
+        api_key: Optional[str],
+        allow_fallback: bool,
+    ) -> Tuple[AsyncOpenAI, str]:
         selected_provider = self._select_provider(model_id=model_id, provider=provider)
+        if selected_provider == PROVIDER_LOCAL:
+            return get_local_llm_provider(), selected_provider
         client = self._build_client(selected_provider, api_key) if api_key else self._clients.get(selected_provider)
 
         # Fallback between supported providers only (no OpenAI automatic fallback).
@@ -89,40 +141,386 @@ class LLMClient:
             for fallback in fallback_order:
                 if self._clients.get(fallback) is not None:
                     client = self._clients[fallback]
+                    selected_provider = fallback
                     break
 
         if client is None:
             raise RuntimeError("No LLM provider configured")
+        return client, selected_provider
 
-        response = await client.chat.completions.create(
-            model=model_id,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens,
-            **kwargs,
+    async def generate(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model_id: str = DEFAULT_MODEL_ID,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        provider: Optional[str] = None,
+        api_key: Optional[str] = None,
+        allow_fallback: bool = True,
+        stop_when: Optional[StopCondition] = None,
+        output_spec: Optional[OutputSpec] = None,
+        **kwargs,
+    ) -> str:
+        if stop_when is not None:
+            chunks = []
+            async for chunk in self.generate_stream(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                model_id=model_id,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                provider=provider,
+                api_key=api_key,
+                allow_fallback=allow_fallback,
+                stop_when=stop_when,
+                output_spec=output_spec,
+                **kwargs,
+            ):
+                chunks.append(chunk)
+            return "".join(chunks).strip()
+
+        client, selected_provider = self._resolve_client(model_id, provider, api_key, allow_fallback)
+        kwargs.update(self._structured_output_kwargs(selected_provider, model_id, output_spec))
+        await self._rate_limiter.acquire(
+            provider=selected_provider,
+            model_id=model_id,
+            api_key=api_key,
+            estimated_tokens=estimate_request_tokens(system_prompt, user_prompt, max_tokens),
+        )
+
+        started = time.monotonic()
+        try:
+            response = await client.chat.completions.create(
+                model=model_id,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs,
+            )
+        except Exception as exc:
+            self._record_failure(selected_provider, model_id, started, exc)
+            raise
+        latency = time.monotonic() - started
+        get_latency_tracker().record(selected_provider, model_id, latency)
+        get_llm_ledger().record(
+            provider=selected_provider,
+            model_id=model_id,
+            latency_seconds=latency,
+            **usage_tokens(getattr(response, "usage", None)),
         )
 
         content = response.choices[0].message.content
         return content.strip() if isinstance(content, str) else ""
 
+    @staticmethod
+    def _record_failure(provider: str, model_id: str, started: float, exc: BaseException) -> None:
+        if isinstance(exc, asyncio.CancelledError):
+            # Hedge losers are cancelled on purpose; not a provider failure.
+            return
+        get_llm_ledger().record(
+            provider=provider,
+            model_id=model_id,
+            latency_seconds=time.monotonic() - started,
+            status="error",
+            error_class=classify_error(exc),
+        )
+
+    async def generate_stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model_id: str = DEFAULT_MODEL_ID,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        provider: Optional[str] = None,
+        api_key: Optional[str] = None,
+        allow_fallback: bool = True,
+        stop_when: Optional[StopCondition] = None,
+        output_spec: Optional[OutputSpec] = None,
+        **kwargs,
+    ) -> AsyncIterator[str]:
+        """Yield completion text as it arrives.
+
+        When ``stop_when`` returns True for the accumulated text the stream is
+        closed, so the provider stops generating (and billing) output tokens.
+        """
+        client, selected_provider = self._resolve_client(model_id, provider, api_key, allow_fallback)
+        kwargs.update(self._structured_output_kwargs(selected_provider, model_id, output_spec))
+        await self._rate_limiter.acquire(
+            provider=selected_provider,
+            model_id=model_id,
+            api_key=api_key,
+            estimated_tokens=estimate_request_tokens(system_prompt, user_prompt, max_tokens),
+        )
+
+        started = time.monotonic()
+        try:
+            stream = await client.chat.completions.create(
+                model=model_id,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **kwargs,
+            )
+        except Exception as exc:
+            self._record_failure(selected_provider, model_id, started, exc)
+            raise
+
+        # Conditions are stateful; a retried call must start from a clean scan.
+        reset = getattr(stop_when, "reset", None)
+        if reset is not None:
+            reset()
+
+        accumulated = ""
+        usage = None
+        stopped_early = False
+        try:
+            async for chunk in stream:
+                # Final chunk carries usage (Mistral: chunk.usage, Groq: chunk.x_groq.usage).
+                chunk_usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                usage = chunk_usage or usage
+                choices = getattr(chunk, "choices", None) or []
+                delta = getattr(choices[0].delta, "content", None) if choices else None
+                if not isinstance(delta, str) or not delta:
+                    continue
+                accumulated += delta
+                yield delta
+                if stop_when is not None and stop_when(accumulated):
+                    logger.debug("LLM stream stopped early after %s chars (%s)", len(accumulated), model_id)
+                    stopped_early = True
+                    break
+            latency = time.monotonic() - started
+            get_latency_tracker().record(selected_provider, model_id, latency)
+
+            tokens = usage_tokens(usage)
+            estimated = tokens["prompt_tokens"] is None or tokens["completion_tokens"] is None
+            if estimated:
+                # Early-stopped streams never receive the usage chunk; count locally.
+                tokens = {
+                    "prompt_tokens": count_tokens(system_prompt, model_id) + count_tokens(user_prompt, model_id),
+                    "completion_tokens": count_tokens(accumulated, model_id),
+                }
+            get_llm_ledger().record(
+                provider=selected_provider,
+                model_id=model_id,
+                latency_seconds=latency,
+                streamed=True,
+                stopped_early=stopped_early,
+                usage_estimated=estimated,
+                **tokens,
+            )
+        except Exception as exc:
+            self._record_failure(selected_provider, model_id, started, exc)
+            raise
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                await close()
+
+    async def _generate_hedged(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        hedge: HedgePolicy,
+        **kwargs,
+    ) -> str:
+        """Race the primary call against a delayed call to the secondary provider."""
+        model_id = kwargs.get("model_id") or DEFAULT_MODEL_ID
+        provider = self._select_provider(model_id=model_id, provider=kwargs.get("provider"))
+        budget = get_hedge_budget()
+        budget.record_call(hedge.step_id)
+
+        primary = asyncio.ensure_future(
+            self.generate(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
+        )
+        pending = {primary}
+        try:
+            if estimate_request_tokens(system_prompt, user_prompt, 0) > hedge.max_prompt_tokens:
+                return await primary
+
+            delay = hedge.hedge_delay(get_latency_tracker(), provider, model_id)
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not budget.try_acquire(hedge.step_id, hedge.max_hedge_ratio):
+                return await primary
+
+            secondary_kwargs = dict(kwargs)
+            secondary_kwargs.update(
+                provider=hedge.secondary_provider,
+                model_id=hedge.secondary_model_id or default_model_for_provider(hedge.secondary_provider),
+                api_key=hedge.secondary_api_key,
+                allow_fallback=False,
+            )
+            if secondary_kwargs.get("stop_when") is not None:
+                # Stop conditions keep scan state; each stream needs its own.
+                secondary_kwargs["stop_when"] = copy.copy(secondary_kwargs["stop_when"])
+            logger.info(
+                "Hedging step '%s': %s:%s slower than %.1fs, firing %s:%s",
+                hedge.step_id,
+                provider,
+                model_id,
+                delay,
+                secondary_kwargs["provider"],
+                secondary_kwargs["model_id"],
+            )
+            with llm_call_scope(hedged=True):
+                secondary = asyncio.ensure_future(
+                    self.generate(system_prompt=system_prompt, user_prompt=user_prompt, **secondary_kwargs)
+                )
+            pending.add(secondary)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed: surface the primary error so retry classification applies to it.
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
     async def generate_with_retry(
         self,
         system_prompt: str,
         user_prompt: str,
         max_retries: int = 3,
+        retry_policy: Optional[RetryPolicy] = None,
+        hedge: Optional[HedgePolicy] = None,
+        batch: Optional[BatchContext] = None,
         **kwargs,
     ) -> str:
+        policy = retry_policy or RetryPolicy()
+        model_id = kwargs.get("model_id") or DEFAULT_MODEL_ID
+        provider = self._select_provider(model_id=model_id, provider=kwargs.get("provider"))
+
+        if batch is not None and provider != PROVIDER_LOCAL:
+            # Batch jobs are retried by the batch backend; raises BatchPending until results exist.
+            return await get_llm_batch_backend().generate(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                context=batch,
+                model_id=model_id,
+                provider=provider,
+                temperature=kwargs.get("temperature", 0.7),
+                max_tokens=kwargs.get("max_tokens", 1000),
+                api_key=kwargs.get("api_key"),
+                **self._structured_output_kwargs(provider, model_id, kwargs.get("output_spec")),
+            )
+        breaker = get_circuit_breaker(provider, model_id)
+        deadline = time.monotonic() + policy.deadline_seconds
         last_error: Optional[Exception] = None
+        attempts = 0
 
         for attempt in range(max_retries):
+            if not breaker.allow():
+                if last_error is None:
+                    raise CircuitOpenError(f"{provider}:{model_id}", breaker.retry_in())
+                break
+
+            attempts += 1
             try:
-                return await self.generate(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
+                with llm_call_scope(retry_count=attempt):
+                    if hedge is not None:
+                        result = await self._generate_hedged(system_prompt, user_prompt, hedge, **kwargs)
+                    else:
+                        result = await self.generate(system_prompt=system_prompt, user_prompt=user_prompt, **kwargs)
+                breaker.record_success()
+                return result
             except Exception as e:
                 last_error = e
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1 + attempt)
+                error_class = classify_error(e)
+                if error_class in CIRCUIT_ERRORS:
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+                if error_class not in RETRYABLE_ERRORS or attempt >= max_retries - 1:
+                    break
+
+                delay = policy.compute_delay(attempt, retry_after_seconds(e))
+                if time.monotonic() + delay > deadline:
+                    logger.warning("LLM retry deadline reached for %s:%s after %s attempts", provider, model_id, attempts)
+                    break
+                logger.info(
+                    "LLM %s error on %s:%s (attempt %s/%s), retrying in %.1fs",
+                    error_class,
+                    provider,
+                    model_id,
+                    attempts,
+                    max_retries,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+        raise RuntimeError(f"Failed after {attempts} attempts: {last_error}") from last_error
+
+    async def generate_structured(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        output_spec: Optional[OutputSpec],
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """Generate a JSON completion and validate it against ``output_spec``.
+
+        The provider's native JSON mode/response schema is used when available.
+        Output that still fails validation gets a single repair call (invalid
+        output + validation errors, without the original source content) instead
+        of a full retry. Raises ``StructuredOutputError`` when no valid object is
+        obtained. Without a spec any JSON object is accepted.
+        """
+        raw = await self.generate_with_retry(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            output_spec=output_spec,
+            **kwargs,
+        )
+        if output_spec is None:
+            data = extract_json_object(raw)
+            if data is None:
+                raise StructuredOutputError("Completion is not a JSON object", raw=raw)
+            return data
+
+        try:
+            return output_spec.parse(raw)
+        except StructuredOutputError as exc:
+            if not settings.llm_structured_repair_enabled or not str(raw or "").strip():
+                raise
+            logger.info("Structured output for '%s' invalid (%s); trying repair", output_spec.name, exc.errors[:3])
+            return await self._repair_structured(exc, output_spec, **kwargs)
 
-        raise RuntimeError(f"Failed after {max_retries} attempts: {last_error}")
+    async def _repair_structured(
+        self,
+        error: StructuredOutputError,
+        output_spec: OutputSpec,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """One low-temperature call that only reformats the invalid output."""
+        errors = "\n".join(f"- {item}" for item in error.errors[:20]) or "- invalid JSON"
+        user_prompt = (
+            f"Expected output format:\n{output_spec.template_text()}\n\n"
+            f"Validation errors:\n{errors}\n\n"
+            f"Invalid output:\n{error.raw}"
+        )
+        repair_kwargs = {
+            key: kwargs[key] for key in ("model_id", "provider", "api_key", "allow_fallback") if key in kwargs
+        }
+        with llm_call_scope(repair=True):
+            raw = await self.generate_with_retry(
+                system_prompt=STRUCTURED_REPAIR_SYSTEM_PROMPT,
+                user_prompt=user_prompt,
+                max_retries=1,
+                temperature=0.0,
+                max_tokens=max(int(kwargs.get("max_tokens") or 0), settings.llm_structured_repair_max_tokens),
+                stop_when=JsonClosedStop(),
+                output_spec=output_spec,
+                **repair_kwargs,
+            )
+        return output_spec.parse(raw)
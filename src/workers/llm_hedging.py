@@ -0,0 +1,157 @@
+"""Hedged LLM requests across providers.
+
+When a step opts in, the request goes to the primary provider first. If no
+answer arrives within the primary's observed p90 latency, the same request is
+fired at the secondary provider and whichever finishes first wins; the loser is
+cancelled. Hedging is capped per step (share of calls that may hedge and
+largest prompt worth duplicating) so tail-latency savings do not double cost.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from src.workers.ai_defaults import PROVIDER_GROQ, PROVIDER_MISTRAL, default_model_for_provider, normalize_provider
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per provider/model and the minimum before p90 is trusted.
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per provider/model."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    @staticmethod
+    def _key(provider: str, model_id: str) -> str:
+        return f"{normalize_provider(provider) or provider}:{model_id}"
+
+    def record(self, provider: str, model_id: str, seconds: float) -> None:
+        key = self._key(provider, model_id)
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(max(0.0, float(seconds)))
+
+    def percentile(self, provider: str, model_id: str, pct: float) -> Optional[float]:
+        """Return the ``pct`` percentile (0-100) or None when samples are too few."""
+        samples = self._samples.get(self._key(provider, model_id))
+        if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """Hedging settings for one pipeline step (from the step ``ai.hedging`` block)."""
+
+    def __init__(
+        self,
+        step_id: str,
+        secondary_provider: str,
+        secondary_model_id: Optional[str] = None,
+        secondary_api_key: Optional[str] = None,
+        latency_percentile: float = 90.0,
+        default_delay_seconds: float = 8.0,
+        max_hedge_ratio: float = 0.2,
+        max_prompt_tokens: int = 4000,
+    ):
+        self.step_id = step_id
+        self.secondary_provider = normalize_provider(secondary_provider) or PROVIDER_MISTRAL
+        self.secondary_model_id = secondary_model_id
+        self.secondary_api_key = secondary_api_key
+        self.latency_percentile = latency_percentile
+        self.default_delay_seconds = default_delay_seconds
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_prompt_tokens = max_prompt_tokens
+
+    @classmethod
+    def from_step_config(
+        cls,
+        step_id: str,
+        ai_config: Optional[Dict[str, Any]],
+        primary_provider: Optional[str],
+        secondary_api_key: Optional[str] = None,
+        primary_model_id: Optional[str] = None,
+    ) -> Optional["HedgePolicy"]:
+        """Build a policy when the step opted in, otherwise return None.
+
+        ``primary_provider``/``primary_model_id`` are what the step resolved for its
+        calls (the step's prompt); the secondary defaults to the other provider and
+        its default model. A secondary identical to the primary returns None.
+        """
+        hedging = (ai_config or {}).get("hedging")
+        if not isinstance(hedging, dict) or not hedging.get("enabled"):
+            return None
+
+        primary = normalize_provider(primary_provider)
+        default_secondary = PROVIDER_MISTRAL if primary != PROVIDER_MISTRAL else PROVIDER_GROQ
+        secondary = normalize_provider(hedging.get("secondary_provider")) or default_secondary
+        secondary_model = hedging.get("secondary_model_id") or default_model_for_provider(secondary)
+        primary_model = primary_model_id or default_model_for_provider(primary)
+        if secondary == primary and secondary_model == primary_model:
+            logger.warning("Hedging for step '%s' disabled: secondary is the primary provider/model", step_id)
+            return None
+        try:
+            return cls(
+                step_id=step_id,
+                secondary_provider=secondary,
+                secondary_model_id=hedging.get("secondary_model_id") or None,
+                secondary_api_key=secondary_api_key,
+                latency_percentile=float(hedging.get("latency_percentile", 90)),
+                default_delay_seconds=float(hedging.get("default_delay_seconds", 8)),
+                max_hedge_ratio=float(hedging.get("max_hedge_ratio", 0.2)),
+                max_prompt_tokens=int(hedging.get("max_prompt_tokens", 4000)),
+            )
+        except (TypeError, ValueError) as exc:
+            logger.warning("Invalid hedging config for step '%s': %s", step_id, exc)
+            return None
+
+    def hedge_delay(self, tracker: LatencyTracker, provider: str, model_id: str) -> float:
+        observed = tracker.percentile(provider, model_id, self.latency_percentile)
+        return observed if observed is not None else self.default_delay_seconds
+
+
+class HedgeBudget:
+    """Caps the share of calls per step that may fire a hedge."""
+
+    def __init__(self):
+        self._calls: Dict[str, int] = {}
+        self._hedges: Dict[str, int] = {}
+
+    def record_call(self, step_id: str) -> None:
+        self._calls[step_id] = self._calls.get(step_id, 0) + 1
+
+    def try_acquire(self, step_id: str, max_ratio: float) -> bool:
+        calls = max(1, self._calls.get(step_id, 0))
+        hedges = self._hedges.get(step_id, 0)
+        if (hedges + 1) / calls > max_ratio:
+            return False
+        self._hedges[step_id] = hedges + 1
+        return True
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {
+            step_id: {"calls": calls, "hedges": self._hedges.get(step_id, 0)}
+            for step_id, calls in self._calls.items()
+        }
+
+
+_latency_tracker = LatencyTracker()
+_hedge_budget = HedgeBudget()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Return process-wide latency tracker."""
+    return _latency_tracker
+
+
+def get_hedge_budget() -> HedgeBudget:
+    """Return process-wide hedge budget."""
+    return _hedge_budget
@@ -0,0 +1,247 @@
+"""Per-call LLM usage and latency ledger.
+
+Every completion (and failed attempt) made through ``LLMClient`` is recorded
+in the ``llm_calls`` collection with provider/model, token usage, latency and
+retry count, tagged with the submission/step/prompt it was made for. Callers
+tag calls through a context variable (``set_llm_call_context`` /
+``llm_call_scope``) so the tags follow the call through retries, hedges and
+streams without threading extra arguments through every helper.
+
+Writes are buffered in process and flushed with ``insert_many`` in the
+background, so recording never adds a database round-trip to an LLM call.
+Celery tasks run their coroutine through ``drained`` so background flushes
+finish (and the rest of the buffer is written) before ``asyncio.run`` tears
+the loop down and cancels whatever is still pending.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import math
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Sequence, TypeVar
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Tags applied to every call recorded in the current task/context.
+_call_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("llm_call_context", default={})
+
+# Records kept when the database is unreachable, beyond which the oldest are dropped.
+MAX_BUFFERED_RECORDS = 5000
+
+
+def get_llm_call_context() -> Dict[str, Any]:
+    return dict(_call_context.get())
+
+
+def _merged_context(fields: Dict[str, Any]) -> Dict[str, Any]:
+    return {**_call_context.get(), **{key: value for key, value in fields.items() if value is not None}}
+
+
+def set_llm_call_context(**fields: Any) -> None:
+    """Merge tags into the current context (for the rest of the running task)."""
+    _call_context.set(_merged_context(fields))
+
+
+@contextmanager
+def llm_call_scope(**fields: Any) -> Iterator[None]:
+    """Merge tags into the current context for the duration of the block."""
+    token = _call_context.set(_merged_context(fields))
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+
+def _as_int(value: Any) -> Optional[int]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return int(value)
+
+
+def usage_tokens(usage: Any) -> Dict[str, Optional[int]]:
+    """Extract prompt/completion token counts from an SDK usage object or dict."""
+    if usage is None:
+        return {"prompt_tokens": None, "completion_tokens": None}
+    getter = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+    return {
+        "prompt_tokens": _as_int(getter("prompt_tokens")),
+        "completion_tokens": _as_int(getter("completion_tokens")),
+    }
+
+
+class LLMCallLedger:
+    """Buffers call records and writes them to ``llm_calls`` in batches."""
+
+    def __init__(
+        self,
+        repo: Any = None,
+        batch_size: Optional[int] = None,
+        flush_interval_seconds: Optional[float] = None,
+    ):
+        self._repo = repo
+        self.batch_size = max(1, int(batch_size or settings.llm_ledger_batch_size))
+        self.flush_interval_seconds = float(
+            settings.llm_ledger_flush_seconds if flush_interval_seconds is None else flush_interval_seconds
+        )
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._flush_tasks: set = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def _get_repo(self) -> Any:
+        if self._repo is not None:
+            return self._repo
+        from src.db.connection import get_db
+        from src.db.repositories import LLMCallRepository
+
+        return LLMCallRepository(await get_db())
+
+    def record(
+        self,
+        provider: str,
+        model_id: str,
+        latency_seconds: Optional[float] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        status: str = "ok",
+        error_class: Optional[str] = None,
+        **fields: Any,
+    ) -> None:
+        """Buffer one call record; schedules a background flush when the batch is full."""
+        if not settings.llm_ledger_enabled:
+            return
+
+        context = _call_context.get()
+        prompt_tokens = _as_int(prompt_tokens)
+        completion_tokens = _as_int(completion_tokens)
+        doc = {
+            "submission_id": context.get("submission_id"),
+            "step_id": context.get("step_id"),
+            "prompt_id": context.get("prompt_id"),
+            "provider": provider,
+            "model_id": model_id,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": (
+                (prompt_tokens or 0) + (completion_tokens or 0)
+                if prompt_tokens is not None or completion_tokens is not None
+                else None
+            ),
+            "latency_ms": round(latency_seconds * 1000, 1) if latency_seconds is not None else None,
+            "retry_count": int(context.get("retry_count", 0)),
+            "cache_hit": bool(context.get("cache_hit", False)),
+            "hedged": bool(context.get("hedged", False)),
+            "repair": bool(context.get("repair", False)),
+            "route": context.get("route"),
+            "execution_mode": "sync",
+            "status": status,
+            "error_class": error_class,
+            "created_at": datetime.now(timezone.utc),
+        }
+        doc.update(fields)
+        self._buffer.append(doc)
+        if len(self._buffer) > MAX_BUFFERED_RECORDS:
+            del self._buffer[: len(self._buffer) - MAX_BUFFERED_RECORDS]
+
+        due = time.monotonic() - self._last_flush >= self.flush_interval_seconds
+        if len(self._buffer) >= self.batch_size or due:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._last_flush = time.monotonic()
+        task = loop.create_task(self.flush())
+        # Keep a reference so the task is not garbage collected mid-write.
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self) -> int:
+        """Write buffered records; returns how many were written."""
+        if not self._buffer:
+            return 0
+        batch, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        try:
+            repo = await self._get_repo()
+            await repo.insert_many(batch)
+        except BaseException as exc:
+            # Also on cancellation: the batch is out of the buffer, so put it back before re-raising.
+            self._buffer = batch + self._buffer
+            del self._buffer[: max(0, len(self._buffer) - MAX_BUFFERED_RECORDS)]
+            if not isinstance(exc, Exception):
+                raise
+            logger.warning("Failed to write %s LLM call records: %s", len(batch), exc)
+            return 0
+        return len(batch)
+
+    async def drain(self) -> int:
+        """Wait for background flushes, then write what is still buffered; returns records written."""
+        written = 0
+        running = [task for task in self._flush_tasks if not task.done()]
+        if running:
+            results = await asyncio.gather(*running, return_exceptions=True)
+            written += sum(result for result in results if isinstance(result, int))
+        return written + await self.flush()
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (0-100) or None for an empty sequence."""
+    ordered = sorted(value for value in values if value is not None)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize_call_groups(groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turn raw grouped samples (from ``LLMCallRepository.grouped_samples``) into p50/p95 summaries."""
+    summaries = []
+    for group in groups:
+        stats: Dict[str, Any] = {
+            "key": group.get("key"),
+            "calls": group.get("calls", 0),
+            "errors": group.get("errors", 0),
+            "cache_hits": group.get("cache_hits", 0),
+            "retries": group.get("retries", 0),
+        }
+        for field in ("latency_ms", "prompt_tokens", "completion_tokens", "total_tokens"):
+            values = [value for value in group.get(field) or [] if value is not None]
+            stats[field] = {
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "total": round(sum(values), 1) if field != "latency_ms" else None,
+            }
+        summaries.append(stats)
+    summaries.sort(key=lambda item: item["calls"], reverse=True)
+    return summaries
+
+
+_ledger = LLMCallLedger()
+
+
+def get_llm_ledger() -> LLMCallLedger:
+    """Return process-wide call ledger."""
+    return _ledger
+
+
+async def drained(coro: Awaitable[T]) -> T:
+    """Await ``coro``, then drain the ledger before the caller's event loop closes."""
+    try:
+        return await coro
+    finally:
+        await get_llm_ledger().drain()
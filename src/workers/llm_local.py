@@ -0,0 +1,260 @@
+"""Deterministic in-process LLM provider for load and regression testing.
+
+The ``local`` provider answers chat completions without any network call, so
+the pipeline can run end to end (and workers can be load-tested) without Groq
+or Mistral. Outputs are derived from the prompt itself:
+
+- prompts carrying a JSON template under "Expected output format" (bibliography,
+  link summary, combined link, web research, topics) get an object with the
+  same keys and value types, filled with deterministic pt-BR placeholder text;
+- everything else (sections, context, article) gets markdown prose sized from the
+  word/paragraph limits found in the prompt.
+
+The same prompt always yields the same text. Latency follows a log-normal
+distribution (median/p95) and errors are injected per HTTP status rate, both
+configurable, so rate-limit, retry and breaker behaviour can be exercised.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.config import settings
+from src.workers.prompt_budget import count_tokens
+from src.workers.structured_output import parse_output_template
+
+_OUTPUT_FORMAT_RE = re.compile(
+    r"Expected output format:\s*\n(?P<format>.*?)(?:\n\nFollow this format strictly|\Z)",
+    re.DOTALL,
+)
+_MIN_WORDS_RE = re.compile(r"palavras m[ií]nimas:\s*(\d+)", re.IGNORECASE)
+_MAX_WORDS_RE = re.compile(r"palavras m[aá]ximas:\s*(\d+)", re.IGNORECASE)
+_MIN_PARAGRAPHS_RE = re.compile(r"par[aá]grafos m[ií]nimos:\s*(\d+)", re.IGNORECASE)
+
+_WORDS = (
+    "livro autor leitura conceito pratica equipe processo resultado exemplo capitulo metodo "
+    "gestao projeto qualidade entrega valor cliente aprendizado contexto estrategia ferramenta "
+    "analise decisao impacto melhoria fluxo tecnica experiencia caso estudo visao objetivo"
+).split()
+
+# status -> headers sent with injected errors (429 carries a retry hint like the real APIs).
+_ERROR_HEADERS = {429: {"retry-after": "1"}}
+# Streams are split into chunks of this many characters.
+_STREAM_CHUNK_CHARS = 24
+
+
+class LocalProviderError(Exception):
+    """Injected provider error shaped like SDK status errors (``status_code`` + ``response``)."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Local provider injected HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=dict(_ERROR_HEADERS.get(status_code, {})))
+
+
+def _prompt_rng(*parts: str) -> random.Random:
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    chosen = [rng.choice(_WORDS) for _ in range(max(1, words))]
+    return " ".join(chosen).capitalize() + "."
+
+
+def _prose(rng: random.Random, words: int, paragraphs: int = 1) -> str:
+    paragraphs = max(1, paragraphs)
+    per_paragraph = max(1, words // paragraphs)
+    blocks = []
+    for index in range(paragraphs):
+        target = per_paragraph if index < paragraphs - 1 else max(1, words - per_paragraph * (paragraphs - 1))
+        sentences, produced = [], 0
+        while produced < target:
+            length = min(target - produced, rng.randint(8, 16))
+            sentences.append(_sentence(rng, length))
+            produced += length
+        blocks.append(" ".join(sentences))
+    return "\n\n".join(blocks)
+
+
+def _fill_leaf(key: str, spec: str, rng: random.Random) -> Any:
+    """Placeholder value for a template leaf such as ``"string|null"`` or ``"alta|media|baixa"``."""
+    lowered_key = key.lower()
+    lowered = spec.lower()
+    types = {part.strip().split(" ")[0] for part in lowered.split("|")}
+
+    if "number" in types:
+        if "rating" in lowered_key:
+            return round(3.5 + rng.random() * 1.5, 1)
+        if "price" in lowered_key:
+            return round(20 + rng.random() * 180, 2)
+        return rng.randint(80, 640)
+    if "string" not in types and "|" in spec:
+        # Enumerations: pick one of the allowed values.
+        return rng.choice([part.strip() for part in spec.split("|") if part.strip()])
+    if "markdown" in lowered:
+        return f"## {_sentence(rng, 3)[:-1]}\n\n{_prose(rng, 60, 2)}"
+    if "isbn_13" in lowered_key:
+        return "978" + "".join(str(rng.randint(0, 9)) for _ in range(10))
+    if "isbn_10" in lowered_key:
+        return "".join(str(rng.randint(0, 9)) for _ in range(10))
+    if lowered_key == "asin":
+        return "B0" + "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(8))
+    if "url" in lowered_key:
+        return f"https://example.com/local/{rng.randint(1000, 9999)}"
+    if "date" in lowered_key:
+        return f"{rng.randint(2005, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if lowered_key in {"summary", "description", "research_markdown"}:
+        return _prose(rng, 45)
+    return _sentence(rng, rng.randint(2, 5))[:-1]
+
+
+def _fill_template(template: Any, rng: random.Random, key: str = "") -> Any:
+    if isinstance(template, dict):
+        return {name: _fill_template(value, rng, name) for name, value in template.items()}
+    if isinstance(template, list):
+        if not template:
+            return []
+        # ["string"] means "a list of strings": return a few; explicit examples keep their length.
+        count = len(template) if len(template) > 1 else 3
+        return [_fill_template(template[index % len(template)], rng, key) for index in range(count)]
+    if isinstance(template, str):
+        return _fill_leaf(key, template, rng)
+    return template
+
+
+def _output_template(user_prompt: str) -> Optional[Any]:
+    match = _OUTPUT_FORMAT_RE.search(user_prompt or "")
+    return parse_output_template(match.group("format")) if match else None
+
+
+def render_completion(system_prompt: str, user_prompt: str, max_tokens: int = 1000) -> str:
+    """Deterministic completion for a prompt (JSON when the prompt carries a JSON template)."""
+    rng = _prompt_rng(system_prompt or "", user_prompt or "")
+    template = _output_template(user_prompt)
+    if template is not None:
+        return json.dumps(_fill_template(template, rng), ensure_ascii=False)
+
+    min_words = int((_MIN_WORDS_RE.search(user_prompt or "") or [None, 0])[1] or 0)
+    max_words = int((_MAX_WORDS_RE.search(user_prompt or "") or [None, 0])[1] or 0)
+    paragraphs = int((_MIN_PARAGRAPHS_RE.search(user_prompt or "") or [None, 0])[1] or 0) or 3
+    # Roughly 0.7 words per token keeps the text inside the requested max_tokens.
+    token_cap = max(20, int(max_tokens * 0.7))
+    if max_words:
+        words = min(token_cap, rng.randint(max(1, min_words), max(min_words, max_words)))
+    else:
+        words = min(token_cap, 220)
+    return _prose(rng, words, paragraphs)
+
+
+class _LocalStream:
+    """Async iterator of SDK-shaped stream chunks; the last chunk carries usage."""
+
+    def __init__(self, content: str, usage: SimpleNamespace):
+        self._chunks = [content[i : i + _STREAM_CHUNK_CHARS] for i in range(0, len(content), _STREAM_CHUNK_CHARS)]
+        self._usage = usage
+        self.closed = False
+
+    def __aiter__(self) -> AsyncIterator[SimpleNamespace]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[SimpleNamespace]:
+        for text in self._chunks:
+            if self.closed:
+                return
+            await asyncio.sleep(0)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+        yield SimpleNamespace(choices=[], usage=self._usage)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class LocalLLMProvider:
+    """Stand-in for ``AsyncOpenAI`` exposing ``chat.completions.create``."""
+
+    def __init__(
+        self,
+        latency_median_ms: Optional[float] = None,
+        latency_p95_ms: Optional[float] = None,
+        error_rates: Optional[Dict[str, float]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency_median_ms = float(
+            settings.llm_local_latency_median_ms if latency_median_ms is None else latency_median_ms
+        )
+        self.latency_p95_ms = float(settings.llm_local_latency_p95_ms if latency_p95_ms is None else latency_p95_ms)
+        raw_rates = settings.llm_local_error_rates if error_rates is None else error_rates
+        # Keys are HTTP statuses ("429", "503") or "timeout"; values are per-call probabilities.
+        self.error_rates = {str(kind).lower(): float(rate) for kind, rate in (raw_rates or {}).items()}
+        self._rng = random.Random(settings.llm_local_seed if seed is None else seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def sample_latency(self) -> float:
+        """Log-normal latency in seconds matching the configured median and p95."""
+        if self.latency_median_ms <= 0:
+            return 0.0
+        ratio = max(1.0, self.latency_p95_ms / self.latency_median_ms)
+        sigma = math.log(ratio) / 1.645
+        return self._rng.lognormvariate(math.log(self.latency_median_ms), sigma) / 1000.0
+
+    def sample_error(self) -> Optional[BaseException]:
+        roll = self._rng.random()
+        for kind, rate in sorted(self.error_rates.items()):
+            if roll < rate:
+                if kind == "timeout":
+                    return asyncio.TimeoutError("Local provider injected timeout")
+                return LocalProviderError(int(kind))
+            roll -= rate
+        return None
+
+    async def create(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        stream: bool = False,
+        **_kwargs: Any,
+    ) -> Any:
+        latency = self.sample_latency()
+        if latency:
+            await asyncio.sleep(latency)
+        error = self.sample_error()
+        if error is not None:
+            raise error
+
+        system_prompt = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user_prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        content = render_completion(system_prompt, user_prompt, max_tokens)
+        prompt_tokens = count_tokens(system_prompt, model) + count_tokens(user_prompt, model)
+        completion_tokens = count_tokens(content, model)
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+        if stream:
+            return _LocalStream(content, usage)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+            usage=usage,
+        )
+
+
+_local_provider: Optional[LocalLLMProvider] = None
+
+
+def get_local_llm_provider() -> LocalLLMProvider:
+    """Return process-wide local provider (created lazily so settings overrides apply)."""
+    global _local_provider
+    if _local_provider is None:
+        _local_provider = LocalLLMProvider()
+    return _local_provider
@@ -0,0 +1,217 @@
+"""Distributed token-bucket rate limiter for LLM provider calls.
+
+Buckets are keyed by (provider, credential, model) and enforce both requests per
+minute and estimated tokens per minute. State lives in Redis so every worker
+process shares the same quota view; when Redis is unreachable the limiter falls
+back to an in-process bucket so a single worker still paces itself.
+
+The bucket uses GCRA-style reservations: each caller atomically books the next
+free slot and then sleeps until it. Slots are handed out in arrival order, so
+concurrent callers queue fairly instead of racing into 429s and retrying.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from src.config import settings
+from src.db.connection import get_redis_client
+from src.workers.ai_defaults import DEFAULT_PROVIDER, normalize_provider, resolve_rate_limits
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "pigmeu:llm_rate"
+# Seconds to keep using the local bucket after a Redis failure before trying Redis again.
+REDIS_RETRY_AFTER_SECONDS = 30.0
+
+# KEYS[1]: bucket hash
+# ARGV: req_interval, req_tolerance, tok_interval, tok_tolerance, tokens, max_wait
+# Returns {admitted (1|0), wait_seconds}
+_RESERVE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local req_interval = tonumber(ARGV[1])
+local req_tolerance = tonumber(ARGV[2])
+local tok_interval = tonumber(ARGV[3])
+local tok_tolerance = tonumber(ARGV[4])
+local tokens = tonumber(ARGV[5])
+local max_wait = tonumber(ARGV[6])
+
+local state = redis.call('HMGET', KEYS[1], 'req_tat', 'tok_tat')
+local req_tat = math.max(tonumber(state[1]) or now, now)
+local tok_tat = math.max(tonumber(state[2]) or now, now)
+-- Admit on the TAT after this request's tokens (capped at one window so oversized requests still run)
+local tok_cost = math.min(tok_interval * tokens, tok_tolerance)
+
+local start = math.max(now, req_tat - req_tolerance, tok_tat + tok_cost - tok_tolerance)
+local wait = start - now
+if max_wait >= 0 and wait > max_wait then
+  return {0, tostring(wait)}
+end
+
+req_tat = math.max(req_tat, start) + req_interval
+tok_tat = math.max(tok_tat, start) + tok_interval * tokens
+redis.call('HSET', KEYS[1], 'req_tat', tostring(req_tat), 'tok_tat', tostring(tok_tat))
+local ttl = math.ceil((math.max(req_tat, tok_tat) - now) * 1000) + 60000
+redis.call('PEXPIRE', KEYS[1], ttl)
+return {1, tostring(wait)}
+"""
+
+
+class LLMRateLimitExceeded(RuntimeError):
+    """Raised when the queue ahead of a call is longer than the allowed wait."""
+
+    def __init__(self, bucket: str, wait_seconds: float):
+        super().__init__(f"LLM rate limit queue for {bucket} is {wait_seconds:.1f}s long")
+        self.bucket = bucket
+        self.wait_seconds = wait_seconds
+
+
+def estimate_request_tokens(system_prompt: str, user_prompt: str, max_tokens: int) -> int:
+    """Rough token estimate for quota accounting (prompt chars / 4 plus completion budget)."""
+    prompt_chars = len(system_prompt or "") + len(user_prompt or "")
+    return int(prompt_chars / 4) + max(0, int(max_tokens or 0))
+
+
+def _bucket_parameters(limits: Dict[str, float]) -> Tuple[float, float, float, float]:
+    """Translate per-minute limits into GCRA emission intervals and burst tolerances.
+
+    A full minute of quota may be consumed as a burst, matching how providers
+    account RPM/TPM windows.
+    """
+    rpm = float(limits.get("requests_per_minute") or 0)
+    tpm = float(limits.get("tokens_per_minute") or 0)
+    req_interval = 60.0 / rpm if rpm > 0 else 0.0
+    tok_interval = 60.0 / tpm if tpm > 0 else 0.0
+    req_tolerance = max(0.0, 60.0 - req_interval) if rpm > 0 else 0.0
+    tok_tolerance = 60.0 if tpm > 0 else 0.0
+    return req_interval, req_tolerance, tok_interval, tok_tolerance
+
+
+def reserve_slot(
+    state: Dict[str, float],
+    now: float,
+    limits: Dict[str, float],
+    tokens: int,
+    max_wait: float,
+) -> Tuple[bool, float]:
+    """Book the next slot in ``state`` (in-process twin of the Redis script).
+
+    Returns ``(admitted, wait_seconds)``. When not admitted the state is untouched.
+    """
+    req_interval, req_tolerance, tok_interval, tok_tolerance = _bucket_parameters(limits)
+    req_tat = max(state.get("req_tat", now), now)
+    tok_tat = max(state.get("tok_tat", now), now)
+    # Admit on the TAT after this request's tokens (capped at one window so oversized requests still run).
+    tok_cost = min(tok_interval * max(0, tokens), tok_tolerance)
+
+    start = max(now, req_tat - req_tolerance, tok_tat + tok_cost - tok_tolerance)
+    wait = start - now
+    if max_wait >= 0 and wait > max_wait:
+        return False, wait
+
+    state["req_tat"] = max(req_tat, start) + req_interval
+    state["tok_tat"] = max(tok_tat, start) + tok_interval * max(0, tokens)
+    return True, wait
+
+
+class LLMRateLimiter:
+    """Shared RPM/TPM limiter for LLM calls."""
+
+    def __init__(
+        self,
+        redis_client_factory: Optional[Callable[[], Awaitable[Any]]] = get_redis_client,
+        max_wait_seconds: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ):
+        """Initialize limiter.
+
+        Args:
+            redis_client_factory: Coroutine returning a Redis client (None = local buckets only)
+            max_wait_seconds: Longest queue a caller accepts before failing fast
+            enabled: Override for ``settings.llm_rate_limit_enabled``
+        """
+        self._redis_client_factory = redis_client_factory
+        self.max_wait_seconds = (
+            float(max_wait_seconds) if max_wait_seconds is not None else settings.llm_rate_limit_max_wait_seconds
+        )
+        self.enabled = settings.llm_rate_limit_enabled if enabled is None else bool(enabled)
+        self._local_state: Dict[str, Dict[str, float]] = {}
+        self._redis_disabled_until = 0.0
+
+    @staticmethod
+    def bucket_key(provider: str, model_id: str, api_key: Optional[str] = None) -> str:
+        """Build bucket key without leaking the credential itself."""
+        credential = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12] if api_key else "default"
+        normalized_provider = normalize_provider(provider) or DEFAULT_PROVIDER
+        return f"{KEY_PREFIX}:{normalized_provider}:{credential}:{model_id}"
+
+    async def _reserve_redis(self, key: str, limits: Dict[str, float], tokens: int) -> Optional[Tuple[bool, float]]:
+        if self._redis_client_factory is None or time.monotonic() < self._redis_disabled_until:
+            return None
+        try:
+            client = await self._redis_client_factory()
+            admitted, wait = await client.eval(
+                _RESERVE_SCRIPT,
+                1,
+                key,
+                *_bucket_parameters(limits),
+                max(0, tokens),
+                self.max_wait_seconds,
+            )
+            return bool(int(admitted)), float(wait)
+        except Exception as exc:
+            logger.warning("LLM rate limiter falling back to local buckets: %s", exc)
+            self._redis_disabled_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+            return None
+
+    async def acquire(
+        self,
+        provider: str,
+        model_id: str,
+        api_key: Optional[str] = None,
+        estimated_tokens: int = 0,
+    ) -> float:
+        """Wait for a slot in the provider/credential/model bucket.
+
+        Returns:
+            Seconds spent waiting in the queue
+
+        Raises:
+            LLMRateLimitExceeded: If the wait would exceed ``max_wait_seconds``
+        """
+        if not self.enabled:
+            return 0.0
+
+        limits = resolve_rate_limits(provider, model_id, overrides=settings.llm_rate_limits)
+        if not limits.get("requests_per_minute") and not limits.get("tokens_per_minute"):
+            return 0.0
+
+        key = self.bucket_key(provider, model_id, api_key)
+        result = await self._reserve_redis(key, limits, estimated_tokens)
+        if result is None:
+            state = self._local_state.setdefault(key, {})
+            result = reserve_slot(state, time.time(), limits, estimated_tokens, self.max_wait_seconds)
+
+        admitted, wait = result
+        if not admitted:
+            raise LLMRateLimitExceeded(key, wait)
+        if wait > 0:
+            logger.info("LLM rate limit: queued %.2fs for %s", wait, key)
+            await asyncio.sleep(wait)
+        return max(0.0, wait)
+
+
+_default_limiter: Optional[LLMRateLimiter] = None
+
+
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    """Return process-wide limiter instance."""
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = LLMRateLimiter()
+    return _default_limiter
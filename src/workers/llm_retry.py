@@ -0,0 +1,211 @@
+"""Error classification, backoff and circuit breakers for LLM calls.
+
+Provider errors are classified so retries are only spent where they can help:
+rate limits honour the server ``Retry-After`` hint, 5xx/timeouts back off with
+jittered exponential delays, and 4xx request errors fail immediately. Repeated
+transient failures open a circuit per provider/model so workers stop hammering
+a provider that is down and fail fast until a probe call succeeds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from src.config import settings
+from src.workers.llm_rate_limiter import LLMRateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+ERROR_RATE_LIMIT = "rate_limit"
+ERROR_SERVER = "server"
+ERROR_TIMEOUT = "timeout"
+ERROR_CLIENT = "client"
+ERROR_UNKNOWN = "unknown"
+
+RETRYABLE_ERRORS = {ERROR_RATE_LIMIT, ERROR_SERVER, ERROR_TIMEOUT, ERROR_UNKNOWN}
+# Errors that indicate the provider itself is unhealthy (count towards the breaker).
+CIRCUIT_ERRORS = {ERROR_SERVER, ERROR_TIMEOUT}
+
+# 408/409 are transient per provider docs; other 4xx will not succeed on retry.
+_RETRYABLE_CLIENT_STATUSES = {408, 409}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when calls to a provider/model are short-circuited."""
+
+    def __init__(self, key: str, retry_in: float):
+        super().__init__(f"Circuit open for {key}; retry in {retry_in:.0f}s")
+        self.key = key
+        self.retry_in = retry_in
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: BaseException) -> str:
+    """Map an exception raised by a provider call to an error class."""
+    if isinstance(exc, LLMRateLimitExceeded):
+        return ERROR_RATE_LIMIT
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return ERROR_TIMEOUT
+
+    status = _status_code(exc)
+    if status is not None:
+        if status == 429:
+            return ERROR_RATE_LIMIT
+        if status >= 500:
+            return ERROR_SERVER
+        if 400 <= status < 500 and status not in _RETRYABLE_CLIENT_STATUSES:
+            return ERROR_CLIENT
+        return ERROR_TIMEOUT if status == 408 else ERROR_UNKNOWN
+
+    # openai.APITimeoutError / APIConnectionError carry no status code.
+    name = type(exc).__name__
+    if "Timeout" in name:
+        return ERROR_TIMEOUT
+    if "Connection" in name:
+        return ERROR_SERVER
+    return ERROR_UNKNOWN
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Extract the server retry hint (``retry-after-ms`` / ``retry-after``) if present."""
+    if isinstance(exc, LLMRateLimitExceeded):
+        return exc.wait_seconds
+
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    raw_ms = headers.get("retry-after-ms")
+    if raw_ms:
+        try:
+            return max(0.0, float(raw_ms) / 1000.0)
+        except (TypeError, ValueError):
+            pass
+
+    raw = headers.get("retry-after")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(raw).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class RetryPolicy:
+    """Jittered exponential backoff bounded by a total deadline."""
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        deadline_seconds: Optional[float] = None,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_seconds = (
+            settings.llm_retry_deadline_seconds if deadline_seconds is None else float(deadline_seconds)
+        )
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number ``attempt`` (0-based), honouring server hints."""
+        if retry_after is not None:
+            # Small jitter so callers released by the same hint do not stampede.
+            return retry_after + random.uniform(0, min(1.0, self.base_delay))
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        # "Equal jitter": never retry sooner than half the backoff window.
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (claims the probe slot when half-open)."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probe_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("LLM circuit opened after %s consecutive failures", self.failures)
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Free the half-open probe slot when the call ended without a health signal."""
+        self._probe_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(provider: str, model_id: str) -> CircuitBreaker:
+    """Return the process-wide breaker for a provider/model pair."""
+    key = f"{provider}:{model_id}"
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            reset_timeout=settings.llm_circuit_reset_seconds,
+        )
+        _breakers[key] = breaker
+    return breaker
+
+
+def circuit_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Current breaker states, keyed by provider:model."""
+    return {
+        key: {"state": breaker.state, "failures": breaker.failures, "retry_in": round(breaker.retry_in(), 1)}
+        for key, breaker in _breakers.items()
+    }
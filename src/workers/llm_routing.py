@@ -0,0 +1,235 @@
+"""Cost- and size-aware model routing per pipeline step.
+
+A step that opts in (``ai.routing.enabled``) lists model tiers from cheapest to
+most capable. For every call the first tier that fits is used:
+
+- the prompt (system + user + content) is within the tier's ``max_input_tokens``
+  and the requested completion within its ``max_output_tokens`` (0 = no limit);
+- the tier can produce the required structure (``structured_output``) when the
+  prompt declares a JSON output template;
+- its circuit breaker is not open (provider health);
+- its observed latency percentile fits the step ``latency_budget_seconds``;
+- a credential for its provider is available.
+
+When no tier fits, the call keeps the step's configured model. Each decision is
+attached to the call's ledger records (``route``) so routing can be analysed
+next to tokens and latency.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.workers.ai_defaults import normalize_provider
+from src.workers.llm_hedging import LatencyTracker, get_latency_tracker
+from src.workers.llm_retry import get_circuit_breaker
+from src.workers.prompt_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on tiers per step; more than a handful only slows every decision down.
+MAX_ROUTE_TIERS = 5
+
+ROUTE_DEFAULT = "default"
+
+
+class RouteTier:
+    """One candidate model of a step routing policy."""
+
+    def __init__(
+        self,
+        provider: str,
+        model_id: str,
+        max_input_tokens: int = 0,
+        max_output_tokens: int = 0,
+        structured_output: bool = True,
+        credential_name: Optional[str] = None,
+        api_key: Optional[str] = None,
+    ):
+        self.provider = normalize_provider(provider) or str(provider)
+        self.model_id = model_id
+        self.max_input_tokens = max(0, int(max_input_tokens))
+        self.max_output_tokens = max(0, int(max_output_tokens))
+        self.structured_output = structured_output
+        self.credential_name = credential_name
+        self.api_key = api_key
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model_id}"
+
+
+class RouteDecision:
+    """Model chosen for one call and why."""
+
+    def __init__(
+        self,
+        provider: str,
+        model_id: str,
+        api_key: Optional[str],
+        reason: str = ROUTE_DEFAULT,
+        tier: Optional[int] = None,
+        input_tokens: Optional[int] = None,
+        skipped: Optional[List[Dict[str, str]]] = None,
+        routed: bool = False,
+    ):
+        self.provider = provider
+        self.model_id = model_id
+        self.api_key = api_key
+        self.reason = reason
+        self.tier = tier
+        self.input_tokens = input_tokens
+        self.skipped = skipped or []
+        self.routed = routed
+
+    def as_record(self) -> Optional[Dict[str, Any]]:
+        """Ledger ``route`` field; None when the step has no routing policy."""
+        if not self.routed:
+            return None
+        return {
+            "reason": self.reason,
+            "tier": self.tier,
+            "input_tokens": self.input_tokens,
+            "skipped": self.skipped,
+        }
+
+
+class RoutingPolicy:
+    """Routing settings for one pipeline step (from the step ``ai.routing`` block)."""
+
+    def __init__(
+        self,
+        step_id: str,
+        tiers: List[RouteTier],
+        latency_budget_seconds: float = 0.0,
+        latency_percentile: float = 90.0,
+    ):
+        self.step_id = step_id
+        self.tiers = tiers[:MAX_ROUTE_TIERS]
+        self.latency_budget_seconds = max(0.0, float(latency_budget_seconds))
+        self.latency_percentile = latency_percentile
+
+    @classmethod
+    def from_step_config(cls, step_id: str, ai_config: Optional[Dict[str, Any]]) -> Optional["RoutingPolicy"]:
+        """Build a policy when the step opted in with at least one tier, otherwise return None."""
+        routing = (ai_config or {}).get("routing")
+        if not isinstance(routing, dict) or not routing.get("enabled"):
+            return None
+        try:
+            tiers = [
+                RouteTier(
+                    provider=str(item.get("provider") or ""),
+                    model_id=str(item.get("model_id") or "").strip(),
+                    max_input_tokens=int(item.get("max_input_tokens") or 0),
+                    max_output_tokens=int(item.get("max_output_tokens") or 0),
+                    structured_output=bool(item.get("structured_output", True)),
+                    credential_name=item.get("credential_name") or None,
+                )
+                for item in routing.get("tiers") or []
+                if isinstance(item, dict) and item.get("provider") and item.get("model_id")
+            ]
+            policy = cls(
+                step_id=step_id,
+                tiers=tiers,
+                latency_budget_seconds=float(routing.get("latency_budget_seconds") or 0),
+                latency_percentile=float(routing.get("latency_percentile", 90)),
+            )
+        except (TypeError, ValueError) as exc:
+            logger.warning("Invalid routing config for step '%s': %s", step_id, exc)
+            return None
+        return policy if policy.tiers else None
+
+    def _skip_reason(
+        self,
+        tier: RouteTier,
+        input_tokens: int,
+        structured: bool,
+        max_output_tokens: int,
+        tracker: LatencyTracker,
+    ) -> Optional[str]:
+        if tier.max_input_tokens and input_tokens > tier.max_input_tokens:
+            return "input_tokens"
+        if tier.max_output_tokens and max_output_tokens > tier.max_output_tokens:
+            return "output_tokens"
+        if structured and not tier.structured_output:
+            return "structure"
+        if not tier.api_key:
+            return "no_credential"
+        # Only an open breaker disqualifies; half-open tiers still get traffic for the probe.
+        if get_circuit_breaker(tier.provider, tier.model_id).state == "open":
+            return "circuit_open"
+        if self.latency_budget_seconds:
+            observed = tracker.percentile(tier.provider, tier.model_id, self.latency_percentile)
+            if observed is not None and observed > self.latency_budget_seconds:
+                return "latency"
+        return None
+
+    def choose(
+        self,
+        input_tokens: int,
+        default_provider: str,
+        default_model_id: str,
+        default_api_key: Optional[str],
+        structured: bool = False,
+        max_output_tokens: int = 0,
+        tracker: Optional[LatencyTracker] = None,
+    ) -> RouteDecision:
+        """Pick the first tier that fits the call; fall back to the step's configured model."""
+        tracker = tracker or get_latency_tracker()
+        skipped: List[Dict[str, str]] = []
+        for index, tier in enumerate(self.tiers):
+            reason = self._skip_reason(tier, input_tokens, structured, max_output_tokens, tracker)
+            if reason:
+                skipped.append({"model": tier.key, "reason": reason})
+                continue
+            return RouteDecision(
+                provider=tier.provider,
+                model_id=tier.model_id,
+                api_key=tier.api_key,
+                reason=f"tier:{index}",
+                tier=index,
+                input_tokens=input_tokens,
+                skipped=skipped,
+                routed=True,
+            )
+        return RouteDecision(
+            provider=default_provider,
+            model_id=default_model_id,
+            api_key=default_api_key,
+            input_tokens=input_tokens,
+            skipped=skipped,
+            routed=True,
+        )
+
+
+def resolve_route(
+    policy: Optional[RoutingPolicy],
+    provider: str,
+    model_id: str,
+    api_key: Optional[str],
+    prompt_texts: Iterable[str],
+    structured: bool = False,
+    max_output_tokens: int = 0,
+) -> RouteDecision:
+    """Route one call (prompt size measured with the default model's tokenizer)."""
+    if policy is None:
+        return RouteDecision(provider=provider, model_id=model_id, api_key=api_key)
+    input_tokens = sum(count_tokens(text, model_id) for text in prompt_texts)
+    decision = policy.choose(
+        input_tokens,
+        default_provider=provider,
+        default_model_id=model_id,
+        default_api_key=api_key,
+        structured=structured,
+        max_output_tokens=max_output_tokens,
+    )
+    logger.debug(
+        "Routed %s call (%s input tokens) to %s:%s (%s)",
+        policy.step_id,
+        input_tokens,
+        decision.provider,
+        decision.model_id,
+        decision.reason,
+    )
+    return decision
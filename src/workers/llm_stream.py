@@ -0,0 +1,96 @@
+"""Stop conditions for streamed LLM completions.
+
+A stop condition is a callable receiving the text accumulated so far and
+returning True once the rest of the completion is not needed. Conditions are
+stateful and scan incrementally, so they are cheap to call on every chunk; use
+``reset()`` before reusing an instance (``LLMClient.generate_stream`` does this
+for every attempt).
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable
+
+StopCondition = Callable[[str], bool]
+
+_WORD_RE = re.compile(r"\S+")
+
+
+class WordBudgetStop:
+    """Stop once ``max_words`` complete words have been produced.
+
+    Words are counted like ``ArticleStructurer._truncate_to_words`` so the
+    caller's truncation still has the full budget available.
+    """
+
+    def __init__(self, max_words: int):
+        self.max_words = max(0, int(max_words))
+        self.reset()
+
+    def reset(self) -> None:
+        self._count = 0
+        self._pos = 0
+
+    def __call__(self, text: str) -> bool:
+        matches = list(_WORD_RE.finditer(text, self._pos))
+        if not matches:
+            return False
+        total = self._count + len(matches)
+        # The last word may still grow with the next chunk; rescan from its start.
+        self._count = total - 1
+        self._pos = matches[-1].start()
+        # The (max_words + 1)-th word starting guarantees the previous ones are complete.
+        return total > self.max_words
+
+
+class JsonClosedStop:
+    """Stop once the first top-level JSON object or array has been closed.
+
+    The value starts at a ``{`` or ``[`` that is the first non-space character of
+    the text or of a line, so leading prose (even with brackets, e.g. "Topic [1]")
+    and markdown fences are skipped; braces inside strings are ignored.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._line_start = True
+        self._in_string = False
+        self._escaped = False
+
+    def __call__(self, text: str) -> bool:
+        for char in text[self._pos :]:
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if not self._started:
+                if char == "\n":
+                    self._line_start = True
+                elif char in "{[" and self._line_start:
+                    self._started = True
+                    self._depth = 1
+                elif not char.isspace():
+                    self._line_start = False
+                continue
+
+            if char in "{[":
+                self._depth += 1
+            elif char == '"':
+                self._in_string = True
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth <= 0:
+                    return True
+        return False
@@ -0,0 +1,180 @@
+"""Token-aware prompt budgeting.
+
+Prompts are assembled from parts (instructions, metadata, summaries, research,
+page content) that compete for a fixed input token budget per step. Parts are
+counted with a local tokenizer for the target model and, when the prompt does
+not fit, the lowest-priority parts are trimmed first so input size and latency
+stay predictable regardless of how much source material a submission carries.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.workers.ai_defaults import resolve_prompt_token_budget
+
+logger = logging.getLogger(__name__)
+
+# Local tokenizer per model family: (tiktoken encoding, correction ratio).
+# Llama 3's tokenizer is tiktoken-based and extends the cl100k_base vocabulary (100k of its
+# 128k tokens), so counts match and the ratio is 1.0. Mistral/Mixtral use a 32k SentencePiece
+# vocabulary that splits pt-BR/en text into more pieces; 1.1 is a conservative estimate of
+# native/cl100k_base counts, also used for unknown models. Recalibrate against the providers'
+# own prompt_tokens in llm_calls (prompt_tokens / local count per model) when budgets overflow.
+_MODEL_TOKENIZERS: Dict[str, Tuple[str, float]] = {
+    "llama": ("cl100k_base", 1.0),
+    "mistral": ("cl100k_base", 1.1),
+    "mixtral": ("cl100k_base", 1.1),
+}
+_DEFAULT_TOKENIZER: Tuple[str, float] = ("cl100k_base", 1.1)
+# Used when tiktoken or its encoding files are unavailable (pt-BR averages ~3.5 chars/token).
+_FALLBACK_CHARS_PER_TOKEN = 3.5
+
+_encodings: Dict[str, Any] = {}
+
+
+def load_tokenizers() -> Dict[str, bool]:
+    """Load the tiktoken encodings once per process (worker/API startup, never on an event loop).
+
+    ``tiktoken.get_encoding`` reads the encoding file from ``TIKTOKEN_CACHE_DIR``
+    (pre-seeded in the Docker images) and only downloads it when missing, with a
+    blocking request. Token counting never loads encodings itself: until this has
+    run, or if it fails, counts use the character estimate.
+
+    Returns:
+        ``{encoding_name: loaded}``
+    """
+    loaded: Dict[str, bool] = {}
+    for encoding_name in {name for name, _ in _MODEL_TOKENIZERS.values()} | {_DEFAULT_TOKENIZER[0]}:
+        if encoding_name not in _encodings:
+            try:
+                import tiktoken
+
+                _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+            except Exception as exc:
+                logger.warning("Tokenizer %s unavailable, using character estimate: %s", encoding_name, exc)
+        loaded[encoding_name] = encoding_name in _encodings
+    return loaded
+
+
+def _tokenizer_for(model_id: Optional[str]) -> Tuple[Optional[Any], float]:
+    model = str(model_id or "").lower()
+    encoding_name, ratio = next(
+        (value for family, value in _MODEL_TOKENIZERS.items() if family in model),
+        _DEFAULT_TOKENIZER,
+    )
+    return _encodings.get(encoding_name), ratio
+
+
+def count_tokens(text: str, model_id: Optional[str] = None) -> int:
+    """Count tokens of ``text`` for ``model_id`` with the local tokenizer."""
+    if not text:
+        return 0
+    encoding, ratio = _tokenizer_for(model_id)
+    if encoding is None:
+        return int(len(text) / _FALLBACK_CHARS_PER_TOKEN + 0.999)
+    return int(len(encoding.encode(text, disallowed_special=())) * ratio + 0.999)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_id: Optional[str] = None) -> str:
+    """Trim ``text`` to at most ``max_tokens`` tokens, cutting on whitespace."""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text, model_id) <= max_tokens:
+        return text
+
+    encoding, ratio = _tokenizer_for(model_id)
+    if encoding is None:
+        trimmed = text[: int(max_tokens * _FALLBACK_CHARS_PER_TOKEN)]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        trimmed = encoding.decode(tokens[: int(max_tokens / ratio)])
+
+    # Avoid ending on half a word (or half a multi-byte character from decode).
+    cut = max(trimmed.rfind(" "), trimmed.rfind("\n"))
+    if cut > len(trimmed) * 0.8:
+        trimmed = trimmed[:cut]
+    return trimmed.rstrip()
+
+
+def compact_json(value: Any) -> str:
+    """Serialize prompt data without indentation or empty fields."""
+
+    def _prune(item: Any) -> Any:
+        if isinstance(item, dict):
+            pruned = {key: _prune(val) for key, val in item.items()}
+            return {key: val for key, val in pruned.items() if val not in (None, "", [], {})}
+        if isinstance(item, list):
+            return [val for val in (_prune(entry) for entry in item) if val not in (None, "", [], {})]
+        return item
+
+    return json.dumps(_prune(value), ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+class PromptBudget:
+    """Allocate an input token budget across prompt parts by priority.
+
+    Reserved text (system prompt, instructions, output format) is always kept.
+    Parts are trimmed starting from the highest ``priority`` number (least
+    important) down to their ``min_tokens`` until the prompt fits.
+    """
+
+    def __init__(self, model_id: Optional[str], max_input_tokens: int):
+        self.model_id = model_id
+        self.max_input_tokens = max(0, int(max_input_tokens or 0))
+        self.reserved_tokens = 0
+        self._parts: List[Dict[str, Any]] = []
+
+    @classmethod
+    def for_step(cls, step: str, model_id: Optional[str]) -> "PromptBudget":
+        """Build a budget using the configured token limit for ``step``."""
+        return cls(model_id, resolve_prompt_token_budget(step, overrides=settings.prompt_token_budgets))
+
+    def reserve(self, *texts: str) -> "PromptBudget":
+        for text in texts:
+            self.reserved_tokens += count_tokens(text or "", self.model_id)
+        return self
+
+    def add(self, name: str, text: str, priority: int, min_tokens: int = 0) -> "PromptBudget":
+        text = text or ""
+        self._parts.append(
+            {
+                "name": name,
+                "text": text,
+                "priority": priority,
+                "min_tokens": max(0, int(min_tokens)),
+                "tokens": count_tokens(text, self.model_id),
+            }
+        )
+        return self
+
+    def fit(self) -> Dict[str, str]:
+        """Return part texts trimmed to fit the budget, keyed by part name."""
+        total = self.reserved_tokens + sum(part["tokens"] for part in self._parts)
+        if self.max_input_tokens and total > self.max_input_tokens:
+            overflow = total - self.max_input_tokens
+            for part in sorted(self._parts, key=lambda item: item["priority"], reverse=True):
+                if overflow <= 0:
+                    break
+                target = max(part["min_tokens"], part["tokens"] - overflow)
+                if target >= part["tokens"]:
+                    continue
+                part["text"] = truncate_to_tokens(part["text"], target, self.model_id)
+                trimmed_tokens = count_tokens(part["text"], self.model_id)
+                overflow -= part["tokens"] - trimmed_tokens
+                part["tokens"] = trimmed_tokens
+            logger.debug(
+                "Prompt budget %s tokens: trimmed from %s to %s (%s)",
+                self.max_input_tokens,
+                total,
+                self.total_tokens,
+                {part["name"]: part["tokens"] for part in self._parts},
+            )
+        return {part["name"]: part["text"] for part in self._parts}
+
+    @property
+    def total_tokens(self) -> int:
+        return self.reserved_tokens + sum(part["tokens"] for part in self._parts)
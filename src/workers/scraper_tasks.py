@@ -3,14 +3,16 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 import re
 from datetime import datetime
-from typing import Dict, Any, Optional, List, Iterable
+from difflib import SequenceMatcher
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+from urllib.parse import urljoin
 
 from celery import shared_task, Task
 
+from src.config import settings
 from src.db.connection import get_db
 from src.db.repositories import (
     SubmissionRepository,
@@ -23,7 +25,10 @@ from src.db.repositories import (
 )
 from src.models.enums import SubmissionStatus
 from src.scrapers.amazon import AmazonScraper
+from src.scrapers.crawl_frontier import get_crawl_frontier
+from src.scrapers.goodreads import GoodreadsScraper
 from src.scrapers.link_finder import LinkFinder
+from src.scrapers.product_cache import get_product_cache
 from src.workers.ai_defaults import (
     BOOK_REVIEW_CONTEXT_MODEL_ID,
     BOOK_REVIEW_CONTEXT_PROVIDER,
@@ -31,10 +36,20 @@ from src.workers.ai_defaults import (
     MODEL_GROQ_LLAMA_3_3_70B,
     MODEL_MISTRAL_LARGE_LATEST,
     PROVIDER_GROQ,
+    PROVIDER_LOCAL,
     PROVIDER_MISTRAL,
+    normalize_provider,
 )
+from src.workers.llm_batch import BatchContext, BatchPending
+from src.workers.link_cache import LinkCache, get_link_cache
 from src.workers.llm_client import LLMClient
+from src.workers.llm_hedging import HedgePolicy
+from src.workers.llm_ledger import drained, llm_call_scope, set_llm_call_context
+from src.workers.llm_routing import RouteDecision, RoutingPolicy, resolve_route
+from src.workers.llm_stream import JsonClosedStop
+from src.workers.prompt_budget import PromptBudget, compact_json
 from src.workers.prompt_builder import build_user_prompt_with_output_format
+from src.workers.structured_output import OutputSpec, StructuredOutputError
 
 logger = logging.getLogger(__name__)
 BOOK_REVIEW_PIPELINE_ID = "book_review_v2"
@@ -156,6 +171,67 @@ LINK_SUMMARY_PROMPT = {
     ),
 }
 
+LINK_COMBINED_PROMPT = {
+    "name": "Book Review - Additional Link Extractor + Summary",
+    "purpose": "book_review_link_combined",
+    "category": "Book Review",
+    "provider": "mistral",
+    "short_description": "Extrai metadados bibliograficos e resume links adicionais em uma unica chamada.",
+    "model_id": MODEL_MISTRAL_LARGE_LATEST,
+    "temperature": 0.2,
+    "max_tokens": 1400,
+    "system_prompt": (
+        "You are a bibliographic extraction and editorial research engine optimized for API usage. "
+        "Extract only factual information about a book and its author from the provided text "
+        "and summarize the source with focus on the book and author. "
+        "Do not invent data. Respond in Portuguese (pt-BR). Return strict JSON only."
+    ),
+    "user_prompt": (
+        "Task: extract bibliographic metadata and produce a concise summary from the source content.\n"
+        "Book title (reference): {{title}}\n"
+        "Author (reference): {{author}}\n"
+        "Source URL: {{url}}\n\n"
+        "Source content:\n{{content}}\n\n"
+        "Rules:\n"
+        "- Use only information present in the source.\n"
+        "- In \"bibliographic\", keep numeric values as numbers when possible and use null for unknown fields.\n"
+        "- Keep the summary objective, factual and useful for writing an analytical review article.\n"
+        "- Respond in Portuguese (pt-BR), except URLs/identifiers.\n"
+        "- Return only the JSON object."
+    ),
+    "expected_output_format": (
+        "{\n"
+        '  "bibliographic": {\n'
+        '    "title": "string|null",\n'
+        '    "title_original": "string|null",\n'
+        '    "authors": ["string"],\n'
+        '    "language": "string|null",\n'
+        '    "original_language": "string|null",\n'
+        '    "edition": "string|null",\n'
+        '    "average_rating": "number|null",\n'
+        '    "pages": "number|null",\n'
+        '    "publisher": "string|null",\n'
+        '    "publication_date": "string|null",\n'
+        '    "asin": "string|null",\n'
+        '    "isbn_10": "string|null",\n'
+        '    "isbn_13": "string|null",\n'
+        '    "price_book": "number|string|null",\n'
+        '    "price_ebook": "number|string|null",\n'
+        '    "cover_image_url": "string|null"\n'
+        "  },\n"
+        '  "summary": "string",\n'
+        '  "topics": ["string"],\n'
+        '  "key_points": ["string"],\n'
+        '  "reader_intent_clues": ["string"],\n'
+        '  "credibility": "alta|media|baixa"\n'
+        "}"
+    ),
+}
+
+# Per-link prompt modes for the additional links step (pipeline `ai.link_prompt_mode`).
+LINK_PROMPT_MODE_SEPARATE = "separate"
+LINK_PROMPT_MODE_COMBINED = "combined"
+
 WEB_RESEARCH_PROMPT = {
     "name": "Book Review - Web Research",
     "purpose": "book_review_web_research",
@@ -216,17 +292,22 @@ class ScraperTask(Task):
     retry_jitter = True
 
 
+async def _get_pipeline_step(step_id: str, pipeline_id: str = BOOK_REVIEW_PIPELINE_ID) -> Optional[Dict[str, Any]]:
+    """Load a step document from the pipeline configuration."""
+    db = await get_db()
+    pipeline_repo = PipelineConfigRepository(db)
+    pipeline_doc = await pipeline_repo.get_by_pipeline_id(str(pipeline_id or BOOK_REVIEW_PIPELINE_ID))
+    if not pipeline_doc:
+        return None
+
+    raw_steps = pipeline_doc.get("steps", []) if isinstance(pipeline_doc.get("steps"), list) else []
+    return next((item for item in raw_steps if item.get("id") == step_id), None)
+
+
 async def _get_step_delay_seconds(step_id: str, pipeline_id: str = BOOK_REVIEW_PIPELINE_ID) -> int:
     """Resolve configured delay (in seconds) for a pipeline step."""
     try:
-        db = await get_db()
-        pipeline_repo = PipelineConfigRepository(db)
-        pipeline_doc = await pipeline_repo.get_by_pipeline_id(str(pipeline_id or BOOK_REVIEW_PIPELINE_ID))
-        if not pipeline_doc:
-            return 0
-
-        raw_steps = pipeline_doc.get("steps", []) if isinstance(pipeline_doc.get("steps"), list) else []
-        step_doc = next((item for item in raw_steps if item.get("id") == step_id), None)
+        step_doc = await _get_pipeline_step(step_id, pipeline_id)
         if not step_doc:
             return 0
 
@@ -238,6 +319,83 @@ async def _get_step_delay_seconds(step_id: str, pipeline_id: str = BOOK_REVIEW_P
         return 0
 
 
+async def _get_step_ai_config(step_id: str, pipeline_id: str = BOOK_REVIEW_PIPELINE_ID) -> Dict[str, Any]:
+    """Resolve the `ai` block configured for a pipeline step."""
+    try:
+        step_doc = await _get_pipeline_step(step_id, pipeline_id)
+        ai = (step_doc or {}).get("ai")
+        return dict(ai) if isinstance(ai, dict) else {}
+    except Exception as exc:
+        logger.warning("Failed to resolve pipeline step AI config for '%s': %s", step_id, exc)
+        return {}
+
+
+async def _resolve_hedge_policy(
+    credential_repo: CredentialRepository,
+    step_id: str,
+    pipeline_id: str,
+    primary_provider: Optional[str],
+    primary_model_id: Optional[str] = None,
+) -> Optional[HedgePolicy]:
+    """Build the hedging policy for a step when it is enabled in the pipeline config.
+
+    ``primary_provider``/``primary_model_id`` come from the step's prompt (what its calls go to).
+    """
+    ai_config = await _get_step_ai_config(step_id, pipeline_id)
+    policy = HedgePolicy.from_step_config(step_id, ai_config, primary_provider, primary_model_id=primary_model_id)
+    if policy is None:
+        return None
+
+    hedging = ai_config.get("hedging") or {}
+    default_name = "Mistral A" if policy.secondary_provider == PROVIDER_MISTRAL else "GROC A"
+    policy.secondary_api_key = await _resolve_credential_key(
+        credential_repo,
+        preferred_name=str(hedging.get("secondary_credential_name") or default_name),
+        service=policy.secondary_provider,
+    )
+    return policy
+
+
+async def _resolve_routing_policy(
+    credential_repo: CredentialRepository,
+    step_id: str,
+    pipeline_id: str,
+) -> Optional[RoutingPolicy]:
+    """Build the model routing policy for a step when it is enabled in the pipeline config."""
+    policy = RoutingPolicy.from_step_config(step_id, await _get_step_ai_config(step_id, pipeline_id))
+    if policy is None:
+        return None
+
+    keys: Dict[Tuple[str, str], Optional[str]] = {}
+    for tier in policy.tiers:
+        default_name = "Mistral A" if tier.provider == PROVIDER_MISTRAL else "GROC A"
+        lookup = (str(tier.credential_name or default_name), tier.provider)
+        if lookup not in keys:
+            keys[lookup] = await _resolve_credential_key(credential_repo, preferred_name=lookup[0], service=lookup[1])
+        tier.api_key = keys[lookup]
+    return policy
+
+
+def _route_call(
+    route: Optional[RoutingPolicy],
+    prompt_doc: Dict[str, Any],
+    provider: str,
+    model_id: str,
+    api_key: Optional[str],
+    *prompt_texts: str,
+) -> RouteDecision:
+    """Pick the model for one prompt call (the step's configured model when routing is off)."""
+    return resolve_route(
+        route,
+        provider,
+        model_id,
+        api_key,
+        prompt_texts,
+        structured=OutputSpec.from_prompt(prompt_doc) is not None,
+        max_output_tokens=int(prompt_doc.get("max_tokens") or 0),
+    )
+
+
 def _enqueue_task(task_callable, delay_seconds: int, **kwargs) -> None:
     """Queue a celery task optionally using countdown delay."""
     safe_delay = max(0, int(delay_seconds or 0))
@@ -262,40 +420,14 @@ def _dedupe_list(values: Iterable[str]) -> List[str]:
     return result
 
 
-def _strip_markdown_fences(text: str) -> str:
-    cleaned = text.strip()
-    if cleaned.startswith("```"):
-        cleaned = re.sub(r"^```[a-zA-Z0-9_-]*\s*", "", cleaned)
-        cleaned = re.sub(r"\s*```$", "", cleaned)
-    return cleaned.strip()
-
-
-def _safe_json_parse(raw: str) -> Dict[str, Any]:
-    if not raw:
+async def _generate_json(llm: LLMClient, prompt_doc: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+    """Validated JSON completion for an extraction prompt; {} when no valid object is obtained."""
+    try:
+        return await llm.generate_structured(output_spec=OutputSpec.from_prompt(prompt_doc), **kwargs)
+    except StructuredOutputError as exc:
+        logger.warning("Invalid JSON output for prompt '%s': %s", _prompt_ref(prompt_doc), exc.errors[:3] or exc)
         return {}
 
-    cleaned = _strip_markdown_fences(raw)
-    for candidate in (cleaned,):
-        try:
-            parsed = json.loads(candidate)
-            if isinstance(parsed, dict):
-                return parsed
-        except Exception:
-            pass
-
-    start = cleaned.find("{")
-    end = cleaned.rfind("}")
-    if start != -1 and end != -1 and start < end:
-        snippet = cleaned[start : end + 1]
-        try:
-            parsed = json.loads(snippet)
-            if isinstance(parsed, dict):
-                return parsed
-        except Exception:
-            pass
-
-    return {}
-
 
 def _normalize_bibliographic_candidate(data: Dict[str, Any]) -> Dict[str, Any]:
     if not isinstance(data, dict):
@@ -438,6 +570,13 @@ async def _ensure_prompt(prompt_repo: PromptRepository, prompt_data: Dict[str, A
     return created or payload
 
 
+def _prompt_ref(prompt_doc: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Prompt identifier recorded in the LLM call ledger."""
+    if not prompt_doc:
+        return None
+    return str(prompt_doc.get("_id") or prompt_doc.get("purpose") or "") or None
+
+
 async def _resolve_credential_key(
     credential_repo: CredentialRepository,
     preferred_name: str,
@@ -455,12 +594,30 @@ async def _resolve_credential_key(
             )
 
     if not credential or not credential.get("key"):
+        if normalize_provider(settings.llm_force_provider) == PROVIDER_LOCAL:
+            # The local provider needs no key; a placeholder keeps the LLM steps enabled.
+            return PROVIDER_LOCAL
         return None
 
     await credential_repo.touch_last_used(credential.get("_id"))
     return str(credential.get("key"))
 
 
+async def _cached_link_result(
+    cache: Optional[LinkCache],
+    cache_key: Optional[str],
+    step_id: str,
+    prompt_doc: Dict[str, Any],
+    provider: str,
+    model_id: str,
+) -> Optional[Any]:
+    """Look up a cached link LLM result (the hit is recorded in the ledger under ``step_id``)."""
+    if cache is None or not cache_key:
+        return None
+    with llm_call_scope(step_id=step_id, prompt_id=_prompt_ref(prompt_doc)):
+        return await cache.get_result(cache_key, provider=provider, model_id=model_id)
+
+
 async def _run_link_bibliographic_extraction(
     llm: LLMClient,
     prompt_doc: Dict[str, Any],
@@ -468,6 +625,10 @@ async def _run_link_bibliographic_extraction(
     title: str,
     author: str,
     api_key: Optional[str],
+    hedge: Optional[HedgePolicy] = None,
+    batch: Optional[BatchContext] = None,
+    cache: Optional[LinkCache] = None,
+    route: Optional[RoutingPolicy] = None,
 ) -> Dict[str, Any]:
     if not content.strip():
         return {}
@@ -475,23 +636,52 @@ async def _run_link_bibliographic_extraction(
     if not api_key:
         return {}
 
+    system_prompt = str(prompt_doc.get("system_prompt", ""))
+    model_id = str(prompt_doc.get("model_id", MODEL_MISTRAL_LARGE_LATEST))
+    cache_key = (
+        cache.result_key("link_bibliographic", content, prompt_doc, title=title, author=author) if cache else None
+    )
+    cached = await _cached_link_result(
+        cache, cache_key, "additional_links_scrape", prompt_doc, PROVIDER_MISTRAL, model_id
+    )
+    if isinstance(cached, dict):
+        return cached
+
     user_prompt = str(prompt_doc.get("user_prompt", ""))
     user_prompt = user_prompt.replace("{{title}}", str(title or ""))
     user_prompt = user_prompt.replace("{{author}}", str(author or ""))
-    user_prompt = user_prompt.replace("{{content}}", content[:4500])
     user_prompt = build_user_prompt_with_output_format(user_prompt, prompt_doc)
-
-    response = await llm.generate_with_retry(
-        system_prompt=str(prompt_doc.get("system_prompt", "")),
-        user_prompt=user_prompt,
-        model_id=str(prompt_doc.get("model_id", MODEL_MISTRAL_LARGE_LATEST)),
-        temperature=float(prompt_doc.get("temperature", 0.1)),
-        max_tokens=int(prompt_doc.get("max_tokens", 900)),
-        provider=PROVIDER_MISTRAL,
-        api_key=api_key,
-        allow_fallback=False,
+    decision = _route_call(route, prompt_doc, PROVIDER_MISTRAL, model_id, api_key, system_prompt, user_prompt, content)
+    fitted = (
+        PromptBudget.for_step("link_bibliographic", decision.model_id)
+        .reserve(system_prompt, user_prompt)
+        .add("content", content, priority=1)
+        .fit()
     )
-    return _normalize_bibliographic_candidate(_safe_json_parse(response))
+    user_prompt = user_prompt.replace("{{content}}", fitted["content"])
+
+    with llm_call_scope(
+        step_id="additional_links_scrape", prompt_id=_prompt_ref(prompt_doc), route=decision.as_record()
+    ):
+        parsed = await _generate_json(
+            llm,
+            prompt_doc,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            model_id=decision.model_id,
+            temperature=float(prompt_doc.get("temperature", 0.1)),
+            max_tokens=int(prompt_doc.get("max_tokens", 900)),
+            provider=decision.provider,
+            api_key=decision.api_key,
+            allow_fallback=False,
+            stop_when=JsonClosedStop(),
+            hedge=hedge,
+            batch=batch,
+        )
+    bibliographic = _normalize_bibliographic_candidate(parsed)
+    if cache_key and parsed:
+        await cache.put_result(cache_key, "link_bibliographic", content, prompt_doc, bibliographic)
+    return bibliographic
 
 
 async def _run_link_summary(
@@ -502,45 +692,87 @@ async def _run_link_summary(
     author: str,
     url: str,
     api_key: Optional[str],
+    hedge: Optional[HedgePolicy] = None,
+    batch: Optional[BatchContext] = None,
+    cache: Optional[LinkCache] = None,
+    route: Optional[RoutingPolicy] = None,
 ) -> Dict[str, Any]:
     if not content.strip():
-        return {
-            "summary": "No relevant textual content extracted.",
-            "topics": [],
-            "key_points": [],
-            "credibility": "low",
-        }
+        return _fallback_link_summary(content, api_key)
 
     if api_key:
+        system_prompt = str(prompt_doc.get("system_prompt", ""))
+        model_id = str(prompt_doc.get("model_id", MODEL_GROQ_LLAMA_3_3_70B))
+        cache_key = cache.result_key("link_summary", content, prompt_doc, title=title, author=author) if cache else None
+        cached = await _cached_link_result(
+            cache, cache_key, "summarize_additional_links", prompt_doc, PROVIDER_GROQ, model_id
+        )
+        if isinstance(cached, dict) and cached.get("summary"):
+            return cached
+
         user_prompt = str(prompt_doc.get("user_prompt", ""))
         user_prompt = user_prompt.replace("{{title}}", str(title or ""))
         user_prompt = user_prompt.replace("{{author}}", str(author or ""))
         user_prompt = user_prompt.replace("{{url}}", str(url or ""))
-        user_prompt = user_prompt.replace("{{content}}", content[:4500])
         user_prompt = build_user_prompt_with_output_format(user_prompt, prompt_doc)
-
-        response = await llm.generate_with_retry(
-            system_prompt=str(prompt_doc.get("system_prompt", "")),
-            user_prompt=user_prompt,
-            model_id=str(prompt_doc.get("model_id", MODEL_GROQ_LLAMA_3_3_70B)),
-            temperature=float(prompt_doc.get("temperature", 0.3)),
-            max_tokens=int(prompt_doc.get("max_tokens", 900)),
-            provider=PROVIDER_GROQ,
-            api_key=api_key,
-            allow_fallback=False,
+        decision = _route_call(route, prompt_doc, PROVIDER_GROQ, model_id, api_key, system_prompt, user_prompt, content)
+        fitted = (
+            PromptBudget.for_step("link_summary", decision.model_id)
+            .reserve(system_prompt, user_prompt)
+            .add("content", content, priority=1)
+            .fit()
         )
-        parsed = _safe_json_parse(response)
-        summary_text = str(parsed.get("summary") or "").strip()
-        topics = parsed.get("topics") if isinstance(parsed.get("topics"), list) else []
-        key_points = parsed.get("key_points") if isinstance(parsed.get("key_points"), list) else []
-        credibility = str(parsed.get("credibility") or "medium")
-        if summary_text:
-            return {
-                "summary": summary_text,
-                "topics": _dedupe_list([str(item) for item in topics]),
-                "key_points": _dedupe_list([str(item) for item in key_points]),
-                "credibility": credibility,
-            }
+        user_prompt = user_prompt.replace("{{content}}", fitted["content"])
+
+        with llm_call_scope(
+            step_id="summarize_additional_links", prompt_id=_prompt_ref(prompt_doc), route=decision.as_record()
+        ):
+            parsed = await _generate_json(
+                llm,
+                prompt_doc,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                model_id=decision.model_id,
+                temperature=float(prompt_doc.get("temperature", 0.3)),
+                max_tokens=int(prompt_doc.get("max_tokens", 900)),
+                provider=decision.provider,
+                api_key=decision.api_key,
+                allow_fallback=False,
+                stop_when=JsonClosedStop(),
+                hedge=hedge,
+                batch=batch,
+            )
+        summary_data = _normalize_link_summary(parsed)
+        if summary_data:
+            if cache_key:
+                await cache.put_result(cache_key, "link_summary", content, prompt_doc, summary_data)
+            return summary_data
+
+    return _fallback_link_summary(content, api_key)
+
+
+def _normalize_link_summary(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    summary_text = str(parsed.get("summary") or "").strip()
+    if not summary_text:
+        return {}
+    topics = parsed.get("topics") if isinstance(parsed.get("topics"), list) else []
+    key_points = parsed.get("key_points") if isinstance(parsed.get("key_points"), list) else []
+    return {
+        "summary": summary_text,
+        "topics": _dedupe_list([str(item) for item in topics]),
+        "key_points": _dedupe_list([str(item) for item in key_points]),
+        "credibility": str(parsed.get("credibility") or "medium"),
+    }
+
+
+def _fallback_link_summary(content: str, api_key: Optional[str]) -> Dict[str, Any]:
+    if not content.strip():
+        return {
+            "summary": "No relevant textual content extracted.",
+            "topics": [],
+            "key_points": [],
+            "credibility": "low",
+        }
 
     fallback_summary = content[:700]
     return {
@@ -551,6 +783,88 @@ async def _run_link_summary(
     }
 
 
+def _prompt_api_key(
+    prompt_doc: Dict[str, Any],
+    mistral_api_key: Optional[str],
+    groq_api_key: Optional[str],
+) -> Optional[str]:
+    """Credential for the provider of an editable prompt (Mistral unless it names Groq)."""
+    provider = normalize_provider(prompt_doc.get("provider")) or PROVIDER_MISTRAL
+    return groq_api_key if provider == PROVIDER_GROQ else mistral_api_key
+
+
+async def _run_link_combined(
+    llm: LLMClient,
+    prompt_doc: Dict[str, Any],
+    content: str,
+    title: str,
+    author: str,
+    url: str,
+    api_key: Optional[str],
+    hedge: Optional[HedgePolicy] = None,
+    batch: Optional[BatchContext] = None,
+    cache: Optional[LinkCache] = None,
+    route: Optional[RoutingPolicy] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run bibliographic extraction and summary for a link in a single call.
+
+    Returns ``(bibliographic_data, summary_data)`` shaped like the separate helpers.
+    """
+    if not content.strip() or not api_key:
+        return {}, _fallback_link_summary(content, api_key)
+
+    system_prompt = str(prompt_doc.get("system_prompt", ""))
+    model_id = str(prompt_doc.get("model_id", MODEL_MISTRAL_LARGE_LATEST))
+    provider = str(prompt_doc.get("provider") or PROVIDER_MISTRAL)
+    cache_key = cache.result_key("link_combined", content, prompt_doc, title=title, author=author) if cache else None
+    cached = await _cached_link_result(cache, cache_key, "additional_links_scrape", prompt_doc, provider, model_id)
+    if isinstance(cached, dict) and isinstance(cached.get("summary"), dict):
+        return cached.get("bibliographic") or {}, cached["summary"]
+
+    user_prompt = str(prompt_doc.get("user_prompt", ""))
+    user_prompt = user_prompt.replace("{{title}}", str(title or ""))
+    user_prompt = user_prompt.replace("{{author}}", str(author or ""))
+    user_prompt = user_prompt.replace("{{url}}", str(url or ""))
+    user_prompt = build_user_prompt_with_output_format(user_prompt, prompt_doc)
+    decision = _route_call(route, prompt_doc, provider, model_id, api_key, system_prompt, user_prompt, content)
+    fitted = (
+        PromptBudget.for_step("link_combined", decision.model_id)
+        .reserve(system_prompt, user_prompt)
+        .add("content", content, priority=1)
+        .fit()
+    )
+    user_prompt = user_prompt.replace("{{content}}", fitted["content"])
+
+    with llm_call_scope(
+        step_id="additional_links_scrape", prompt_id=_prompt_ref(prompt_doc), route=decision.as_record()
+    ):
+        parsed = await _generate_json(
+            llm,
+            prompt_doc,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            model_id=decision.model_id,
+            temperature=float(prompt_doc.get("temperature", 0.2)),
+            max_tokens=int(prompt_doc.get("max_tokens", 1400)),
+            provider=decision.provider,
+            api_key=decision.api_key,
+            allow_fallback=False,
+            stop_when=JsonClosedStop(),
+            hedge=hedge,
+            batch=batch,
+        )
+    raw_bibliographic = parsed.get("bibliographic") if isinstance(parsed.get("bibliographic"), dict) else {}
+    bibliographic = _normalize_bibliographic_candidate(raw_bibliographic)
+    summary_data = _normalize_link_summary(parsed)
+    if not summary_data:
+        return bibliographic, _fallback_link_summary(content, api_key)
+    if cache_key:
+        await cache.put_result(
+            cache_key, "link_combined", content, prompt_doc, {"bibliographic": bibliographic, "summary": summary_data}
+        )
+    return bibliographic, summary_data
+
+
 async def _run_web_research(
     llm: LLMClient,
     prompt_doc: Dict[str, Any],
@@ -558,6 +872,8 @@ async def _run_web_research(
     author: str,
     source_blobs: List[Dict[str, Any]],
     api_key: Optional[str],
+    hedge: Optional[HedgePolicy] = None,
+    route: Optional[RoutingPolicy] = None,
 ) -> Dict[str, Any]:
     sources_text_lines = []
     for item in source_blobs:
@@ -571,24 +887,39 @@ async def _run_web_research(
     sources_text = "\n".join(sources_text_lines).strip()
 
     if api_key and sources_text:
+        system_prompt = str(prompt_doc.get("system_prompt", ""))
+        model_id = str(prompt_doc.get("model_id", MODEL_GROQ_LLAMA_3_3_70B))
         user_prompt = str(prompt_doc.get("user_prompt", ""))
         user_prompt = user_prompt.replace("{{title}}", str(title or ""))
         user_prompt = user_prompt.replace("{{author}}", str(author or ""))
-        user_prompt = user_prompt.replace("{{sources}}", sources_text[:16000])
         user_prompt = build_user_prompt_with_output_format(user_prompt, prompt_doc)
-
-        response = await llm.generate_with_retry(
-            system_prompt=str(prompt_doc.get("system_prompt", "")),
-            user_prompt=user_prompt,
-            model_id=str(prompt_doc.get("model_id", MODEL_GROQ_LLAMA_3_3_70B)),
-            temperature=float(prompt_doc.get("temperature", 0.25)),
-            max_tokens=int(prompt_doc.get("max_tokens", 1100)),
-            provider=PROVIDER_GROQ,
-            api_key=api_key,
-            allow_fallback=False,
+        decision = _route_call(
+            route, prompt_doc, PROVIDER_GROQ, model_id, api_key, system_prompt, user_prompt, sources_text
         )
+        fitted = (
+            PromptBudget.for_step("web_research", decision.model_id)
+            .reserve(system_prompt, user_prompt)
+            .add("sources", sources_text, priority=1)
+            .fit()
+        )
+        user_prompt = user_prompt.replace("{{sources}}", fitted["sources"])
+
+        with llm_call_scope(step_id="internet_research", prompt_id=_prompt_ref(prompt_doc), route=decision.as_record()):
+            parsed = await _generate_json(
+                llm,
+                prompt_doc,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                model_id=decision.model_id,
+                temperature=float(prompt_doc.get("temperature", 0.25)),
+                max_tokens=int(prompt_doc.get("max_tokens", 1100)),
+                provider=decision.provider,
+                api_key=decision.api_key,
+                allow_fallback=False,
+                stop_when=JsonClosedStop(),
+                hedge=hedge,
+            )
 
-        parsed = _safe_json_parse(response)
         markdown = str(parsed.get("research_markdown") or "").strip()
         topics = parsed.get("topics") if isinstance(parsed.get("topics"), list) else []
         key_insights = parsed.get("key_insights") if isinstance(parsed.get("key_insights"), list) else []
@@ -622,14 +953,100 @@ async def _run_web_research(
     }
 
 
+def _title_key(value: Any) -> str:
+    """Title without subtitle, series suffix, case and punctuation (for matching search results)."""
+    text = re.sub(r"\(.*?\)|\[.*?\]", " ", str(value or "")).split(":")[0]
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def _pick_goodreads_match(
+    results: List[Dict[str, Any]],
+    title: str,
+    author: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """First search result whose title matches ``title`` (and shares a name with ``author``)."""
+    wanted_title = _title_key(title)
+    wanted_names = set(re.findall(r"\w{3,}", str(author or "").lower()))
+    for result in results:
+        if not result.get("goodreads_url"):
+            continue
+        if SequenceMatcher(None, wanted_title, _title_key(result.get("title"))).ratio() < 0.85:
+            continue
+        names = set(re.findall(r"\w{3,}", str(result.get("author") or "").lower()))
+        if wanted_names and names and not wanted_names & names:
+            continue
+        return result
+    return None
+
+
+async def _fetch_goodreads_data(submission: Dict[str, Any]) -> Dict[str, Any]:
+    """Goodreads book details for a submission: its ``goodreads_url``, else the best search match."""
+    scraper = GoodreadsScraper()
+    try:
+        await scraper.initialize()
+        url = str(submission.get("goodreads_url") or "").strip()
+        match: Dict[str, Any] = {}
+        if not url:
+            title = str(submission.get("title") or "").strip()
+            if not title:
+                return {}
+            results = await scraper.search(title, submission.get("author_name"))
+            match = _pick_goodreads_match(results, title, submission.get("author_name")) or {}
+            if not match:
+                logger.info("No Goodreads match for %r", title)
+                return {}
+            url = urljoin(GoodreadsScraper.API_BASE, str(match["goodreads_url"]))
+        details = await scraper.get_book_details(url) or {}
+    finally:
+        try:
+            await scraper.cleanup()
+        except Exception:
+            pass
+    merged = {**match, **{key: value for key, value in details.items() if value not in (None, "", [])}}
+    return {**merged, "goodreads_url": url} if merged.get("title") else {}
+
+
+@shared_task(base=ScraperTask, bind=True)
+def enrich_goodreads_task(self, submission_id: str) -> Dict[str, Any]:
+    """Add Goodreads data to the book; queued by ``scrape_amazon_task`` so it runs alongside the scrape.
+
+    Always ends with ``extracted.goodreads_status = "done"``, which releases bibliographic consolidation.
+    """
+
+    async def _run() -> Dict[str, Any]:
+        db = await get_db()
+        submission_repo = SubmissionRepository(db)
+        book_repo = BookRepository(db)
+
+        submission = await submission_repo.get_by_id(submission_id)
+        if not submission:
+            return {"status": "error", "error": "submission_not_found"}
+        try:
+            goodreads = await _fetch_goodreads_data(submission)
+        except Exception as exc:
+            logger.warning("Goodreads enrichment failed for %s: %s", submission_id, exc)
+            goodreads = {}
+        update: Dict[str, Any] = {"goodreads_status": "done"}
+        if goodreads:
+            update["goodreads"] = goodreads
+        await book_repo.create_or_update(submission_id=submission_id, extracted=update)
+        return {"status": "ok", "goodreads": bool(goodreads)}
+
+    return asyncio.run(drained(_run()))
+
+
 @shared_task(base=ScraperTask, bind=True)
 def scrape_amazon_task(
     self,
     submission_id: str,
     amazon_url: str,
     pipeline_id: str = BOOK_REVIEW_PIPELINE_ID,
+    refresh_product_cache: bool = False,
 ) -> Dict[str, Any]:
-    """Scrape Amazon metadata and persist into books collection."""
+    """Scrape Amazon metadata and persist into books collection.
+
+    ``refresh_product_cache`` (explicit step retry) drops the cached product and scrapes again.
+    """
 
     async def _run() -> Dict[str, Any]:
         db = await get_db()
@@ -653,19 +1070,35 @@ def scrape_amazon_task(
             },
         )
 
-        extracted: Dict[str, Any]
-        scraper = AmazonScraper()
-        try:
-            await scraper.initialize()
-            extracted = await scraper.scrape(amazon_url) or {}
-        except Exception as exc:
-            logger.warning("Amazon scrape failed for %s: %s", submission_id, exc)
-            extracted = {}
-        finally:
+        # Goodreads enrichment runs in its own task while Amazon is scraped; bibliographic
+        # consolidation waits for its "pending" status to clear.
+        if settings.goodreads_enrichment_enabled:
+            await book_repo.create_or_update(submission_id=submission_id, extracted={"goodreads_status": "pending"})
+            _enqueue_task(enrich_goodreads_task, 0, submission_id=submission_id)
+
+        # Same ASIN/ISBN scraped recently (resubmission, other pipeline): skip the scrape.
+        product_cache = get_product_cache()
+        if refresh_product_cache:
+            await product_cache.invalidate(amazon_url)
+        extracted: Dict[str, Any] = {} if refresh_product_cache else await product_cache.get(amazon_url) or {}
+        page_load: Optional[Dict[str, Any]] = None
+        amazon_fetch: Optional[Dict[str, Any]] = {"tier": "product_cache", "escalation": None}
+        if not extracted:
+            scraper = AmazonScraper()
             try:
-                await scraper.cleanup()
-            except Exception:
-                pass
+                await scraper.initialize()
+                extracted = await scraper.scrape(amazon_url) or {}
+            except Exception as exc:
+                logger.warning("Amazon scrape failed for %s: %s", submission_id, exc)
+                extracted = {}
+            finally:
+                try:
+                    await scraper.cleanup()
+                except Exception:
+                    pass
+            page_load, amazon_fetch = scraper.last_page_stats, scraper.last_fetch
+            if extracted.get("title"):
+                await product_cache.put(amazon_url, extracted)
 
         if not extracted or not extracted.get("title"):
             message = "Failed to extract Amazon product data. Check amazon_url validity or access restrictions."
@@ -676,6 +1109,8 @@ def scrape_amazon_task(
                     "current_step": "amazon_scrape",
                     "errors": [message],
                     "pipeline_version": resolved_pipeline_id,
+                    "page_load": page_load,
+                    "amazon_fetch": amazon_fetch,
                 },
             )
             return {"status": "error", "error": "amazon_scrape_failed", "message": message}
@@ -688,6 +1123,8 @@ def scrape_amazon_task(
                 "current_step": "additional_links_processing",
                 "book_id": book_id,
                 "pipeline_version": resolved_pipeline_id,
+                "page_load": page_load,
+                "amazon_fetch": amazon_fetch,
             },
         )
 
@@ -695,7 +1132,7 @@ def scrape_amazon_task(
         _enqueue_task(process_additional_links_task, next_delay, submission_id=submission_id)
         return {"status": "ok", "book_id": book_id}
 
-    return asyncio.run(_run())
+    return asyncio.run(drained(_run()))
 
 
 @shared_task(base=ScraperTask, bind=True)
@@ -703,6 +1140,7 @@ def process_additional_links_task(self, submission_id: str) -> Dict[str, Any]:
     """Process additional links: bibliographic extraction (Mistral) + summary (Groq) for each link."""
 
     async def _run() -> Dict[str, Any]:
+        set_llm_call_context(submission_id=submission_id)
         db = await get_db()
         submission_repo = SubmissionRepository(db)
         book_repo = BookRepository(db)
@@ -728,11 +1166,47 @@ def process_additional_links_task(self, submission_id: str) -> Dict[str, Any]:
             },
         )
 
-        bibliographic_prompt = await _ensure_prompt(prompt_repo, LINK_BIBLIO_PROMPT)
-        summary_prompt = await _ensure_prompt(prompt_repo, LINK_SUMMARY_PROMPT)
+        links_ai_config = await _get_step_ai_config("additional_links_scrape", pipeline_id)
+        combined_mode = links_ai_config.get("link_prompt_mode") == LINK_PROMPT_MODE_COMBINED
+        if combined_mode:
+            combined_prompt = await _ensure_prompt(prompt_repo, LINK_COMBINED_PROMPT)
+        else:
+            bibliographic_prompt = await _ensure_prompt(prompt_repo, LINK_BIBLIO_PROMPT)
+            summary_prompt = await _ensure_prompt(prompt_repo, LINK_SUMMARY_PROMPT)
 
         mistral_api_key = await _resolve_credential_key(credential_repo, preferred_name="Mistral A", service="mistral")
         groq_api_key = await _resolve_credential_key(credential_repo, preferred_name="GROC A", service="groq")
+        combined_api_key = (
+            _prompt_api_key(combined_prompt, mistral_api_key, groq_api_key) if combined_mode else None
+        )
+        bibliographic_step_prompt = combined_prompt if combined_mode else bibliographic_prompt
+        summary_step_prompt = combined_prompt if combined_mode else summary_prompt
+        bibliographic_hedge = await _resolve_hedge_policy(
+            credential_repo,
+            "additional_links_scrape",
+            pipeline_id,
+            bibliographic_step_prompt.get("provider"),
+            bibliographic_step_prompt.get("model_id"),
+        )
+        summary_hedge = await _resolve_hedge_policy(
+            credential_repo,
+            "summarize_additional_links",
+            pipeline_id,
+            summary_step_prompt.get("provider"),
+            summary_step_prompt.get("model_id"),
+        )
+        bibliographic_route = await _resolve_routing_policy(credential_repo, "additional_links_scrape", pipeline_id)
+        summary_route = await _resolve_routing_policy(credential_repo, "summarize_additional_links", pipeline_id)
+        resume_task = "src.workers.scraper_tasks.process_additional_links_task"
+        bibliographic_batch = BatchContext.from_step_config(
+            "additional_links_scrape", links_ai_config, submission_id, resume_task
+        )
+        summary_batch = BatchContext.from_step_config(
+            "summarize_additional_links",
+            await _get_step_ai_config("summarize_additional_links", pipeline_id),
+            submission_id,
+            resume_task,
+        )
 
         links = _dedupe_list(submission.get("other_links", []))
         if not links:
@@ -751,31 +1225,98 @@ def process_additional_links_task(self, submission_id: str) -> Dict[str, Any]:
 
         finder = LinkFinder()
         llm = LLMClient()
-        processed = 0
-        link_candidates: List[Dict[str, Any]] = []
+        link_cache = get_link_cache()
+        link_results: List[Tuple[str, str, Dict[str, Any], Dict[str, Any]]] = []
+        batch_pending = 0
+        pages = await get_crawl_frontier().fetch_many(
+            links,
+            lambda url: link_cache.fetch_page(url, finder.fetch_and_parse),
+        )
 
-        for url in links:
+        for url, page in zip(links, pages):
             try:
-                content = await finder.fetch_and_parse(url)
-                bibliographic_data = await _run_link_bibliographic_extraction(
-                    llm=llm,
-                    prompt_doc=bibliographic_prompt,
-                    content=content,
-                    title=str(submission.get("title") or ""),
-                    author=str(submission.get("author_name") or ""),
-                    api_key=mistral_api_key,
-                )
+                if isinstance(page, Exception):
+                    raise page
+                content = page.text
+                if combined_mode:
+                    bibliographic_data, summary_data = await _run_link_combined(
+                        llm=llm,
+                        prompt_doc=combined_prompt,
+                        content=content,
+                        title=str(submission.get("title") or ""),
+                        author=str(submission.get("author_name") or ""),
+                        url=url,
+                        api_key=combined_api_key,
+                        hedge=bibliographic_hedge,
+                        batch=bibliographic_batch.for_request(f"{url}:combined") if bibliographic_batch else None,
+                        cache=link_cache,
+                        route=bibliographic_route,
+                    )
+                else:
+                    # Both calls are issued even if the first is waiting on a batch job,
+                    # so one batch round covers the whole link.
+                    waiting = False
+                    try:
+                        bibliographic_data = await _run_link_bibliographic_extraction(
+                            llm=llm,
+                            prompt_doc=bibliographic_prompt,
+                            content=content,
+                            title=str(submission.get("title") or ""),
+                            author=str(submission.get("author_name") or ""),
+                            api_key=mistral_api_key,
+                            hedge=bibliographic_hedge,
+                            batch=(
+                                bibliographic_batch.for_request(f"{url}:bibliographic") if bibliographic_batch else None
+                            ),
+                            cache=link_cache,
+                            route=bibliographic_route,
+                        )
+                    except BatchPending:
+                        waiting = True
+
+                    try:
+                        summary_data = await _run_link_summary(
+                            llm=llm,
+                            prompt_doc=summary_prompt,
+                            content=content,
+                            title=str(submission.get("title") or ""),
+                            author=str(submission.get("author_name") or ""),
+                            url=url,
+                            api_key=groq_api_key,
+                            hedge=summary_hedge,
+                            batch=summary_batch.for_request(f"{url}:summary") if summary_batch else None,
+                            cache=link_cache,
+                            route=summary_route,
+                        )
+                    except BatchPending:
+                        waiting = True
+
+                    if waiting:
+                        raise BatchPending(url)
+
+                link_results.append((url, content, bibliographic_data, summary_data))
+            except BatchPending:
+                batch_pending += 1
+            except Exception as exc:
+                logger.warning("Failed to process additional link '%s' for %s: %s", url, submission_id, exc)
 
-                summary_data = await _run_link_summary(
-                    llm=llm,
-                    prompt_doc=summary_prompt,
-                    content=content,
-                    title=str(submission.get("title") or ""),
-                    author=str(submission.get("author_name") or ""),
-                    url=url,
-                    api_key=groq_api_key,
-                )
+        if batch_pending:
+            # Nothing is persisted until every link has its results; the batch poller re-queues this task.
+            await submission_repo.update_status(
+                submission_id,
+                SubmissionStatus.PENDING_CONTEXT,
+                {
+                    "current_step": "waiting_llm_batch",
+                    "links_total": len(links),
+                    "llm_batch_pending": batch_pending,
+                },
+            )
+            return {"status": "waiting_batch", "links_total": len(links), "links_pending": batch_pending}
 
+        processed = 0
+        link_candidates: List[Dict[str, Any]] = []
+        for url, content, bibliographic_data, summary_data in link_results:
+            try:
                 await summary_repo.create(
                     book_id=str(book.get("_id")),
                     source_url=url,
@@ -820,12 +1361,15 @@ def process_additional_links_task(self, submission_id: str) -> Dict[str, Any]:
         _enqueue_task(consolidate_bibliographic_task, next_delay, submission_id=submission_id)
         return {"status": "ok", "links_total": len(links), "links_processed": processed}
 
-    return asyncio.run(_run())
+    return asyncio.run(drained(_run()))
 
 
 @shared_task(base=ScraperTask, bind=True)
-def consolidate_bibliographic_task(self, submission_id: str) -> Dict[str, Any]:
-    """Consolidate Amazon and additional-link bibliographic data, removing duplicates."""
+def consolidate_bibliographic_task(self, submission_id: str, goodreads_waited_seconds: float = 0.0) -> Dict[str, Any]:
+    """Consolidate Amazon and additional-link bibliographic data, removing duplicates.
+
+    Requeues itself while the Goodreads enrichment is pending, up to ``goodreads_enrichment_max_wait_seconds``.
+    """
 
     async def _run() -> Dict[str, Any]:
         db = await get_db()
@@ -842,6 +1386,19 @@ def consolidate_bibliographic_task(self, submission_id: str) -> Dict[str, Any]:
         if not book:
             return {"status": "error", "error": "book_not_found"}
 
+        extracted = book.get("extracted", {}) or {}
+        if extracted.get("goodreads_status") == "pending":
+            poll_seconds = max(1, int(settings.goodreads_enrichment_poll_seconds))
+            if goodreads_waited_seconds < settings.goodreads_enrichment_max_wait_seconds:
+                _enqueue_task(
+                    consolidate_bibliographic_task,
+                    poll_seconds,
+                    submission_id=submission_id,
+                    goodreads_waited_seconds=goodreads_waited_seconds + poll_seconds,
+                )
+                return {"status": "waiting", "waiting_for": "goodreads_enrichment"}
+            logger.warning("Goodreads enrichment still pending for %s; consolidating without it", submission_id)
+
         await submission_repo.update_status(
             submission_id,
             SubmissionStatus.PENDING_CONTEXT,
@@ -855,7 +1412,9 @@ def consolidate_bibliographic_task(self, submission_id: str) -> Dict[str, Any]:
             if isinstance(item.get("bibliographic_data"), dict) and item.get("bibliographic_data")
         ]
 
-        extracted = book.get("extracted", {}) or {}
+        # Goodreads fills fields missing on Amazon ahead of the LLM-extracted link data.
+        if isinstance(extracted.get("goodreads"), dict) and extracted["goodreads"]:
+            candidates.insert(0, extracted["goodreads"])
         consolidated = _consolidate_bibliographic(amazon_data=extracted, link_candidates=candidates)
 
         await book_repo.create_or_update(
@@ -877,7 +1436,7 @@ def consolidate_bibliographic_task(self, submission_id: str) -> Dict[str, Any]:
         _enqueue_task(internet_research_task, next_delay, submission_id=submission_id)
         return {"status": "ok", "consolidated_sources_count": len(candidates)}
 
-    return asyncio.run(_run())
+    return asyncio.run(drained(_run()))
 
 
 @shared_task(base=ScraperTask, bind=True)
@@ -885,6 +1444,7 @@ def internet_research_task(self, submission_id: str) -> Dict[str, Any]:
     """Research web sources about book and author using GROQ credential and persist results."""
 
     async def _run() -> Dict[str, Any]:
+        set_llm_call_context(submission_id=submission_id)
         db = await get_db()
         submission_repo = SubmissionRepository(db)
         book_repo = BookRepository(db)
@@ -908,28 +1468,32 @@ def internet_research_task(self, submission_id: str) -> Dict[str, Any]:
 
         prompt_doc = await _ensure_prompt(prompt_repo, WEB_RESEARCH_PROMPT)
         groq_api_key = await _resolve_credential_key(credential_repo, preferred_name="GROC A", service="groq")
+        research_hedge = await _resolve_hedge_policy(
+            credential_repo, "internet_research", pipeline_id, prompt_doc.get("provider"), prompt_doc.get("model_id")
+        )
+        research_route = await _resolve_routing_policy(credential_repo, "internet_research", pipeline_id)
 
         title = str(submission.get("title") or "")
         author = str(submission.get("author_name") or "")
 
         finder = LinkFinder()
+        link_cache = get_link_cache()
         links: List[Dict[str, Any]] = []
         try:
             links = await finder.search_book_links(title=title, author=author, count=4)
         except Exception as exc:
             logger.warning("Web search failed for %s: %s", submission_id, exc)
 
+        sources = [item for item in links[:4] if str(item.get("url") or "").strip()]
+        pages = await get_crawl_frontier().fetch_many(
+            [str(item.get("url")).strip() for item in sources],
+            lambda url: link_cache.fetch_page(url, finder.fetch_and_parse),
+        )
+
         source_blobs: List[Dict[str, Any]] = []
-        for item in links[:4]:
-            url = str(item.get("url") or "").strip()
-            if not url:
-                continue
-            content_excerpt = ""
-            try:
-                content = await finder.fetch_and_parse(url)
-                content_excerpt = content[:1400]
-            except Exception:
-                content_excerpt = ""
+        for item, page in zip(sources, pages):
+            url = str(item.get("url")).strip()
+            content_excerpt = "" if isinstance(page, Exception) else page.text[:1400]
 
             source_blobs.append(
                 {
@@ -948,6 +1512,8 @@ def internet_research_task(self, submission_id: str) -> Dict[str, Any]:
             author=author,
             source_blobs=source_blobs,
             api_key=groq_api_key,
+            hedge=research_hedge,
+            route=research_route,
         )
 
         await book_repo.create_or_update(
@@ -973,7 +1539,7 @@ def internet_research_task(self, submission_id: str) -> Dict[str, Any]:
 
         return {"status": "ok", "sources_count": len(source_blobs)}
 
-    return asyncio.run(_run())
+    return asyncio.run(drained(_run()))
 
 
 @shared_task(bind=True)
@@ -981,12 +1547,14 @@ def generate_context_task(self, submission_id: str) -> Dict[str, Any]:
     """Generate knowledge base markdown for a submission."""
 
     async def _run() -> Dict[str, Any]:
+        set_llm_call_context(submission_id=submission_id)
         db = await get_db()
         submission_repo = SubmissionRepository(db)
         book_repo = BookRepository(db)
         kb_repo = KnowledgeBaseRepository(db)
         summary_repo = SummaryRepository(db)
         prompt_repo = PromptRepository(db)
+        credential_repo = CredentialRepository(db)
 
         submission = await submission_repo.get_by_id(submission_id)
         if not submission:
@@ -1017,36 +1585,94 @@ def generate_context_task(self, submission_id: str) -> Dict[str, Any]:
 
         llm_markdown = None
         if prompt:
+            system_prompt = prompt.get("system_prompt", "")
+            model_id = prompt.get("model_id", BOOK_REVIEW_CONTEXT_MODEL_ID)
+            research_markdown = (
+                str(web_research.get("research_markdown") or "") if isinstance(web_research, dict) else ""
+            )
+            # Consolidated data and research notes get their own sections; keep them out of {{data}}.
+            data = (
+                {
+                    key: value
+                    for key, value in extracted.items()
+                    if not (key == "consolidated_bibliographic" and consolidated)
+                    and not (key == "web_research" and research_markdown)
+                }
+                if isinstance(extracted, dict)
+                else extracted
+            )
+            summaries_text = "".join(
+                f"- {item.get('source_url')}: {item.get('summary_text')}\n" for item in summaries or []
+            )
+
             user_prompt = prompt.get("user_prompt", "")
             user_prompt = user_prompt.replace("{{title}}", str(book_title or ""))
             user_prompt = user_prompt.replace("{{author}}", str(author_name or ""))
-            user_prompt = user_prompt.replace("{{data}}", json.dumps(extracted, ensure_ascii=False, default=str))
 
-            if consolidated:
+            # Priority: bibliographic metadata > research notes > link summaries > raw extracted data.
+            fitted = (
+                PromptBudget.for_step("context", model_id)
+                .reserve(
+                    system_prompt,
+                    user_prompt,
+                    build_user_prompt_with_output_format("", prompt),
+                    "Consolidated bibliographic data: Web research notes: External summaries:",
+                )
+                .add("consolidated", compact_json(consolidated) if consolidated else "", priority=0, min_tokens=200)
+                .add("research", research_markdown, priority=1, min_tokens=300)
+                .add("summaries", summaries_text, priority=2)
+                .add("data", compact_json(data) if "{{data}}" in user_prompt else "", priority=3)
+                .fit()
+            )
+            user_prompt = user_prompt.replace("{{data}}", fitted["data"])
+
+            if fitted["consolidated"]:
                 user_prompt += "\n\nConsolidated bibliographic data:\n"
-                user_prompt += json.dumps(consolidated, ensure_ascii=False, default=str)
+                user_prompt += fitted["consolidated"]
 
-            if isinstance(web_research, dict) and web_research.get("research_markdown"):
+            if fitted["research"]:
                 user_prompt += "\n\nWeb research notes:\n"
-                user_prompt += str(web_research.get("research_markdown"))
+                user_prompt += fitted["research"]
 
-            if summaries:
+            if fitted["summaries"]:
                 user_prompt += "\n\nExternal summaries:\n"
-                for item in summaries:
-                    user_prompt += f"- {item.get('source_url')}: {item.get('summary_text')}\n"
+                user_prompt += fitted["summaries"]
 
             user_prompt = build_user_prompt_with_output_format(user_prompt, prompt)
 
+            context_hedge = await _resolve_hedge_policy(
+                credential_repo,
+                "context_generation",
+                pipeline_id,
+                prompt.get("provider", BOOK_REVIEW_CONTEXT_PROVIDER),
+                prompt.get("model_id", BOOK_REVIEW_CONTEXT_MODEL_ID),
+            )
+            context_batch = BatchContext.from_step_config(
+                "context_generation",
+                await _get_step_ai_config("context_generation", pipeline_id),
+                submission_id,
+                "src.workers.scraper_tasks.generate_context_task",
+            )
             try:
                 llm = LLMClient()
-                llm_markdown = await llm.generate_with_retry(
-                    system_prompt=prompt.get("system_prompt", ""),
-                    user_prompt=user_prompt,
-                    model_id=prompt.get("model_id", BOOK_REVIEW_CONTEXT_MODEL_ID),
-                    temperature=prompt.get("temperature", 0.7),
-                    max_tokens=prompt.get("max_tokens", 1200),
-                    provider=prompt.get("provider", BOOK_REVIEW_CONTEXT_PROVIDER),
+                with llm_call_scope(step_id="context_generation", prompt_id=_prompt_ref(prompt)):
+                    llm_markdown = await llm.generate_with_retry(
+                        system_prompt=system_prompt,
+                        user_prompt=user_prompt,
+                        model_id=model_id,
+                        temperature=prompt.get("temperature", 0.7),
+                        max_tokens=prompt.get("max_tokens", 1200),
+                        provider=prompt.get("provider", BOOK_REVIEW_CONTEXT_PROVIDER),
+                        hedge=context_hedge,
+                        batch=context_batch.for_request("context") if context_batch else None,
+                    )
+            except BatchPending:
+                await submission_repo.update_status(
+                    submission_id,
+                    SubmissionStatus.CONTEXT_GENERATION,
+                    {"current_step": "waiting_llm_batch"},
                 )
+                return {"status": "waiting_batch"}
             except Exception as exc:
                 logger.warning("LLM context generation failed: %s", exc)
 
@@ -1119,7 +1745,7 @@ def generate_context_task(self, submission_id: str) -> Dict[str, Any]:
 
         return {"status": "ok", "article_generation_queued": True, "article_generation_delay_seconds": next_delay}
 
-    return asyncio.run(_run())
+    return asyncio.run(drained(_run()))
 
 
 @shared_task(bind=True)
@@ -1141,17 +1767,19 @@ def check_scraping_status(self, submission_id: str) -> Dict[str, Any]:
             "updated_at": submission.get("updated_at"),
         }
 
-    return asyncio.run(_run())
+    return asyncio.run(drained(_run()))
 
 
 def start_scraping_pipeline(
     submission_id: str,
     amazon_url: str,
     pipeline_id: str = BOOK_REVIEW_PIPELINE_ID,
+    refresh_product_cache: bool = False,
 ) -> None:
     """Start scraping pipeline by queueing Amazon task."""
     scrape_amazon_task.delay(
         submission_id=submission_id,
         amazon_url=amazon_url,
         pipeline_id=pipeline_id,
+        refresh_product_cache=refresh_product_cache,
     )
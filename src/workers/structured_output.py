@@ -0,0 +1,199 @@
+"""Structured (JSON) output for extraction prompts.
+
+Extraction prompts describe their output with a JSON template in
+``expected_output_format``, e.g. ``{"title": "string|null", "authors": ["string"],
+"credibility": "alta|media|baixa"}``. ``OutputSpec`` turns that template into a
+typed pydantic model (used to validate the completion) and a JSON schema (sent
+to providers that support native JSON mode / response schemas).
+
+Template leaves:
+
+- ``"string"``, ``"number"``, ``"integer"``, ``"boolean"``, optionally with ``|null``
+  and free text after the type (``"string (markdown)"``);
+- unions such as ``"number|string|null"``;
+- enumerations such as ``"alta|media|baixa"`` (matched case/accent-insensitively);
+- lists (``["string"]`` or several example items; the first one is the item type)
+  and nested objects.
+
+Validation is lenient where LLMs commonly drift without losing meaning: scalars
+are wrapped into one-item lists, numbers are accepted for strings and numeric
+strings for numbers, unknown keys are kept and missing nullable fields/lists get
+empty defaults.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import unicodedata
+from typing import Any, Dict, List, Literal, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, ValidationError, create_model
+from typing_extensions import Annotated
+
+_SCALAR_TYPES: Dict[str, Any] = {
+    "string": str,
+    "str": str,
+    "text": str,
+    "number": Union[int, float],
+    "float": float,
+    "integer": int,
+    "int": int,
+    "boolean": bool,
+    "bool": bool,
+}
+_NULL_NAMES = {"null", "none"}
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z0-9_-]*\s*|\s*```$")
+_MODEL_NAME_RE = re.compile(r"[^0-9a-zA-Z]+")
+
+
+class StructuredOutputError(ValueError):
+    """Completion could not be parsed/validated against the prompt's output format."""
+
+    def __init__(self, message: str, raw: str = "", errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.raw = raw
+        self.errors = errors or []
+
+
+class _OutputModel(BaseModel):
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+
+def _fold(value: str) -> str:
+    normalized = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    return normalized.strip().lower()
+
+
+def _wrap_scalar(value: Any) -> Any:
+    if value is None:
+        return []
+    if isinstance(value, (str, int, float, bool, dict)):
+        return [value]
+    return value
+
+
+def _enum_matcher(options: Tuple[str, ...]):
+    folded = {_fold(option): option for option in options}
+
+    def _match(value: Any) -> Any:
+        if isinstance(value, str):
+            return folded.get(_fold(value), value)
+        return value
+
+    return _match
+
+
+def parse_output_template(raw: str) -> Optional[Any]:
+    """Parse a JSON template (object or array) out of ``expected_output_format`` text."""
+    text = str(raw or "").strip()
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return None
+    try:
+        return json.loads(text[min(starts) :])
+    except json.JSONDecodeError:
+        return None
+
+
+def extract_json_object(raw: str) -> Optional[Dict[str, Any]]:
+    """Best-effort JSON object extraction (markdown fences, leading/trailing prose)."""
+    if not raw:
+        return None
+    cleaned = _FENCE_RE.sub("", str(raw).strip()).strip()
+    candidates = [cleaned]
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start != -1 and end != -1 and start < end:
+        candidates.append(cleaned[start : end + 1])
+    for candidate in candidates:
+        try:
+            parsed = json.loads(candidate)
+        except Exception:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    return None
+
+
+def _leaf_annotation(spec: str) -> Tuple[Any, bool]:
+    """Return ``(annotation, nullable)`` for a template leaf string."""
+    parts = [part.strip() for part in str(spec).split("|") if part.strip()]
+    nullable = any(part.lower() in _NULL_NAMES for part in parts)
+    parts = [part for part in parts if part.lower() not in _NULL_NAMES]
+    # "string (markdown)" -> "string"
+    type_names = [part.split()[0].lower() for part in parts]
+
+    if parts and all(name in _SCALAR_TYPES for name in type_names):
+        types = []
+        for name in type_names:
+            if _SCALAR_TYPES[name] not in types:
+                types.append(_SCALAR_TYPES[name])
+        annotation = types[0] if len(types) == 1 else Union[tuple(types)]
+        return annotation, nullable
+    if len(parts) > 1:
+        options = tuple(parts)
+        return Annotated[Literal[options], BeforeValidator(_enum_matcher(options))], nullable
+    # Free-form example value: accept any string.
+    return str, nullable
+
+
+def _field_definition(template: Any, name: str) -> Tuple[Any, Any]:
+    if isinstance(template, dict):
+        return _build_model(template, name), ...
+    if isinstance(template, list):
+        item_annotation = _field_definition(template[0], f"{name}_item")[0] if template else Any
+        return Annotated[List[item_annotation], BeforeValidator(_wrap_scalar)], Field(default_factory=list)
+    if isinstance(template, str):
+        annotation, nullable = _leaf_annotation(template)
+        return (Optional[annotation], None) if nullable else (annotation, ...)
+    # Literal example values (numbers, booleans) in the template.
+    return Optional[type(template)] if template is not None else Any, None
+
+
+def _build_model(template: Dict[str, Any], name: str) -> Type[BaseModel]:
+    fields = {key: _field_definition(value, f"{name}_{key}") for key, value in template.items()}
+    model_name = "".join(part.capitalize() for part in _MODEL_NAME_RE.split(name) if part) or "Output"
+    return create_model(model_name, __base__=_OutputModel, **fields)
+
+
+class OutputSpec:
+    """Typed output contract derived from a prompt's JSON template."""
+
+    def __init__(self, template: Dict[str, Any], name: str = "output"):
+        self.template = template
+        self.name = _MODEL_NAME_RE.sub("_", name).strip("_")[:64] or "output"
+        self.model = _build_model(template, self.name)
+        self._json_schema: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_prompt(cls, prompt_doc: Optional[Dict[str, Any]]) -> Optional["OutputSpec"]:
+        """Spec for a prompt document, or None when it does not declare a JSON object template."""
+        doc = prompt_doc or {}
+        template = parse_output_template(doc.get("expected_output_format") or "")
+        if not isinstance(template, dict) or not template:
+            return None
+        return cls(template, name=str(doc.get("purpose") or doc.get("name") or "output"))
+
+    @property
+    def json_schema(self) -> Dict[str, Any]:
+        if self._json_schema is None:
+            self._json_schema = self.model.model_json_schema()
+        return self._json_schema
+
+    def template_text(self) -> str:
+        return json.dumps(self.template, ensure_ascii=False, indent=2)
+
+    def parse(self, raw: str) -> Dict[str, Any]:
+        """Validate a completion; raises StructuredOutputError with readable errors."""
+        data = extract_json_object(raw)
+        if data is None:
+            raise StructuredOutputError("Completion is not a JSON object", raw=raw, errors=["invalid JSON"])
+        try:
+            return self.model.model_validate(data).model_dump()
+        except ValidationError as exc:
+            errors = [
+                f"{'.'.join(str(part) for part in error['loc']) or '<root>'}: {error['msg']}"
+                for error in exc.errors()
+            ]
+            raise StructuredOutputError("Completion does not match the output format", raw=raw, errors=errors)
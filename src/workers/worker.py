@@ -1,4 +1,7 @@
+import asyncio
+
 from celery import Celery
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
 
 from src.config import settings
 
@@ -25,6 +28,41 @@ import src.workers.scraper_tasks  # noqa: E402,F401
 import src.workers.article_tasks  # noqa: E402,F401
 import src.workers.publishing_tasks  # noqa: E402,F401
 import src.workers.link_tasks  # noqa: E402,F401
+import src.workers.batch_tasks  # noqa: E402,F401
+
+
+@worker_process_init.connect
+def load_tokenizers(**_kwargs):
+    """Load prompt tokenizers before any task loop runs (file read from TIKTOKEN_CACHE_DIR)."""
+    from src.workers.prompt_budget import load_tokenizers as _load
+
+    _load()
+
+
+@task_postrun.connect
+def flush_llm_ledger(**_kwargs):
+    """Write LLM call records still buffered after a task (tasks normally drain them through ``drained``)."""
+    from src.workers.llm_ledger import get_llm_ledger
+
+    ledger = get_llm_ledger()
+    if ledger.pending:
+        asyncio.run(ledger.flush())
+
+
+@worker_process_shutdown.connect
+def close_browser_pool(**_kwargs):
+    """Close the pooled Chromium of this worker process."""
+    from src.scrapers.browser_pool import close_browser_pool as _close
+
+    _close()
+
+
+@worker_process_shutdown.connect
+def close_http_clients(**_kwargs):
+    """Close the pooled HTTP clients of this worker process."""
+    from src.scrapers.http_clients import close_http_clients as _close
+
+    _close()
 
 
 @app.task(name="ping")
@@ -34,7 +72,12 @@ def ping():
 
 
 @app.task(name="start_pipeline")
-def start_pipeline(submission_id: str, amazon_url: str, pipeline_id: str = "book_review_v2"):
+def start_pipeline(
+    submission_id: str,
+    amazon_url: str,
+    pipeline_id: str = "book_review_v2",
+    refresh_product_cache: bool = False,
+):
     """Entry task to start scraping pipeline from web requests."""
     try:
         from src.workers.scraper_tasks import start_scraping_pipeline
@@ -43,6 +86,7 @@ def start_pipeline(submission_id: str, amazon_url: str, pipeline_id: str = "book
             submission_id=submission_id,
             amazon_url=amazon_url,
             pipeline_id=pipeline_id,
+            refresh_product_cache=refresh_product_cache,
         )
         return {"status": "started", "submission_id": submission_id, "pipeline_id": pipeline_id}
     except Exception as e:
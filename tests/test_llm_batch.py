@@ -0,0 +1,288 @@
+"""Tests for src/workers/llm_batch.py against a local stand-in batch server."""
+
+import json
+import uuid
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+
+from src.workers.llm_batch import (
+    BatchAdapter,
+    BatchContext,
+    BatchPending,
+    LLMBatchBackend,
+    MistralBatchAdapter,
+    OpenAICompatibleBatchAdapter,
+    credential_fingerprint,
+    parse_result_lines,
+)
+
+
+def _stand_in_batch_server(polls_until_done: int = 1) -> FastAPI:
+    """Minimal OpenAI-style and Mistral-style batch API that echoes user prompts."""
+    app = FastAPI()
+    files: Dict[str, str] = {}
+    jobs: Dict[str, Dict[str, Any]] = {}
+
+    def _complete(job: Dict[str, Any]) -> str:
+        output_lines = []
+        for line in files[job["input_file_id"]].splitlines():
+            item = json.loads(line)
+            user = item["body"]["messages"][-1]["content"]
+            if user == "fail":
+                output_lines.append(json.dumps({"custom_id": item["custom_id"], "error": {"message": "bad"}}))
+                continue
+            body = {"choices": [{"message": {"content": f" echo: {user} "}}]}
+            output_lines.append(
+                json.dumps({"custom_id": item["custom_id"], "response": {"status_code": 200, "body": body}})
+            )
+        output_id = f"file-{uuid.uuid4().hex[:8]}"
+        files[output_id] = "\n".join(output_lines)
+        return output_id
+
+    def _advance(job: Dict[str, Any]) -> None:
+        job["polls"] += 1
+        if job["polls"] > polls_until_done and not job.get("output_file_id"):
+            job["output_file_id"] = _complete(job)
+
+    @app.post("/files")
+    async def upload(request: Request):
+        # Pull the JSONL lines out of the multipart body without a form parser dependency.
+        raw = (await request.body()).decode("utf-8")
+        assert 'name="purpose"' in raw and "batch" in raw
+        file_id = f"file-{uuid.uuid4().hex[:8]}"
+        files[file_id] = "\n".join(line for line in raw.splitlines() if line.startswith('{"custom_id"'))
+        return {"id": file_id}
+
+    @app.get("/files/{file_id}/content")
+    async def download(file_id: str):
+        return PlainTextResponse(files[file_id])
+
+    @app.post("/batches")
+    async def create_batch(payload: Dict[str, Any]):
+        job_id = f"batch-{uuid.uuid4().hex[:8]}"
+        jobs[job_id] = {"input_file_id": payload["input_file_id"], "polls": 0}
+        return {"id": job_id, "status": "validating"}
+
+    @app.get("/batches/{job_id}")
+    async def get_batch(job_id: str):
+        job = jobs[job_id]
+        _advance(job)
+        if job.get("output_file_id"):
+            return {"id": job_id, "status": "completed", "output_file_id": job["output_file_id"]}
+        return {"id": job_id, "status": "in_progress"}
+
+    @app.post("/batch/jobs")
+    async def create_mistral_job(payload: Dict[str, Any]):
+        job_id = f"job-{uuid.uuid4().hex[:8]}"
+        jobs[job_id] = {"input_file_id": payload["input_files"][0], "polls": 0, "model": payload["model"]}
+        return {"id": job_id, "status": "QUEUED"}
+
+    @app.get("/batch/jobs/{job_id}")
+    async def get_mistral_job(job_id: str):
+        job = jobs[job_id]
+        _advance(job)
+        if job.get("output_file_id"):
+            return {"id": job_id, "status": "SUCCESS", "output_file": job["output_file_id"]}
+        return {"id": job_id, "status": "RUNNING"}
+
+    app.state.files = files
+    return app
+
+
+def _client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://batch.local")
+
+
+class _MemoryBatchRepo:
+    """In-memory stand-in for LLMBatchRepository."""
+
+    def __init__(self):
+        self.requests: Dict[str, Dict[str, Any]] = {}
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def get_request(self, custom_id):
+        return self.requests.get(custom_id)
+
+    async def enqueue_request(self, payload):
+        if payload["custom_id"] in self.requests:
+            return False
+        self.requests[payload["custom_id"]] = {**payload, "status": "pending", "attempts": 0}
+        return True
+
+    async def pending_groups(self, limit=20):
+        groups: Dict[tuple, int] = {}
+        for item in self.requests.values():
+            if item["status"] == "pending":
+                key = (item["provider"], item["model_id"], item.get("credential"))
+                groups[key] = groups.get(key, 0) + 1
+        return [{"provider": p, "model_id": m, "credential": k, "count": c} for (p, m, k), c in groups.items()]
+
+    async def claim_pending(self, provider, model_id, credential, claim_id, limit):
+        claimed = [
+            item
+            for item in self.requests.values()
+            if item["status"] == "pending"
+            and (item["provider"], item["model_id"], item.get("credential")) == (provider, model_id, credential)
+        ][:limit]
+        for item in claimed:
+            item.update(status="submitting", claim_id=claim_id)
+        return claimed
+
+    async def update_requests(self, query, fields, inc=None):
+        matched = [item for item in self.requests.values() if all(item.get(k) == v for k, v in query.items())]
+        for item in matched:
+            item.update(fields)
+            for key, value in (inc or {}).items():
+                item[key] = item.get(key, 0) + value
+        return len(matched)
+
+    async def store_result(self, custom_id, fields):
+        self.requests[custom_id].update(fields)
+
+    async def list_requests_by_job(self, job_id) -> List[Dict[str, Any]]:
+        return [item for item in self.requests.values() if item.get("job_id") == job_id]
+
+    async def create_job(self, payload):
+        self.jobs[payload["job_id"]] = dict(payload)
+
+    async def list_open_jobs(self):
+        return [job for job in self.jobs.values() if job["status"] in ("submitted", "running")]
+
+    async def update_job(self, job_id, fields):
+        self.jobs[job_id].update(fields)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("adapter_cls", [OpenAICompatibleBatchAdapter, MistralBatchAdapter])
+async def test_batch_adapter_submit_poll_and_fetch(adapter_cls):
+    app = _stand_in_batch_server(polls_until_done=1)
+    async with _client(app) as client:
+        adapter = adapter_cls(api_key="k", base_url="http://batch.local", client=client)
+        body = {"model": "m", "messages": [{"role": "user", "content": "hello"}], "max_tokens": 10}
+        failing = {**body, "messages": [{"role": "user", "content": "fail"}]}
+        job_id = await adapter.submit([("req-1", body), ("req-2", failing)], "m")
+
+        first = await adapter.status(job_id)
+        assert first.state == "running"
+        done = await adapter.status(job_id)
+        assert done.state == "completed"
+
+        results = await adapter.results(done)
+
+    assert results["req-1"]["content"] == "echo: hello"
+    assert "error" in results["req-2"]
+    uploaded = next(iter(app.state.files.values())).splitlines()[0]
+    # Mistral sets the model per job, OpenAI-style APIs per line.
+    assert ("model" in json.loads(uploaded)["body"]) is (adapter_cls is OpenAICompatibleBatchAdapter)
+
+
+def test_parse_result_lines_handles_http_errors_and_garbage():
+    text = "\n".join(
+        [
+            json.dumps({"custom_id": "a", "response": {"status_code": 429, "body": {}}}),
+            "not json",
+            json.dumps({"custom_id": "b", "response": {"status_code": 200, "body": {"choices": []}}}),
+        ]
+    )
+    results = parse_result_lines(text)
+    assert results["a"] == {"error": "HTTP 429"}
+    assert "error" in results["b"]
+
+
+@pytest.mark.asyncio
+async def test_batch_backend_queues_flushes_polls_and_resumes(monkeypatch):
+    app = _stand_in_batch_server(polls_until_done=0)
+    repo = _MemoryBatchRepo()
+
+    async with _client(app) as client:
+        backend = LLMBatchBackend(
+            repo=repo,
+            adapter_factory=lambda provider, api_key: OpenAICompatibleBatchAdapter(
+                api_key=api_key, base_url="http://batch.local", client=client
+            ),
+        )
+
+        async def _no_flush_schedule():
+            return None
+
+        monkeypatch.setattr(backend, "_schedule_flush", _no_flush_schedule)
+
+        resolved = []
+
+        async def _resolve_key(provider, credential):
+            resolved.append(credential)
+            return "k"
+
+        contexts = [
+            BatchContext(f"sub-{index}", "summarize_additional_links", "tasks.resume").for_request("https://a")
+            for index in range(2)
+        ]
+        for context in contexts:
+            with pytest.raises(BatchPending):
+                await backend.generate("sys", f"user {context.submission_id}", context, "llama", "groq", api_key="k")
+        # Re-running the waiting step does not queue duplicates.
+        with pytest.raises(BatchPending):
+            await backend.generate("sys", "user sub-0", contexts[0], "llama", "groq", api_key="k")
+        assert len(repo.requests) == 2
+
+        job_ids = await backend.flush(_resolve_key)
+        assert len(job_ids) == 1
+        assert {item["status"] for item in repo.requests.values()} == {"submitted"}
+        # Jobs are submitted with the credential the steps resolved.
+        assert resolved == [credential_fingerprint("k")]
+
+        outcome = await backend.poll(_resolve_key)
+        assert outcome["open_jobs"] == 0
+        assert sorted(kwargs["submission_id"] for _, kwargs in outcome["resume"]) == ["sub-0", "sub-1"]
+
+        result = await backend.generate("sys", "user sub-0", contexts[0], "llama", "groq")
+        assert result == "echo: user sub-0"
+
+
+def test_batch_custom_id_changes_with_the_prompt():
+    """A keyed request still gets a new id when its prompt changes, so stale results are not served."""
+    from src.workers.llm_batch import batch_custom_id
+
+    context = BatchContext("sub-1", "context_generation", "tasks.resume").for_request("context")
+
+    first = batch_custom_id(context, "groq", "llama", "sys", "user v1")
+    assert first == batch_custom_id(context, "groq", "llama", "sys", "user v1")
+    assert first != batch_custom_id(context, "groq", "llama", "sys", "user v2")
+
+
+def test_batch_adapter_requires_submit_and_status():
+    class _Incomplete(BatchAdapter):
+        pass
+
+    with pytest.raises(TypeError):
+        _Incomplete(api_key="k")
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_request_raises_once_then_requeues_on_retry(monkeypatch):
+    repo = _MemoryBatchRepo()
+    backend = LLMBatchBackend(repo=repo)
+    scheduled = []
+
+    async def _schedule_flush():
+        scheduled.append(True)
+
+    monkeypatch.setattr(backend, "_schedule_flush", _schedule_flush)
+    context = BatchContext("sub-1", "context_generation", "tasks.resume")
+
+    with pytest.raises(BatchPending) as pending:
+        await backend.generate("sys", "user", context, "llama", "groq")
+    repo.requests[pending.value.custom_id].update(status="failed", error="HTTP 500", attempts=2)
+
+    with pytest.raises(RuntimeError):
+        await backend.generate("sys", "user", context, "llama", "groq")
+    with pytest.raises(BatchPending):
+        await backend.generate("sys", "user", context, "llama", "groq")
+
+    request = repo.requests[pending.value.custom_id]
+    assert (request["status"], request["attempts"]) == ("pending", 0)
+    assert len(scheduled) == 2
@@ -80,4 +80,661 @@ async def test_generate_with_retry_failure(mock_llm_client):
             system_prompt="System prompt",
             user_prompt="User prompt",
             max_retries=3,
-        )
\ No newline at end of file
+        )
+
+def test_rate_limiter_reserves_slots_in_arrival_order():
+    """Requests beyond the burst are queued one interval apart instead of rejected."""
+    from src.workers.llm_rate_limiter import reserve_slot
+
+    limits = {"requests_per_minute": 60, "tokens_per_minute": 0}
+    state = {}
+    waits = []
+    for _ in range(62):
+        admitted, wait = reserve_slot(state, now=1000.0, limits=limits, tokens=0, max_wait=-1)
+        assert admitted
+        waits.append(wait)
+
+    # A full minute of quota is available as burst, then callers queue 1s apart.
+    assert waits[:60] == [0.0] * 60
+    assert waits[60] == pytest.approx(1.0)
+    assert waits[61] == pytest.approx(2.0)
+
+
+def test_rate_limiter_enforces_token_budget():
+    """Token-heavy requests wait for the tokens-per-minute bucket to refill."""
+    from src.workers.llm_rate_limiter import reserve_slot
+
+    limits = {"requests_per_minute": 0, "tokens_per_minute": 6000}
+    state = {}
+    assert reserve_slot(state, now=0.0, limits=limits, tokens=6000, max_wait=-1) == (True, 0.0)
+    admitted, wait = reserve_slot(state, now=0.0, limits=limits, tokens=3000, max_wait=-1)
+    assert admitted
+    assert wait == pytest.approx(30.0)
+    admitted, wait = reserve_slot(state, now=0.0, limits=limits, tokens=3000, max_wait=10)
+    assert not admitted
+    assert wait == pytest.approx(60.0)
+    # A request larger than the whole minute runs alone once the bucket is empty.
+    assert reserve_slot({}, now=0.0, limits=limits, tokens=9000, max_wait=-1) == (True, 0.0)
+
+
+def test_rate_limits_are_keyed_by_provider():
+    """Model quotas belong to the provider account: the local provider is never throttled by Groq's."""
+    from src.workers.ai_defaults import resolve_rate_limits
+
+    groq = resolve_rate_limits("groq", "llama-3.3-70b-versatile")
+    assert groq == {"requests_per_minute": 30, "tokens_per_minute": 12000}
+    assert resolve_rate_limits("local", "llama-3.3-70b-versatile") == {"requests_per_minute": 0, "tokens_per_minute": 0}
+    assert resolve_rate_limits("local", "x", overrides={"local": {"requests_per_minute": 600}})["requests_per_minute"] == 600
+
+
+@pytest.mark.asyncio
+async def test_generate_acquires_rate_limit_slot(mock_llm_client):
+    """generate() books a slot for the resolved provider/model before calling the API."""
+    llm_client, mock_client = mock_llm_client
+    llm_client._rate_limiter = AsyncMock()
+    mock_response = AsyncMock()
+    mock_response.choices[0].message.content = "ok"
+    mock_client.chat.completions.create.return_value = mock_response
+
+    await llm_client.generate(
+        system_prompt="System prompt",
+        user_prompt="User prompt",
+        model_id="mistral-large-latest",
+        max_tokens=100,
+    )
+
+    llm_client._rate_limiter.acquire.assert_awaited_once()
+    kwargs = llm_client._rate_limiter.acquire.call_args.kwargs
+    assert kwargs["provider"] == "mistral"
+    assert kwargs["model_id"] == "mistral-large-latest"
+    assert kwargs["estimated_tokens"] >= 100
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+def test_classify_error_and_retry_after():
+    """Provider errors are classified and Retry-After hints are parsed."""
+    from src.workers.llm_retry import classify_error, retry_after_seconds
+
+    assert classify_error(_StatusError(429)) == "rate_limit"
+    assert classify_error(_StatusError(503)) == "server"
+    assert classify_error(_StatusError(400)) == "client"
+    assert classify_error(TimeoutError()) == "timeout"
+    assert classify_error(RuntimeError("boom")) == "unknown"
+    assert retry_after_seconds(_StatusError(429, {"retry-after": "7"})) == 7.0
+    assert retry_after_seconds(_StatusError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(_StatusError(500)) is None
+
+
+@pytest.mark.asyncio
+async def test_generate_with_retry_does_not_retry_client_errors(mock_llm_client):
+    """A 400 will never succeed, so it fails after a single attempt."""
+    llm_client, mock_client = mock_llm_client
+    mock_client.chat.completions.create.side_effect = _StatusError(400)
+
+    with pytest.raises(RuntimeError, match="Failed after 1 attempts"):
+        await llm_client.generate_with_retry(system_prompt="s", user_prompt="u", max_retries=3)
+    assert mock_client.chat.completions.create.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_with_retry_honours_retry_after(mock_llm_client):
+    """429 responses wait at least the server-provided Retry-After before retrying."""
+    llm_client, mock_client = mock_llm_client
+    mock_response = AsyncMock()
+    mock_response.choices[0].message.content = "ok"
+    mock_client.chat.completions.create.side_effect = [_StatusError(429, {"retry-after": "4"}), mock_response]
+
+    with patch("src.workers.llm_client.asyncio.sleep", new=AsyncMock()) as sleep:
+        assert await llm_client.generate_with_retry(system_prompt="s", user_prompt="u") == "ok"
+    delay = sleep.await_args.args[0]
+    assert 4.0 <= delay <= 5.0
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_short_circuits_failing_provider(mock_llm_client):
+    """Repeated 5xx responses open the provider/model circuit and later calls fail fast."""
+    from src.workers import llm_retry
+    from src.workers.llm_retry import CircuitOpenError
+
+    llm_client, mock_client = mock_llm_client
+    mock_client.chat.completions.create.side_effect = _StatusError(502)
+
+    with patch.object(llm_retry, "_breakers", {}), patch.object(settings, "llm_circuit_failure_threshold", 2), patch(
+        "src.workers.llm_client.asyncio.sleep", new=AsyncMock()
+    ):
+        with pytest.raises(RuntimeError, match="Failed after 2 attempts"):
+            await llm_client.generate_with_retry(
+                system_prompt="s", user_prompt="u", model_id="breaker-model", provider="groq", max_retries=5
+            )
+        with pytest.raises(CircuitOpenError):
+            await llm_client.generate_with_retry(
+                system_prompt="s", user_prompt="u", model_id="breaker-model", provider="groq"
+            )
+    assert mock_client.chat.completions.create.call_count == 2
+
+
+def test_stop_conditions():
+    """Word budget and JSON-closed conditions trigger on the accumulated text."""
+    from src.workers.llm_stream import JsonClosedStop, WordBudgetStop
+
+    words = WordBudgetStop(3)
+    assert not words("one two")
+    assert not words("one two three")
+    assert words("one two three fo")
+
+    closed = JsonClosedStop()
+    assert not closed('```json\n{"a": "}')
+    assert not closed('```json\n{"a": "}", "b": [1, {')
+    assert closed('```json\n{"a": "}", "b": [1, {}]}')
+
+    prose = JsonClosedStop()
+    assert not prose('Result [JSON] for Topic [1]: ')
+    assert not prose('Result [JSON] for Topic [1]: {"topics": ["a"]')
+    assert not prose('Result [JSON] for Topic [1]: {"topics": ["a"]}\n')
+    assert not prose('Result [JSON] for Topic [1]: {"topics": ["a"]}\n  {"topics": ["b"]')
+    assert prose('Result [JSON] for Topic [1]: {"topics": ["a"]}\n  {"topics": ["b"]}')
+
+
+class _FakeStream:
+    def __init__(self, deltas):
+        self._deltas = list(deltas)
+        self.consumed = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumed >= len(self._deltas):
+            raise StopAsyncIteration
+        delta = self._deltas[self.consumed]
+        self.consumed += 1
+        choice = type("Choice", (), {"delta": type("Delta", (), {"content": delta})()})()
+        return type("Chunk", (), {"choices": [choice]})()
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_stops_when_json_closes(mock_llm_client):
+    """generate(stop_when=...) streams and closes the stream as soon as the condition holds."""
+    from src.workers.llm_stream import JsonClosedStop
+
+    llm_client, mock_client = mock_llm_client
+    stream = _FakeStream(['{"topics": ', '["a", "b"]', "}", "\nExtra commentary", " that costs tokens"])
+    mock_client.chat.completions.create.return_value = stream
+
+    response = await llm_client.generate(system_prompt="s", user_prompt="u", stop_when=JsonClosedStop())
+
+    assert response == '{"topics": ["a", "b"]}'
+    assert stream.consumed == 3
+    assert stream.closed
+    assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+
+
+def test_prompt_budget_trims_lowest_priority_first():
+    """Parts are trimmed from the least important one and reserved text is never touched."""
+    from src.workers.prompt_budget import PromptBudget, count_tokens
+
+    metadata = "metadata " * 50
+    research = "research " * 200
+    raw_data = "raw " * 400
+    budget = PromptBudget("llama-3.3-70b-versatile", max_input_tokens=700)
+    fitted = (
+        budget.reserve("system instructions")
+        .add("metadata", metadata, priority=0)
+        .add("research", research, priority=1)
+        .add("data", raw_data, priority=2)
+        .fit()
+    )
+
+    assert fitted["metadata"] == metadata
+    assert fitted["research"] == research
+    assert len(fitted["data"]) < len(raw_data)
+    assert budget.total_tokens <= 700
+    assert count_tokens(fitted["data"], "llama-3.3-70b-versatile") <= 700
+
+
+def test_token_counting_never_loads_encodings_on_the_hot_path(monkeypatch):
+    """Encodings are loaded once by load_tokenizers; count_tokens only uses what is loaded."""
+    import tiktoken
+    from src.workers import prompt_budget
+
+    class _Encoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    calls = []
+    monkeypatch.setattr(prompt_budget, "_encodings", {})
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: calls.append(name) or _Encoding())
+
+    assert prompt_budget.count_tokens("one two three four five six seven", "llama-3.3-70b-versatile") == 10
+    assert calls == []
+
+    assert prompt_budget.load_tokenizers() == {"cl100k_base": True}
+    assert prompt_budget.count_tokens("one two three four five six seven", "llama-3.3-70b-versatile") == 7
+    assert calls == ["cl100k_base"]
+
+
+def test_prompt_budget_respects_minimum_tokens():
+    """A part trimmed to its floor pushes the remaining overflow onto the next priority."""
+    from src.workers.prompt_budget import PromptBudget
+
+    budget = PromptBudget("mistral-large-latest", max_input_tokens=300)
+    fitted = (
+        budget.add("research", "research " * 300, priority=1)
+        .add("summaries", "summary " * 300, priority=2, min_tokens=100)
+        .fit()
+    )
+
+    assert fitted["summaries"]
+    assert len(fitted["research"]) < len("research " * 300)
+    assert budget.total_tokens <= 300
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_uses_faster_secondary(mock_llm_client):
+    """A slow primary triggers the secondary provider after the hedge delay and the first answer wins."""
+    import asyncio
+
+    from src.workers.llm_hedging import HedgePolicy
+
+    llm_client, _ = mock_llm_client
+    calls = []
+
+    async def fake_generate(system_prompt, user_prompt, provider=None, **kwargs):
+        calls.append(provider)
+        await asyncio.sleep(1.0 if provider == "groq" else 0.01)
+        return f"from {provider}"
+
+    llm_client.generate = fake_generate
+    hedge = HedgePolicy(step_id="test_hedge_step", secondary_provider="mistral", default_delay_seconds=0.05, max_hedge_ratio=1.0)
+
+    result = await llm_client.generate_with_retry(
+        system_prompt="s", user_prompt="u", provider="groq", model_id="hedge-model", hedge=hedge
+    )
+
+    assert result == "from mistral"
+    assert calls == ["groq", "mistral"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_respects_cost_cap(mock_llm_client):
+    """Without hedge budget left the call simply waits for the primary provider."""
+    import asyncio
+
+    from src.workers.llm_hedging import HedgePolicy
+
+    llm_client, _ = mock_llm_client
+    calls = []
+
+    async def fake_generate(system_prompt, user_prompt, provider=None, **kwargs):
+        calls.append(provider)
+        await asyncio.sleep(0.1)
+        return f"from {provider}"
+
+    llm_client.generate = fake_generate
+    hedge = HedgePolicy(step_id="test_capped_step", secondary_provider="mistral", default_delay_seconds=0.01, max_hedge_ratio=0.0)
+
+    assert await llm_client.generate_with_retry(system_prompt="s", user_prompt="u", provider="groq", hedge=hedge) == "from groq"
+    assert calls == ["groq"]
+
+
+def test_hedge_policy_secondary_follows_the_step_provider():
+    """The secondary defaults to the other provider, so a Mistral step hedges to Groq, never to itself."""
+    from src.workers.llm_hedging import HedgePolicy
+
+    ai_config = {"hedging": {"enabled": True}}
+
+    assert HedgePolicy.from_step_config("s", ai_config, "groq").secondary_provider == "mistral"
+    assert HedgePolicy.from_step_config("s", ai_config, "mistral").secondary_provider == "groq"
+    assert HedgePolicy.from_step_config("s", {"hedging": {"enabled": True, "secondary_provider": "mistral"}}, "mistral") is None
+    pinned = {"hedging": {"enabled": True, "secondary_provider": "mistral", "secondary_model_id": "mistral-large-latest"}}
+    assert HedgePolicy.from_step_config("s", pinned, "mistral", primary_model_id="mistral-large-latest") is None
+    assert HedgePolicy.from_step_config("s", pinned, "mistral", primary_model_id="mistral-small-latest") is not None
+
+
+def test_hedging_defaults_do_not_pin_a_secondary():
+    """Step defaults leave the secondary to the step's prompt provider."""
+    from src.api.settings import HEDGING_DEFAULTS
+
+    assert HEDGING_DEFAULTS["secondary_provider"] is None and HEDGING_DEFAULTS["secondary_model_id"] is None
+
+
+def test_combined_link_prompt_uses_its_provider_credential():
+    """A combined prompt edited to Groq is called with the Groq key, not the Mistral one."""
+    from src.workers.scraper_tasks import _prompt_api_key
+
+    assert _prompt_api_key({"provider": "groq"}, "mistral-key", "groq-key") == "groq-key"
+    assert _prompt_api_key({"provider": "mistral"}, "mistral-key", "groq-key") == "mistral-key"
+    assert _prompt_api_key({}, "mistral-key", "groq-key") == "mistral-key"
+
+
+@pytest.mark.asyncio
+async def test_combined_link_prompt_returns_bibliographic_and_summary():
+    """The combined per-link prompt yields both payloads from a single LLM call."""
+    from src.workers.scraper_tasks import LINK_COMBINED_PROMPT, _run_link_combined
+
+    llm = LLMClient()
+    llm.generate_with_retry = AsyncMock(
+        return_value=(
+            '{"bibliographic": {"title": "Scrum e Kanban", "authors": "Chico Alff", "pages": 312, "isbn_13": null},'
+            ' "summary": "Resumo do livro.", "topics": ["kanban", "kanban"], "key_points": ["Ponto"],'
+            ' "credibility": "media"}'
+        )
+    )
+
+    bibliographic, summary = await _run_link_combined(
+        llm=llm,
+        prompt_doc=LINK_COMBINED_PROMPT,
+        content="Conteudo da pagina sobre o livro.",
+        title="Scrum e Kanban",
+        author="Chico Alff",
+        url="https://example.com/resenha",
+        api_key="key",
+    )
+
+    assert llm.generate_with_retry.await_count == 1
+    assert bibliographic == {"title": "Scrum e Kanban", "authors": ["Chico Alff"], "pages": 312}
+    assert summary == {
+        "summary": "Resumo do livro.",
+        "topics": ["kanban"],
+        "key_points": ["Ponto"],
+        "credibility": "media",
+    }
+
+
+class _MemoryCallRepo:
+    def __init__(self):
+        self.records = []
+
+    async def insert_many(self, records):
+        self.records.extend(records)
+        return len(records)
+
+
+@pytest.mark.asyncio
+async def test_ledger_records_usage_latency_and_retries(mock_llm_client):
+    """Each attempt is recorded with context tags, provider usage and its retry index."""
+    from types import SimpleNamespace
+
+    from src.workers.llm_ledger import LLMCallLedger, llm_call_scope
+
+    llm_client, mock_client = mock_llm_client
+    mock_response = AsyncMock()
+    mock_response.choices[0].message.content = "ok"
+    mock_response.usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30)
+    mock_client.chat.completions.create.side_effect = [_StatusError(503), mock_response]
+
+    repo = _MemoryCallRepo()
+    ledger = LLMCallLedger(repo=repo, batch_size=100, flush_interval_seconds=3600)
+    with patch("src.workers.llm_client.get_llm_ledger", return_value=ledger), patch(
+        "src.workers.llm_client.asyncio.sleep", new=AsyncMock()
+    ):
+        with llm_call_scope(submission_id="sub-1", step_id="context_generation", prompt_id="p-1"):
+            await llm_client.generate_with_retry(
+                system_prompt="s", user_prompt="u", model_id="ledger-model", provider="groq"
+            )
+
+    # Buffered until flushed, then written in one batch.
+    assert repo.records == [] and ledger.pending == 2
+    assert await ledger.flush() == 2
+    failed, succeeded = repo.records
+    assert failed["status"] == "error" and failed["error_class"] == "server" and failed["retry_count"] == 0
+    assert succeeded["status"] == "ok" and succeeded["retry_count"] == 1
+    assert succeeded["prompt_tokens"] == 120 and succeeded["total_tokens"] == 150
+    assert succeeded["latency_ms"] is not None
+    assert {record["step_id"] for record in repo.records} == {"context_generation"}
+    assert succeeded["submission_id"] == "sub-1" and succeeded["prompt_id"] == "p-1"
+
+
+def test_ledger_records_survive_task_loop_teardown():
+    """Background flushes finish before asyncio.run closes the loop; a cancelled flush re-buffers its batch."""
+    import asyncio
+
+    from src.workers.llm_ledger import LLMCallLedger, drained
+
+    class _SlowRepo(_MemoryCallRepo):
+        async def insert_many(self, records):
+            await asyncio.sleep(0.05)
+            return await super().insert_many(records)
+
+    async def _task_body(ledger):
+        ledger.record(provider="groq", model_id="m")  # batch_size=1: schedules a background flush
+        return "done"
+
+    repo = _SlowRepo()
+    ledger = LLMCallLedger(repo=repo, batch_size=1, flush_interval_seconds=3600)
+    with patch("src.workers.llm_ledger.get_llm_ledger", return_value=ledger):
+        assert asyncio.run(drained(_task_body(ledger))) == "done"
+    assert len(repo.records) == 1 and ledger.pending == 0
+
+    cancelled = LLMCallLedger(repo=_SlowRepo(), batch_size=1, flush_interval_seconds=3600)
+    asyncio.run(_task_body(cancelled))  # teardown cancels the flush mid-insert
+    assert cancelled.pending == 1
+
+
+def test_summarize_call_groups_reports_percentiles():
+    from src.workers.llm_ledger import summarize_call_groups
+
+    groups = [
+        {
+            "key": "context_generation",
+            "calls": 21,
+            "errors": 1,
+            "latency_ms": [float(value) for value in range(1, 21)] + [None],
+            "prompt_tokens": [100] * 20 + [None],
+            "completion_tokens": [],
+        }
+    ]
+    (summary,) = summarize_call_groups(groups)
+    assert summary["latency_ms"]["p50"] == 10.0
+    assert summary["latency_ms"]["p95"] == 19.0
+    assert summary["prompt_tokens"] == {"p50": 100, "p95": 100, "total": 2000}
+    assert summary["completion_tokens"]["p50"] is None
+
+
+@pytest.mark.asyncio
+async def test_local_provider_returns_schema_valid_deterministic_output(monkeypatch):
+    """Forcing the local provider runs a real prompt end to end without network access."""
+    from src.workers.scraper_tasks import LINK_COMBINED_PROMPT, _run_link_combined
+
+    monkeypatch.setattr(settings, "llm_force_provider", "local")
+    monkeypatch.setattr(settings, "llm_ledger_enabled", False)
+    llm = LLMClient()
+
+    async def _run():
+        return await _run_link_combined(
+            llm=llm,
+            prompt_doc=LINK_COMBINED_PROMPT,
+            content="Conteudo da pagina sobre o livro.",
+            title="Scrum e Kanban",
+            author="Chico Alff",
+            url="https://example.com/resenha",
+            api_key="local",
+        )
+
+    bibliographic, summary = await _run()
+    assert bibliographic.get("title")
+    assert summary["summary"] and summary["topics"]
+    assert summary["credibility"] in {"alta", "media", "baixa"}
+    assert await _run() == (bibliographic, summary)
+
+
+@pytest.mark.asyncio
+async def test_local_provider_streams_same_text_and_injects_errors(monkeypatch):
+    from src.workers.llm_local import LocalLLMProvider
+    from src.workers.llm_retry import classify_error, retry_after_seconds
+
+    monkeypatch.setattr(settings, "llm_force_provider", "local")
+    monkeypatch.setattr(settings, "llm_ledger_enabled", False)
+    llm = LLMClient()
+    prompt = {"system_prompt": "Escreva.", "user_prompt": "palavras mínimas: 40\npalavras máximas: 60"}
+
+    text = await llm.generate(prompt["system_prompt"], prompt["user_prompt"], model_id="llama-3.3-70b-versatile")
+    streamed = [chunk async for chunk in llm.generate_stream(prompt["system_prompt"], prompt["user_prompt"])]
+    assert "".join(streamed).strip() == text
+    assert 40 <= len(text.split()) <= 60
+
+    provider = LocalLLMProvider(error_rates={"429": 1.0})
+    with pytest.raises(Exception) as exc_info:
+        await provider.create(model="local-stub", messages=[{"role": "user", "content": "x"}])
+    assert classify_error(exc_info.value) == "rate_limit"
+    assert retry_after_seconds(exc_info.value) == 1.0
+
+    timeouts = LocalLLMProvider(error_rates={"timeout": 1.0})
+    with pytest.raises(Exception) as exc_info:
+        await timeouts.create(model="local-stub", messages=[{"role": "user", "content": "x"}])
+    assert classify_error(exc_info.value) == "timeout"
+
+
+def test_output_spec_validates_template_types_leniently():
+    from src.workers.scraper_tasks import LINK_COMBINED_PROMPT
+    from src.workers.structured_output import OutputSpec, StructuredOutputError
+
+    spec = OutputSpec.from_prompt(LINK_COMBINED_PROMPT)
+    parsed = spec.parse(
+        '```json\n{"bibliographic": {"authors": "Chico Alff", "pages": "312", "isbn_13": 9781234567897},'
+        ' "summary": "Resumo.", "credibility": "Média"}\n```'
+    )
+    assert parsed["bibliographic"]["authors"] == ["Chico Alff"]
+    assert parsed["bibliographic"]["pages"] == 312
+    assert parsed["bibliographic"]["isbn_13"] == "9781234567897"
+    assert parsed["credibility"] == "media"
+    assert parsed["topics"] == []
+    assert spec.json_schema["properties"]["credibility"]["enum"] == ["alta", "media", "baixa"]
+
+    with pytest.raises(StructuredOutputError) as exc_info:
+        spec.parse('{"bibliographic": {}, "summary": "x", "credibility": "talvez"}')
+    assert any(error.startswith("credibility") for error in exc_info.value.errors)
+    assert OutputSpec.from_prompt({"expected_output_format": "Markdown com 3 secoes"}) is None
+
+
+def test_structured_output_mode_per_provider(monkeypatch):
+    from src.workers.scraper_tasks import LINK_SUMMARY_PROMPT
+    from src.workers.structured_output import OutputSpec
+
+    spec = OutputSpec.from_prompt(LINK_SUMMARY_PROMPT)
+    groq = LLMClient._structured_output_kwargs("groq", "llama-3.3-70b-versatile", spec)
+    mistral = LLMClient._structured_output_kwargs("mistral", "mistral-large-latest", spec)
+    assert groq == {"response_format": {"type": "json_object"}}
+    assert mistral["response_format"]["json_schema"]["schema"] == spec.json_schema
+    assert LLMClient._structured_output_kwargs("groq", "llama", None) == {}
+
+    monkeypatch.setattr(settings, "llm_structured_output_modes", {"mistral:mistral-large-latest": "off"})
+    assert LLMClient._structured_output_kwargs("mistral", "mistral-large-latest", spec) == {}
+
+
+@pytest.mark.asyncio
+async def test_generate_structured_repairs_invalid_output_once():
+    from src.workers.llm_client import STRUCTURED_REPAIR_SYSTEM_PROMPT
+    from src.workers.scraper_tasks import LINK_SUMMARY_PROMPT
+    from src.workers.structured_output import OutputSpec, StructuredOutputError
+
+    spec = OutputSpec.from_prompt(LINK_SUMMARY_PROMPT)
+    llm = LLMClient()
+    llm.generate_with_retry = AsyncMock(
+        side_effect=[
+            'Aqui esta: {"summary": "Resumo", "topics": ["a"],',
+            '{"summary": "Resumo", "topics": ["a"], "credibility": "alta"}',
+        ]
+    )
+
+    result = await llm.generate_structured(
+        "sys", "conteudo longo da pagina", spec, model_id="llama-3.3-70b-versatile", provider="groq", max_tokens=900
+    )
+
+    assert result["summary"] == "Resumo" and result["credibility"] == "alta"
+    repair_call = llm.generate_with_retry.await_args_list[1].kwargs
+    assert repair_call["system_prompt"] == STRUCTURED_REPAIR_SYSTEM_PROMPT
+    assert "conteudo longo" not in repair_call["user_prompt"]
+    assert repair_call["max_retries"] == 1 and repair_call["provider"] == "groq"
+
+    llm.generate_with_retry = AsyncMock(side_effect=["nao e json", "continua sem json"])
+    with pytest.raises(StructuredOutputError):
+        await llm.generate_structured("sys", "user", spec, model_id="llama-3.3-70b-versatile")
+    assert llm.generate_with_retry.await_count == 2
+
+
+def test_routing_policy_picks_smallest_fitting_healthy_tier():
+    """Tiers are tried cheapest first; size, structure, breaker and latency budget disqualify them."""
+    from src.workers import llm_retry
+    from src.workers.llm_hedging import LatencyTracker
+    from src.workers.llm_routing import RoutingPolicy
+
+    config = {
+        "routing": {
+            "enabled": True,
+            "latency_budget_seconds": 2,
+            "tiers": [
+                {"provider": "groq", "model_id": "tiny-model", "max_input_tokens": 500, "structured_output": False},
+                {"provider": "groq", "model_id": "small-model", "max_input_tokens": 1500},
+            ],
+        }
+    }
+    assert RoutingPolicy.from_step_config("step", {"routing": {"enabled": False, "tiers": []}}) is None
+    policy = RoutingPolicy.from_step_config("step", config)
+    for tier in policy.tiers:
+        tier.api_key = "key"
+    tracker = LatencyTracker()
+    choose = lambda tokens, structured=True: policy.choose(  # noqa: E731
+        tokens, "mistral", "big-model", "big-key", structured=structured, tracker=tracker
+    )
+
+    with patch.object(llm_retry, "_breakers", {}):
+        assert choose(300, structured=False).model_id == "tiny-model"
+        decision = choose(300)
+        assert (decision.model_id, decision.reason) == ("small-model", "tier:1")
+        assert decision.as_record()["skipped"] == [{"model": "groq:tiny-model", "reason": "structure"}]
+        decision = choose(4000)
+        assert (decision.provider, decision.model_id, decision.api_key) == ("mistral", "big-model", "big-key")
+        assert decision.as_record()["reason"] == "default"
+
+        for _ in range(25):
+            tracker.record("groq", "small-model", 5.0)
+        assert choose(300).as_record()["skipped"][-1]["reason"] == "latency"
+
+        tracker = LatencyTracker()
+        breaker = llm_retry.get_circuit_breaker("groq", "small-model")
+        for _ in range(settings.llm_circuit_failure_threshold):
+            breaker.record_failure()
+        assert choose(300).as_record()["skipped"][-1] == {"model": "groq:small-model", "reason": "circuit_open"}
+
+
+@pytest.mark.asyncio
+async def test_link_summary_routes_short_pages_and_tags_ledger():
+    """A short page goes to the small tier and the decision travels with the call context."""
+    from src.workers import llm_retry
+    from src.workers.llm_ledger import get_llm_call_context
+    from src.workers.llm_routing import RoutingPolicy
+    from src.workers.scraper_tasks import LINK_SUMMARY_PROMPT, _run_link_summary
+
+    policy = RoutingPolicy.from_step_config(
+        "summarize_additional_links",
+        {"routing": {"enabled": True, "tiers": [{"provider": "groq", "model_id": "llama-3.1-8b-instant", "max_input_tokens": 1200}]}},
+    )
+    policy.tiers[0].api_key = "small-key"
+    contexts = []
+
+    async def fake_generate(**kwargs):
+        contexts.append(get_llm_call_context())
+        return '{"summary": "Resumo curto.", "topics": [], "key_points": [], "credibility": "media"}'
+
+    llm = LLMClient()
+    llm.generate_with_retry = AsyncMock(side_effect=fake_generate)
+    with patch.object(llm_retry, "_breakers", {}):
+        await _run_link_summary(llm, LINK_SUMMARY_PROMPT, "Trecho curto.", "Livro", "Autor", "https://a.b", "key", route=policy)
+        await _run_link_summary(llm, LINK_SUMMARY_PROMPT, "palavra " * 3000, "Livro", "Autor", "https://a.b", "key", route=policy)
+
+    first, second = (call.kwargs for call in llm.generate_with_retry.await_args_list)
+    assert (first["model_id"], first["api_key"]) == ("llama-3.1-8b-instant", "small-key")
+    assert second["model_id"] == LINK_SUMMARY_PROMPT["model_id"]
+    assert contexts[0]["route"]["reason"] == "tier:0"
+    assert contexts[1]["route"]["skipped"] == [{"model": "groq:llama-3.1-8b-instant", "reason": "input_tokens"}]
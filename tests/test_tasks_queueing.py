@@ -128,6 +128,7 @@ def test_retry_step_enqueue_uses_explicit_task_name(monkeypatch, client: TestCli
     assert captured["kwargs"] == {
         "submission_id": submission_id,
         "amazon_url": "https://www.amazon.com/queueing-test-retry-step/",
+        "refresh_product_cache": True,
     }
 
 